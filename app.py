@@ -1,32 +1,31 @@
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
-import time
 import streamlit as st
-import numpy as np
-import pandas as pd
-from wsclient.okx_ws import start_ws_thread, get_latest_data
-from models.fee_model import calculate_fees
-from models.slippage_model import estimate_slippage
-from models.impact_model import estimate_market_impact
-from models.maker_taker_model import predict_maker_taker, load_model
-from utils.latency import record_latency, latency_records
-from utils.history_buffer import MetricsBuffer
-
-# Load models
-load_model()
-
-# Start WebSocket in the background (once per session)
-if "ws_started" not in st.session_state:
-    start_ws_thread()
-    st.session_state.ws_started = True
+from wsclient.okx_ws import start_ws_thread, feed, SUPPORTED_INSTRUMENTS
+from utils.latency import record_span, start_exporter, snapshot as latency_snapshot
+from utils.metrics_engine import get_engine
 
 # Streamlit UI setup
 st.set_page_config(page_title="GoQuant Real-Time Trade Simulator", layout="wide")
 st.title("📈 GoQuant Real-Time Trade Simulator")
 
-# History buffer
-buffer = MetricsBuffer(maxlen=100)
+
+@st.cache_resource
+def start_engine():
+    """
+    Feed connection, metrics engine and maker/taker model live once per
+    process, not per rerun (the engine loads the model when it starts).
+    """
+    start_ws_thread()
+    start_exporter()  # Latency snapshot for `python -m utils.latency`, written once per second
+    return get_engine(feed)
+
+
+engine = start_engine()
+
+# Rows of engine history shown in the chart and CSV export
+CHART_ROWS = 5000
 
 UI_TO_INTERNAL_TIER = {
     "Regular": "Tier 1",
@@ -40,80 +39,71 @@ col1, col2 = st.columns([1, 2])
 with col1:
     st.header("⚙️ Input Parameters")
     exchange = st.selectbox("Exchange", ["OKX"], index=0, disabled=True)
-    spot_asset = st.selectbox("Spot Asset", ["BTC-USDT", "ETH-USDT", "SOL-USDT"])
+    spot_asset = st.selectbox("Spot Asset", SUPPORTED_INSTRUMENTS)
     quantity_usd = st.number_input("Quantity (USD)", min_value=10.0, max_value=10000.0, value=100.0, step=10.0)
-    volatility = st.slider("Volatility (σ)", min_value=0.0, max_value=1.0, value=0.05, step=0.01)
+    live_volatility = st.checkbox("Live volatility (EWMA of mid returns)", value=True)
+    volatility = st.slider("Volatility (σ)", min_value=0.0, max_value=1.0, value=0.05, step=0.01,
+                           disabled=live_volatility)
     fee_tier = st.selectbox("Fee Tier", ["Regular", "VIP 1", "VIP 2", "VIP 3"])
     is_maker = st.radio("Order Role", ["Maker", "Taker"]) == "Maker"
+    refresh_s = st.slider("Refresh interval (s)", min_value=0.5, max_value=10.0, value=1.0, step=0.5)
+
+# The engine recomputes at feed rate; each session only selects the view matching its inputs
+view = engine.track(
+    spot_asset,
+    quantity_usd=quantity_usd,
+    volatility=None if live_volatility else volatility,
+    fee_tier=UI_TO_INTERNAL_TIER[fee_tier],
+    is_maker=is_maker,
+    is_vip=fee_tier.startswith("VIP"),
+)
+
+
+# Output Panel (re-rendered on its own timer, independent of the tick rate)
+@st.fragment(run_every=refresh_s)
+def output_panel():
+    import pandas as pd  # Only the chart, CSV and latency table need it; keeps the first paint light
 
-# Output Panel
-with col2:
     st.header("📊 Output Metrics")
 
-    latest_data = get_latest_data()
-
-    if latest_data and "asks" in latest_data and "bids" in latest_data:
-        asks = latest_data["asks"]
-        bids = latest_data["bids"]
-
-        avg_ask = np.mean([float(a[0]) for a in asks]) if asks else 0
-        avg_bid = np.mean([float(b[0]) for b in bids]) if bids else 0
-        spread = abs(avg_ask - avg_bid)
-
-        # Timestamp freshness
-        data_age = time.time() - latest_data.get("timestamp_unix", time.time())
-        if data_age > 5:
-            st.warning(f"⚠️ Data is {data_age:.1f}s old. Waiting for fresh updates...")
-
-        st.write(f"**Latest Bid Price:** {avg_bid:.2f} USDT")
-        st.write(f"**Latest Ask Price:** {avg_ask:.2f} USDT")
-
-        # Calculations
-        slippage = estimate_slippage(quantity_usd, avg_ask, avg_bid)
-        impact = estimate_market_impact(quantity_usd, volatility)
-        fees = calculate_fees(quantity_usd, UI_TO_INTERNAL_TIER[fee_tier], is_maker=is_maker, is_vip=fee_tier.startswith("VIP"))
-        net_cost = slippage + impact + fees
-        maker_taker_role, _ = predict_maker_taker(quantity_usd, volatility, spread)
-
-        # Record latency
-        processing_start = time.time()
-        record_latency(processing_start)
-        recent_latency = latency_records[-1] if latency_records else 0
-
-        # Buffer update
-        buffer.add(
-            timestamp=latest_data.get("timestamp", time.strftime("%H:%M:%S")),
-            slippage=slippage,
-            impact=impact,
-            fee=fees,
-            net_cost=net_cost,
-            latency=recent_latency,
-            maker_taker_role=maker_taker_role
-        )
+    metrics = engine.latest(view)
+
+    if metrics:
+        # Book integrity: sequence gaps, checksum failures and staleness (exchange and local)
+        integrity = feed.integrity_status(spot_asset)
+        if integrity["state"] == "stale":
+            lag = f" (exchange lag {integrity['lag_ms']:.0f} ms)" if integrity["lag_ms"] is not None else ""
+            st.warning(f"⚠️ Data is {integrity['age_s']:.1f}s old{lag}. Waiting for fresh updates...")
+        elif integrity["state"] == "resyncing":
+            st.warning(f"🔁 Order book resyncing after: {integrity['last_problem'] or 'reconnect'}")
+
+        st.write(f"**Best Bid Price:** {metrics['best_bid']:.2f} USDT")
+        st.write(f"**Best Ask Price:** {metrics['best_ask']:.2f} USDT")
+        if metrics["microprice"] is not None:
+            st.write(f"**Spread:** {metrics['spread']:.4f} USDT | **Microprice:** {metrics['microprice']:.2f} USDT"
+                     f" | **Imbalance:** {metrics['imbalance']:+.2f} | **σ:** {metrics['volatility']:.4f}")
 
         # Display Metrics
-        st.metric("Expected Slippage (USD)", f"${slippage:.4f}")
-        st.metric("Expected Fees (USD)", f"${fees:.4f}")
-        st.metric("Market Impact (USD)", f"${impact:.4f}")
-        st.metric("Net Cost (USD)", f"${net_cost:.4f}")
-        st.metric("Order Role", maker_taker_role)
-        st.metric("Internal Latency (ms)", f"{recent_latency * 1000:.2f}")
+        st.metric("Expected Slippage (USD)", f"${metrics['slippage']:.4f}")
+        st.metric("Expected Fees (USD)", f"${metrics['fee']:.4f}")
+        st.metric("Market Impact (USD)", f"${metrics['impact']:.4f}")
+        st.metric("Net Cost (USD)", f"${metrics['net_cost']:.4f}")
+        st.metric("Order Role", metrics["maker_taker_role"])
+        st.caption(f"Maker/Taker model version: {metrics['model_version']}")
+        st.metric("Internal Latency (ms)", f"{metrics['latency'] * 1000:.2f}")
+        st.metric("Engine Throughput (updates/s)", f"{engine.stats()['updates_per_sec']:.1f}")
 
     else:
         st.warning("Waiting for real-time data from WebSocket...")
 
     # Plot history if available
-    if buffer.timestamps:
+    history = engine.history(view, CHART_ROWS)
+    if len(history["Timestamp"]):
         st.subheader("📈 Metrics Over Time")
 
-        df = pd.DataFrame({
-            "Timestamp": list(buffer.timestamps),
-            "Slippage": list(buffer.slippages),
-            "Impact": list(buffer.impacts),
-            "Fees": list(buffer.fees),
-            "Net Cost": list(buffer.net_costs),
-            "Latency (ms)": [l * 1000 for l in buffer.latencies],
-            "Order Role": list(buffer.maker_taker_roles)}).set_index("Timestamp")
+        df = pd.DataFrame(history)
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], unit="s")
+        df = df.set_index("Timestamp")
 
         st.line_chart(df[["Slippage", "Impact", "Fees", "Net Cost", "Latency (ms)"]])
 
@@ -125,4 +115,23 @@ with col2:
             mime="text/csv"
         )
 
-    st.caption("🔄 Live updates powered by WebSocket feed.")
\ No newline at end of file
+    # Engine compute -> rendered, counted once per engine update this session shows
+    if metrics and st.session_state.get("rendered_ns") != metrics["computed_ns"]:
+        st.session_state["rendered_ns"] = metrics["computed_ns"]
+        record_span("model_to_render", metrics["computed_ns"])
+
+    # Pipeline latency percentiles
+    with st.expander("⏱️ Pipeline Latency (ms)"):
+        st.dataframe(pd.DataFrame(latency_snapshot()).T)
+
+    with st.expander("🩺 Feed Integrity"):
+        report = feed.integrity.snapshot()
+        st.dataframe(pd.DataFrame({key: {k: v for k, v in s.items() if k != "lag"} for key, s in report.items()}).T)
+        st.caption("Exchange-to-local lag (ms)")
+        st.dataframe(pd.DataFrame({key: s["lag"] for key, s in report.items()}).T)
+
+    st.caption("🔄 Live updates powered by WebSocket feed.")
+
+
+with col2:
+    output_panel()
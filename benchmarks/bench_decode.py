@@ -0,0 +1,66 @@
+# benchmarks/bench_decode.py
+"""
+Decode throughput per JSON backend on OKX `books` messages.
+
+    python -m benchmarks.bench_decode [--file recorded.jsonl] [--depth 5]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.okx_fixtures import default_messages, load_messages, synthetic_snapshots
+from wsclient.decoder import BookDecoder, available_backends, get_decoder
+
+
+def legacy_decode(message):
+    """The original on_message path: json.loads plus float() on every level."""
+    data = json.loads(message)
+    book_data = data["data"][0]
+    asks = [[float(p[0]), float(p[1])] for p in book_data["asks"]]
+    bids = [[float(p[0]), float(p[1])] for p in book_data["bids"]]
+    return asks, bids
+
+
+def measure(fn, messages, repeat=3):
+    """Best-of-`repeat` throughput in messages per second."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            fn(message)
+        best = min(best, time.perf_counter() - start)
+    return len(messages) / best
+
+
+def run(messages, depth=5, repeat=3):
+    results = {"legacy (json + float lists)": measure(legacy_decode, messages, repeat)}
+    for backend in available_backends():
+        results[f"{backend} (loads only)"] = measure(get_decoder(backend), messages, repeat)
+        decoder = BookDecoder(depth=depth, backend=backend)
+        results[f"{backend} (top {depth} into arrays)"] = measure(decoder.decode, messages, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Recorded raw messages, one per line")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        suites = {args.file: load_messages(args.file)}
+    else:
+        suites = {
+            "incremental updates": default_messages(args.count),
+            "400-level snapshots": synthetic_snapshots(max(args.count // 10, 1)),
+        }
+    for label, messages in suites.items():
+        print(f"📦 {label}: {len(messages)} messages, avg {sum(map(len, messages)) / len(messages):.0f} bytes")
+        for name, rate in run(messages, args.depth, args.repeat).items():
+            print(f"  {name:<32} {rate:>12,.0f} msgs/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/import_report.py
+"""
+Cold-start import report for the app entry points.
+
+Each entry point is imported in a fresh interpreter under
+`python -X importtime`, so the numbers are what an autoscaled container pays
+before it can serve anything.
+
+    python -m benchmarks.import_report                  # all entry points
+    python -m benchmarks.import_report --only feed app  # a subset
+    python -m benchmarks.import_report --top 15 --json import_times.json
+
+Entry points whose dependencies are not installed are reported, not fatal.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> statements run in a fresh interpreter (what that path imports before doing work)
+ENTRY_POINTS = {
+    "app": "import streamlit; import wsclient.okx_ws, utils.latency, utils.metrics_engine",
+    "app_chart": "import pandas",
+    "train_model": "import train_model",
+    "training_pipeline": "import models.maker_taker_training",
+    "sklearn": "import sklearn.linear_model, sklearn.preprocessing",
+    "quote_service": "import service.quote_service",
+    "metrics_engine": "import utils.metrics_engine",
+    "cost_model": "import models.cost_model",
+    "feed": "import wsclient.okx_ws",
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+    - List of (module, self_us, cumulative_us, depth) in import order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure_entry(statements, python=sys.executable):
+    """
+    Import `statements` in a fresh interpreter.
+
+    Returns:
+    - Dict with ok, wall_ms, import_ms (sum of top-level cumulative times),
+      modules (count), rows (parsed importtime output) and error.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run([python, "-X", "importtime", "-W", "ignore", "-c", statements],
+                          cwd=ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1e3
+    rows = parse_importtime(proc.stderr)
+    error = None
+    if proc.returncode != 0:
+        lines = [l for l in proc.stderr.splitlines() if l and not l.startswith("import time:")]
+        error = lines[-1] if lines else f"exit status {proc.returncode}"
+    return {
+        "ok": proc.returncode == 0,
+        "wall_ms": wall_ms,
+        "import_ms": sum(r[2] for r in rows if r[3] == 0) / 1e3,
+        "modules": len(rows),
+        "rows": rows,
+        "error": error,
+    }
+
+
+def heaviest(rows, top=10):
+    """Top-level packages ranked by the time spent importing their own modules: [(package, ms)]."""
+    totals = {}
+    for module, self_us, _, _ in rows:
+        package = module.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    return [(package, us / 1e3) for package, us in ranked[:top]]
+
+
+def run(names=None, top=10):
+    """
+    Measure the selected entry points (all by default).
+
+    Returns:
+    - Dict of name -> {ok, wall_ms, import_ms, modules, heaviest, error}.
+    """
+    results = {}
+    for name in names or ENTRY_POINTS:
+        if name not in ENTRY_POINTS:
+            raise ValueError(f"Unknown entry point: {name}")
+        result = measure_entry(ENTRY_POINTS[name])
+        result["heaviest"] = heaviest(result.pop("rows"), top)
+        results[name] = result
+    return results
+
+
+def format_results(results):
+    lines = [f"{'entry point':<20}{'imports ms':>12}{'wall ms':>10}{'modules':>9}  heaviest"]
+    for name, r in results.items():
+        if not r["ok"]:
+            lines.append(f"{name:<20}{'-':>12}{r['wall_ms']:>10.1f}{r['modules']:>9}  ❌ {r['error']}")
+            continue
+        top = ", ".join(f"{package} {ms:.1f}" for package, ms in r["heaviest"])
+        lines.append(f"{name:<20}{r['import_ms']:>12.1f}{r['wall_ms']:>10.1f}{r['modules']:>9}  {top}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import report for the app entry points.")
+    parser.add_argument("--only", nargs="*", choices=sorted(ENTRY_POINTS), help="Entry points to measure")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest top-level packages to list")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.top)
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"📦 Import report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# benchmarks/okx_fixtures.py
+import os
+
+from wsclient.fixtures import synthetic_book_messages
+
+
+def load_messages(path):
+    """Read recorded raw WebSocket messages, one per line."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def load_capture(directory, prefix="okx"):
+    """Raw messages of a TickRecorder capture directory, in capture order."""
+    from utils.tick_capture import TickReplayer
+    return [message for _, message in TickReplayer(directory, prefix).raw_messages()]
+
+
+def default_messages(count=1000):
+    """
+    Recorded fixtures when present (OKX_FIXTURES env var: a file with one
+    message per line or a TickRecorder capture directory), otherwise synthetic ones.
+    """
+    path = os.environ.get("OKX_FIXTURES")
+    if path and os.path.isdir(path):
+        return load_capture(path)[:count]
+    if path and os.path.exists(path):
+        return load_messages(path)[:count]
+    return synthetic_book_messages(count)
+
+
+def synthetic_snapshots(count=100, depth=400, seed=7):
+    """`count` independent full-depth snapshots (the worst case for decoding)."""
+    return [synthetic_book_messages(1, depth=depth, seed=seed + i)[0] for i in range(count)]
@@ -0,0 +1,487 @@
+# benchmarks/suite.py
+"""
+Offline end-to-end benchmark suite with regression thresholds.
+
+Runs every stage of the pipeline against recorded (or synthetic) OKX
+`books` messages, reports throughput and per-call latency percentiles, and
+compares them with a JSON baseline.
+
+    python -m benchmarks.suite                      # run and compare with the baseline
+    python -m benchmarks.suite --update-baseline    # run and store a new baseline
+    python -m benchmarks.suite --only decode book   # run a subset
+    OKX_FIXTURES=captures/ python -m benchmarks.suite --file recorded.jsonl
+
+Every benchmark runs in --processes fresh interpreters (--in-process to
+disable), so one benchmark's heap and caches never skew the next, and each
+statistic is the median over all passes of all of them; a single process
+can land in a slow memory layout, which no number of passes inside it
+would reveal. Exits with status 1 when a benchmark's
+throughput drops by more than --throughput-threshold, or its p99 rises by
+more than --p99-threshold and by more than --p99-floor µs. Baselines are
+machine specific: regenerate them on the machine that runs the comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.okx_fixtures import default_messages, load_capture, load_messages
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THROUGHPUT_THRESHOLD = 0.20  # allowed fractional drop in msgs/sec
+P99_THRESHOLD = 0.50         # allowed fractional rise in p99 latency
+P99_FLOOR_US = 10.0          # p99 rises smaller than this are scheduler noise, never a regression
+PER_CALL_FLOOR_US = 1.0      # mean per-call slowdowns smaller than this are noise (sub-µs benchmarks)
+
+
+def calibrate(rounds=7):
+    """
+    Median time (µs) of a fixed mixed Python/NumPy workload.
+
+    Measured next to every benchmark and stored with it, so `compare` can
+    tell a slower machine (shared CPU, frequency scaling) from slower code.
+    """
+    data = np.arange(4096, dtype=np.float64)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        total = 0
+        for i in range(20_000):
+            total += i * i % 7
+        for _ in range(50):
+            np.sort(data[::-1]).sum()
+        timings.append(time.perf_counter_ns() - start)
+    return float(np.median(timings)) / 1e3
+
+
+def measure(fn, items, repeat=5, warmup=100):
+    """
+    Time `fn(item)` for every item, `repeat` times, after `warmup` untimed calls.
+
+    The garbage collector is run before and disabled during each pass, and
+    every statistic is the median over the passes, so one lucky or unlucky
+    pass moves neither the result nor the baseline.
+
+    Returns:
+    - Dict with count, msgs_per_sec and p50/p90/p99/max latency in µs.
+    """
+    totals = []
+    percentiles = []
+    clock = time.perf_counter_ns
+    for item in items[:warmup]:
+        fn(item)
+    gc_was_enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            durations = np.empty(len(items), dtype=np.int64)
+            gc.collect()
+            gc.disable()
+            start = clock()
+            for i, item in enumerate(items):
+                t0 = clock()
+                fn(item)
+                durations[i] = clock() - t0
+            totals.append(clock() - start)
+            if gc_was_enabled:
+                gc.enable()
+            percentiles.append(np.percentile(durations / 1e3, (50, 90, 99, 100)))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    total = float(np.median(totals))
+    p50, p90, p99, worst = np.median(percentiles, axis=0)
+    return {
+        "count": len(items),
+        "msgs_per_sec": len(items) / (total / 1e9) if total > 0 else float("inf"),
+        "p50_us": float(p50),
+        "p90_us": float(p90),
+        "p99_us": float(p99),
+        "max_us": float(worst),
+    }
+
+
+# ----------------------------------------------------------------------
+# Benchmarks: each takes the raw messages and returns (callable, items)
+# ----------------------------------------------------------------------
+def bench_decode(messages):
+    from wsclient.decoder import get_decoder
+    return get_decoder(), messages
+
+
+def bench_decode_levels(messages):
+    from wsclient.decoder import BookDecoder
+    return BookDecoder(depth=5).decode, messages
+
+
+def _book_payloads(messages):
+    payloads = []
+    for message in messages:
+        data = json.loads(message)
+        if data.get("arg", {}).get("channel") == "books" and "data" in data:
+            payloads.append((data["data"][0], data.get("action", "snapshot"), data["arg"]["instId"]))
+    return payloads
+
+
+def bench_book_apply(messages):
+    from wsclient.orderbook import OrderBook
+    books = {}
+
+    def apply(payload):
+        book_data, action, inst_id = payload
+        book = books.get(inst_id)
+        if book is None:
+            book = books[inst_id] = OrderBook(inst_id)
+        book.apply(book_data, action)
+
+    return apply, _book_payloads(messages)
+
+
+def _feed(messages):
+    from wsclient.feed_manager import FeedManager
+    inst_ids = sorted({p[2] for p in _book_payloads(messages[:50])}) or ["BTC-USDT"]
+    feed = FeedManager(inst_ids)
+    return feed, inst_ids
+
+
+def bench_feed_on_message(messages):
+    feed, _ = _feed(messages)
+    return (lambda message: feed.on_message(None, message)), messages
+
+
+def _ready_book(messages):
+    """The first instrument's book after applying every message."""
+    feed, inst_ids = _feed(messages)
+    for message in messages:
+        feed.on_message(None, message)
+    return feed, feed.get_book(inst_ids[0]), inst_ids[0]
+
+
+def _orders(count=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "quantity_usd": rng.uniform(10, 100_000, count),
+        "volatility": rng.uniform(0.01, 0.5, count),
+        "side": np.where(rng.random(count) < 0.5, "buy", "sell"),
+    }
+
+
+def bench_slippage(messages):
+    from models.slippage_model import walk_book
+    _, book, _ = _ready_book(messages)
+    ask_px, ask_sz = book.asks.levels()
+    mid = book.mid()
+    return (lambda q: walk_book(q, ask_px, ask_sz, mid=mid)), _orders()["quantity_usd"].tolist()
+
+
+def bench_impact(messages):
+    from models.impact_model import estimate_market_impact
+    orders = _orders()
+    items = list(zip(orders["quantity_usd"].tolist(), orders["volatility"].tolist()))
+    return (lambda item: estimate_market_impact(*item)), items
+
+
+def bench_almgren_chriss(messages):
+    from models.almgren_chriss import optimal_trajectory
+    items = _orders(200)["quantity_usd"].tolist()
+    return (lambda q: optimal_trajectory(q / 60000, 1.0, 20, 1500.0, 0.05, 0.005, 1e-6)), items
+
+
+def bench_almgren_chriss_cached(messages):
+    from models.almgren_chriss import solve
+    # The same handful of parameter sets queried over and over
+    items = [1000.0, 5000.0, 10000.0, 50000.0] * 250
+    return (lambda q: solve(q / 60000, 1500.0, 0.05, 0.005, 1.0, 20, 1e-6)), items
+
+
+def bench_fees(messages):
+    from models.fee_model import calculate_fees
+    items = _orders()["quantity_usd"].tolist()
+    return (lambda q: calculate_fees(q, "VIP 1", False, True)), items
+
+
+def bench_maker_taker(messages):
+    from models.maker_taker_model import load_model, predict_maker_taker
+    load_model()
+    orders = _orders()
+    items = list(zip(orders["quantity_usd"].tolist(), orders["volatility"].tolist()))
+    return (lambda item: predict_maker_taker(item[0], item[1], 0.1)), items
+
+
+def bench_monte_carlo(messages):
+    from models.monte_carlo import run_simulation
+    items = [10_000.0, 100_000.0, 1_000_000.0] * 10
+    return (lambda q: run_simulation(q, 60000.0, 0.03, paths=2000, shards=4, workers=1)), items
+
+
+def bench_cost_batch(messages):
+    from models.cost_model import estimate_costs
+    _, book, _ = _ready_book(messages)
+    orders = _orders()
+    return (lambda _: estimate_costs(orders, book)), list(range(100))
+
+
+def bench_market_stats(messages):
+    from utils.market_stats import MarketStats
+    _, book, inst_id = _ready_book(messages)
+    stats = MarketStats(inst_id)
+    # One estimator update per message, 10ms apart, against the final book
+    return (lambda i: stats.update(book, t=i * 0.01)), list(range(1, len(messages) + 1))
+
+
+def bench_engine_step(messages):
+    from utils.metrics_engine import MetricsEngine
+    feed, _, inst_id = _ready_book(messages)
+    engine = MetricsEngine(feed, inst_id)
+    book = feed.get_book(inst_id)
+
+    def step(_):
+        book.updates += 1  # Force a recomputation every call
+        engine.step()
+
+    return step, list(range(1000))
+
+
+def bench_dashboard_snapshot(messages):
+    from utils.latency import snapshot as latency_snapshot
+    from utils.metrics_engine import MetricsEngine
+    feed, _, inst_id = _ready_book(messages)
+    engine = MetricsEngine(feed, inst_id)
+    book = feed.get_book(inst_id)
+    for _ in range(5000):
+        book.updates += 1
+        engine.step()
+
+    def render(_):
+        engine.latest()
+        engine.history(n=5000)
+        latency_snapshot()
+
+    return render, list(range(200))
+
+
+BENCHMARKS = {
+    "decode": bench_decode,
+    "decode_levels": bench_decode_levels,
+    "book_apply": bench_book_apply,
+    "feed_on_message": bench_feed_on_message,
+    "slippage_walk": bench_slippage,
+    "impact": bench_impact,
+    "almgren_chriss": bench_almgren_chriss,
+    "almgren_chriss_cached": bench_almgren_chriss_cached,
+    "fees": bench_fees,
+    "maker_taker": bench_maker_taker,
+    "monte_carlo": bench_monte_carlo,
+    "cost_batch_1k": bench_cost_batch,
+    "market_stats": bench_market_stats,
+    "engine_step": bench_engine_step,
+    "dashboard_snapshot": bench_dashboard_snapshot,
+}
+
+
+def run_one(name, messages, repeat=5):
+    """Measure one benchmark in this process. Returns its results, or None without input."""
+    fn, items = BENCHMARKS[name](messages)
+    if not len(items):
+        return None
+    before = calibrate()
+    result = measure(fn, items, repeat)
+    result["calibration_us"] = (before + calibrate()) / 2
+    return result
+
+
+def run_isolated(name, messages_path, repeat=5, processes=5):
+    """
+    Measure one benchmark in `processes` fresh interpreters reading the
+    messages from `messages_path`. Returns the median of every statistic.
+    """
+    runs = []
+    for _ in range(processes):
+        proc = subprocess.run(
+            [sys.executable, "-W", "ignore", "-m", "benchmarks.suite", "--worker", name,
+             "--file", messages_path, "--repeat", str(repeat)],
+            cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name} failed:\n{proc.stderr}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result is None:
+            return None
+        runs.append(result)
+    return {key: float(np.median([r[key] for r in runs])) if key != "count" else runs[0][key]
+            for key in runs[0]}
+
+
+def run(messages, names=None, repeat=5, isolate=True, processes=5):
+    """
+    Run the selected benchmarks (name prefixes; all by default).
+
+    Parameters:
+    - isolate: Run each benchmark in `processes` interpreters of its own, so
+      results depend neither on which benchmarks ran before it nor on one
+      process's memory layout.
+    """
+    selected = [name for name in BENCHMARKS if not names or any(name.startswith(p) for p in names)]
+    results = {}
+    messages_path = None
+    if isolate:
+        fd, messages_path = tempfile.mkstemp(prefix="okx_bench_", suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(messages) + "\n")
+    try:
+        for name in selected:
+            if isolate:
+                result = run_isolated(name, messages_path, repeat, processes)
+            else:
+                result = run_one(name, messages, repeat)
+            if result is None:
+                print(f"⚠️ {name}: no input, skipped")
+                continue
+            results[name] = result
+    finally:
+        if messages_path is not None:
+            os.remove(messages_path)
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_baseline(results, path=BASELINE_PATH, fixtures=None):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "fixtures": fixtures, "results": results}, f, indent=2)
+        f.write("\n")
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare(results, baseline, throughput_threshold=THROUGHPUT_THRESHOLD, p99_threshold=P99_THRESHOLD,
+            p99_floor_us=P99_FLOOR_US):
+    """
+    Regressions of `results` against a baseline's results. A p99 only
+    regresses when it rises by more than `p99_threshold` and by more than
+    `p99_floor_us`, and throughput only when the mean call also got more
+    than PER_CALL_FLOOR_US slower, so sub-µs benchmarks (whose speed varies
+    with the process's memory layout) are not failed by noise.
+
+    When both sides carry `calibration_us`, the current numbers are first
+    rescaled by how much faster or slower the machine ran the calibration
+    workload, so a busy host is not reported as a code regression.
+
+    Returns:
+    - List of human-readable regression messages (empty when everything passes).
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        slowdown = machine_slowdown(current, base)
+        throughput = current["msgs_per_sec"] * slowdown
+        p99 = current["p99_us"] / slowdown
+        note = f" (machine-adjusted ×{slowdown:.2f})" if slowdown != 1.0 else ""
+        per_call_us = 1e6 / throughput - 1e6 / base["msgs_per_sec"]
+        if throughput < base["msgs_per_sec"] * (1 - throughput_threshold) and per_call_us > PER_CALL_FLOOR_US:
+            regressions.append(f"{name}: throughput {throughput:,.0f}/s{note} "
+                               f"< baseline {base['msgs_per_sec']:,.0f}/s - {throughput_threshold:.0%}")
+        if p99 > base["p99_us"] * (1 + p99_threshold) and p99 - base["p99_us"] > p99_floor_us:
+            regressions.append(f"{name}: p99 {p99:,.1f}µs{note} "
+                               f"> baseline {base['p99_us']:,.1f}µs + {p99_threshold:.0%}")
+    return regressions
+
+
+def machine_slowdown(current, base):
+    """How much slower the machine ran the calibration workload than for the baseline (1.0 if unknown)."""
+    if current.get("calibration_us") and base.get("calibration_us"):
+        return current["calibration_us"] / base["calibration_us"]
+    return 1.0
+
+
+def format_results(results, baseline=None):
+    lines = [f"{'benchmark':<24}{'msgs/sec':>14}{'p50 µs':>11}{'p90 µs':>11}{'p99 µs':>11}{'vs base':>10}"]
+    for name, r in results.items():
+        change = ""
+        if baseline and name in baseline:
+            base = baseline[name]
+            change = f"{r['msgs_per_sec'] * machine_slowdown(r, base) / base['msgs_per_sec'] - 1:+.0%}"
+        lines.append(f"{name:<24}{r['msgs_per_sec']:>14,.0f}{r['p50_us']:>11,.1f}"
+                     f"{r['p90_us']:>11,.1f}{r['p99_us']:>11,.1f}{change:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Recorded raw messages, one per line")
+    parser.add_argument("--capture", help="TickRecorder capture directory")
+    parser.add_argument("--count", type=int, default=3000, help="Messages to use")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="Benchmark name prefixes to run")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--throughput-threshold", type=float, default=THROUGHPUT_THRESHOLD)
+    parser.add_argument("--p99-threshold", type=float, default=P99_THRESHOLD)
+    parser.add_argument("--p99-floor", type=float, default=P99_FLOOR_US, help="Minimum p99 rise (µs) to fail")
+    parser.add_argument("--processes", type=int, default=5, help="Fresh interpreters per benchmark")
+    parser.add_argument("--in-process", action="store_true", help="Run every benchmark in this interpreter")
+    parser.add_argument("--json", help="Also write this run's results to a JSON file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)  # one isolated benchmark; prints JSON
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_one(args.worker, load_messages(args.file), args.repeat)))
+        return 0
+
+    if args.file:
+        messages, fixtures = load_messages(args.file)[:args.count], args.file
+    elif args.capture:
+        messages, fixtures = load_capture(args.capture)[:args.count], args.capture
+    else:
+        messages = default_messages(args.count)
+        fixtures = os.environ.get("OKX_FIXTURES") or f"synthetic:{args.count}"
+    print(f"📦 {len(messages)} messages from {fixtures}")
+
+    results = run(messages, args.only, args.repeat, isolate=not args.in_process, processes=args.processes)
+    if args.json:
+        save_baseline(results, args.json, fixtures)
+
+    if args.update_baseline:
+        print(format_results(results))
+        save_baseline(results, args.baseline, fixtures)
+        print(f"✅ Baseline written to {args.baseline}")
+        return 0
+
+    stored = load_baseline(args.baseline)
+    print(format_results(results, stored["results"] if stored else None))
+    if stored is None:
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    regressions = compare(results, stored["results"], args.throughput_threshold, args.p99_threshold,
+                          args.p99_floor)
+    for message in regressions:
+        print(f"❌ {message}")
+    if regressions:
+        return 1
+    print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
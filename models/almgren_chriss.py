@@ -0,0 +1,238 @@
+# models/almgren_chriss.py
+from functools import lru_cache
+
+import numpy as np
+
+# Significant digits kept when quantizing parameters for the solution cache
+CACHE_SIGNIFICANT_DIGITS = 4
+CACHE_SIZE = 4096
+
+
+def optimal_trajectory(quantity, horizon, n_slices, volatility, eta, gamma=0.0, risk_aversion=0.0):
+    """
+    Almgren-Chriss optimal liquidation trajectory (discrete-time closed form).
+
+        x_k = X sinh(κ(T - t_k)) / sinh(κT),   cosh(κτ) = 1 + κ̃²τ²/2,   κ̃² = λσ²/η̃
+
+    Parameters:
+    - quantity: Shares (base units) to trade, X.
+    - horizon: Total time to trade, T.
+    - n_slices: Number of trading intervals, N.
+    - volatility: Absolute price volatility per unit time (σ, in price units).
+    - eta: Temporary impact coefficient (price per unit trading rate).
+    - gamma: Permanent impact coefficient (price per share).
+    - risk_aversion: Risk-aversion λ; 0 gives the straight-line (TWAP) schedule.
+
+    Returns:
+    - (holdings, trades): N+1 remaining positions x_0..x_N and the N trade sizes.
+    """
+    tau = horizon / n_slices
+    eta_tilde = eta - 0.5 * gamma * tau
+    t = np.arange(n_slices + 1) * tau
+    if risk_aversion <= 0 or volatility <= 0 or eta_tilde <= 0:
+        holdings = quantity * (1 - t / horizon)
+        return holdings, -np.diff(holdings)
+
+    kappa_tilde_sq = risk_aversion * volatility ** 2 / eta_tilde
+    kappa = np.arccosh(1 + 0.5 * kappa_tilde_sq * tau ** 2) / tau
+    # sinh ratios overflow for very large κT; the trajectory is then a near-immediate trade
+    with np.errstate(over="ignore", invalid="ignore"):
+        holdings = quantity * np.sinh(kappa * (horizon - t)) / np.sinh(kappa * horizon)
+    if not np.all(np.isfinite(holdings)):
+        holdings = quantity * np.exp(-kappa * t)
+        holdings[-1] = 0.0
+    return holdings, -np.diff(holdings)
+
+
+def cost_moments(holdings, trades, horizon, volatility, eta, gamma=0.0, epsilon=0.0):
+    """
+    Expected implementation shortfall and its variance for a schedule.
+
+        E = ½γX² + ε Σ|n_k| + (η̃/τ) Σ n_k²,    V = σ² τ Σ x_k²
+
+    Parameters:
+    - holdings, trades: Output of `optimal_trajectory` (or any schedule).
+    - epsilon: Fixed cost per share (half spread plus fees).
+
+    Returns:
+    - (expected_cost, variance) in price x shares (USD for USD prices).
+    """
+    holdings = np.asarray(holdings, dtype=np.float64)
+    trades = np.asarray(trades, dtype=np.float64)
+    n_slices = len(trades)
+    tau = horizon / n_slices
+    quantity = holdings[0]
+    eta_tilde = eta - 0.5 * gamma * tau
+    expected = 0.5 * gamma * quantity ** 2 + epsilon * np.abs(trades).sum() + eta_tilde / tau * (trades ** 2).sum()
+    variance = volatility ** 2 * tau * (holdings[1:] ** 2).sum()
+    return float(expected), float(variance)
+
+
+def efficient_frontier(quantity, horizon, n_slices, volatility, eta, gamma=0.0, epsilon=0.0,
+                       risk_aversions=None):
+    """
+    Expected cost vs. variance of the optimal schedule across risk aversions.
+
+    Returns:
+    - Dict of arrays: risk_aversion, expected_cost, variance, std.
+    """
+    if risk_aversions is None:
+        risk_aversions = np.concatenate(([0.0], np.logspace(-9, -3, 31)))
+    risk_aversions = np.asarray(risk_aversions, dtype=np.float64)
+    expected = np.empty(len(risk_aversions))
+    variance = np.empty(len(risk_aversions))
+    for i, lam in enumerate(risk_aversions):
+        sol = solve(quantity, volatility, eta, gamma, horizon, n_slices, lam, epsilon)
+        expected[i] = sol["expected_cost"]
+        variance[i] = sol["variance"]
+    return {
+        "risk_aversion": risk_aversions,
+        "expected_cost": expected,
+        "variance": variance,
+        "std": np.sqrt(variance),
+    }
+
+
+def _quantize(value):
+    return float(f"{float(value):.{CACHE_SIGNIFICANT_DIGITS}g}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _solve_cached(quantity, volatility, eta, gamma, horizon, n_slices, risk_aversion, epsilon):
+    holdings, trades = optimal_trajectory(quantity, horizon, n_slices, volatility, eta, gamma, risk_aversion)
+    expected, variance = cost_moments(holdings, trades, horizon, volatility, eta, gamma, epsilon)
+    # The cached arrays are shared between callers, so make them immutable
+    holdings.flags.writeable = False
+    trades.flags.writeable = False
+    return {
+        "holdings": holdings,
+        "trades": trades,
+        "expected_cost": expected,
+        "variance": variance,
+        "std": variance ** 0.5,
+    }
+
+
+def solve(quantity, volatility, eta, gamma, horizon, n_slices, risk_aversion, epsilon=0.0):
+    """
+    Memoized optimal schedule and cost moments.
+
+    Parameters are quantized to CACHE_SIGNIFICANT_DIGITS significant digits,
+    so repeated queries with (nearly) the same (size, σ, η, γ, T, N, λ) are
+    served from an LRU cache in O(1). Each call gets its own dict, so callers
+    may add or overwrite keys; the arrays in it are shared and read-only.
+
+    Returns:
+    - Dict with holdings, trades, expected_cost, variance and std.
+    """
+    return dict(_solve_cached(_quantize(quantity), _quantize(volatility), _quantize(eta), _quantize(gamma),
+                         _quantize(horizon), int(n_slices), _quantize(risk_aversion), _quantize(epsilon)))
+
+
+def cache_info():
+    return _solve_cached.cache_info()
+
+
+def clear_cache():
+    _solve_cached.cache_clear()
+
+
+def calibrate_impact(books, tau=1.0, sizes_usd=None, mid_changes=None, signed_volume=None,
+                     permanent_ratio=0.1):
+    """
+    Calibrate temporary/permanent impact coefficients from recorded books.
+
+    Temporary impact: for every book the depth is walked for a ladder of
+    order sizes, and the price concession (VWAP - mid) is regressed through
+    the origin on shares traded. A concession of `slope * n` for `n` shares
+    traded over an interval τ gives η = slope * τ. ε is the mean half spread.
+
+    Permanent impact: the least-squares slope of mid-price changes on signed
+    traded volume when both are given; otherwise `permanent_ratio * slope`
+    (the Almgren-Chriss rule of thumb of permanent ≈ 10% of temporary).
+
+    Parameters:
+    - books: Iterable of OrderBook objects or legacy {"asks", "bids"} dicts.
+    - tau: Trading interval length in the time unit used for the schedule.
+    - sizes_usd: Order ladder for the depth walk (default 1k..1M USD).
+    - mid_changes, signed_volume: Aligned arrays from recorded trades, optional.
+
+    Returns:
+    - Dict with eta, gamma, epsilon, slope and the number of books used.
+    """
+    from models.cost_model import book_sides
+    from models.slippage_model import walk_book_batch
+
+    if sizes_usd is None:
+        sizes_usd = np.logspace(3, 6, 16)
+    sizes_usd = np.asarray(sizes_usd, dtype=np.float64)
+
+    shares, concessions, half_spreads = [], [], []
+    for book in books:
+        ask_px, ask_sz, bid_px, bid_sz = book_sides(book)
+        if len(ask_px) == 0 or len(bid_px) == 0:
+            continue
+        mid = (ask_px[0] + bid_px[0]) / 2
+        half_spreads.append((ask_px[0] - bid_px[0]) / 2)
+        for side, px, sz in (("buy", ask_px, ask_sz), ("sell", bid_px, bid_sz)):
+            walked = walk_book_batch(sizes_usd, px, sz, mid=mid, side=side)
+            filled = walked["unfilled_usd"] == 0
+            shares.append(walked["filled_qty"][filled])
+            concessions.append(np.abs(walked["fill_price"][filled] - mid))
+
+    if not shares:
+        raise ValueError("No usable books to calibrate from")
+    shares = np.concatenate(shares)
+    concessions = np.concatenate(concessions)
+    epsilon = float(np.mean(half_spreads))
+    # Concession beyond the half spread, regressed through the origin
+    excess = np.maximum(concessions - epsilon, 0.0)
+    slope = float(shares @ excess / (shares @ shares)) if shares.size else 0.0
+
+    if mid_changes is not None and signed_volume is not None:
+        v = np.asarray(signed_volume, dtype=np.float64)
+        dm = np.asarray(mid_changes, dtype=np.float64)
+        gamma = float(v @ dm / (v @ v)) if v @ v > 0 else 0.0
+    else:
+        gamma = permanent_ratio * slope
+
+    return {
+        "eta": slope * tau,
+        "gamma": gamma,
+        "epsilon": epsilon,
+        "slope": slope,
+        "books": len(half_spreads),
+    }
+
+
+def books_from_capture(directory, inst_id, prefix="okx", every=100, source="raw"):
+    """
+    Rebuild `inst_id`'s book from a TickRecorder capture and yield it every
+    `every` applied updates. The same OrderBook object is yielded each time.
+    """
+    import json
+
+    from utils.tick_capture import TickReplayer
+    from wsclient.orderbook import OrderBook
+
+    replayer = TickReplayer(directory, prefix)
+    messages = replayer.raw_messages() if source == "raw" else replayer.normalized_messages()
+    book = OrderBook(inst_id, verify_checksum=(source == "raw"))
+    applied = 0
+    for _, message in messages:
+        msg = json.loads(message)
+        arg = msg.get("arg", {})
+        if arg.get("instId") != inst_id or arg.get("channel") != "books" or "data" not in msg:
+            continue
+        for book_data in msg["data"]:
+            if not book.apply(book_data, msg.get("action", "snapshot")):
+                book.reset()
+                continue
+            applied += 1
+            if applied % every == 0:
+                yield book
+
+
+def calibrate_from_capture(directory, inst_id, prefix="okx", every=100, tau=1.0, **kwargs):
+    """`calibrate_impact` over books rebuilt from a TickRecorder capture."""
+    return calibrate_impact(books_from_capture(directory, inst_id, prefix, every), tau=tau, **kwargs)
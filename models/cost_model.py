@@ -0,0 +1,125 @@
+# models/cost_model.py
+import numpy as np
+
+from models.fee_model import calculate_fees_batch
+from models.impact_model import estimate_market_impact
+from models.maker_taker_model import active_model, predict_maker_taker_batch
+from models.slippage_model import walk_book_batch
+
+COST_COLUMNS = ("fill_price", "slippage", "impact", "fee", "net_cost", "unfilled_usd",
+                "maker_prob", "predicted_role", "model_version")
+
+
+def book_sides(book):
+    """
+    Normalize a book into (ask_prices, ask_sizes, bid_prices, bid_sizes) arrays.
+
+    Accepts an OrderBook (zero-copy views of its arrays) or the legacy
+    {"asks": [[price, size], ...], "bids": [...]} dict.
+    """
+    if hasattr(book, "depth_levels"):
+        bid_px, bid_sz, ask_px, ask_sz = book.depth_levels()
+        return ask_px, ask_sz, bid_px, bid_sz
+    asks = np.asarray(book.get("asks", []), dtype=np.float64).reshape(-1, 2)
+    bids = np.asarray(book.get("bids", []), dtype=np.float64).reshape(-1, 2)
+    return asks[:, 0], asks[:, 1], bids[:, 0], bids[:, 1]
+
+
+def _columns(orders):
+    if hasattr(orders, "columns"):
+        return {name: orders[name].to_numpy() for name in orders.columns}
+    return dict(orders)
+
+
+def estimate_costs(orders, book, fee_tier="Tier 1", volume=1e6, lambda_param=0.01, stats=None):
+    """
+    Price every order in `orders` against one book snapshot in a single vectorized pass.
+
+    Parameters:
+    - orders: Dict of arrays or a DataFrame with columns
+        - quantity_usd (required): Order notional in USD.
+        - volatility: Asset volatility (σ) per order (required unless `stats` is given).
+        - fee_tier: Tier names or TIER_RATES row indices (defaults to `fee_tier`).
+        - is_maker: Booleans, or a `role` column of "Maker"/"Taker" strings (default taker).
+        - is_vip: Booleans applying the VIP discount (default: tier name starts with "VIP").
+        - side: "buy"/"sell" per order (default buy).
+        - spread: Spread feature for the maker/taker model (default top-of-book spread).
+    - book: OrderBook or legacy {"asks", "bids"} dict.
+    - stats: Optional MarketStats snapshot (see utils.market_stats) supplying the
+      live volatility and top-of-book spread when the orders do not.
+    - fee_tier: Tier used when the orders carry no `fee_tier` column.
+    - volume, lambda_param: Passed to `estimate_market_impact`.
+
+    Returns:
+    - Dict of arrays (or a DataFrame when `orders` is one) with the COST_COLUMNS.
+    """
+    cols = _columns(orders)
+    qty = np.atleast_1d(np.asarray(cols["quantity_usd"], dtype=np.float64))
+    n = len(qty)
+    if "volatility" in cols:
+        volatility = cols["volatility"]
+    elif stats is not None:
+        volatility = stats["volatility"]
+    else:
+        raise KeyError("volatility")
+    volatility = np.broadcast_to(np.asarray(volatility, dtype=np.float64), (n,))
+
+    tiers = np.broadcast_to(np.asarray(cols.get("fee_tier", fee_tier)), (n,))
+    if "is_maker" in cols:
+        is_maker = np.asarray(cols["is_maker"], dtype=bool)
+    elif "role" in cols:
+        is_maker = np.char.lower(np.asarray(cols["role"], dtype=str)) == "maker"
+    else:
+        is_maker = np.zeros(n, dtype=bool)
+    if "is_vip" in cols:
+        is_vip = np.asarray(cols["is_vip"], dtype=bool)
+    elif tiers.dtype.kind in "US":
+        is_vip = np.char.startswith(tiers.astype(str), "VIP")
+    else:
+        is_vip = False
+
+    ask_px, ask_sz, bid_px, bid_sz = book_sides(book)
+    has_top = len(ask_px) > 0 and len(bid_px) > 0
+    mid = (ask_px[0] + bid_px[0]) / 2 if has_top else None
+
+    # Slippage: one cumulative-depth walk per side
+    fill_price = np.full(n, np.nan)
+    slippage = np.zeros(n)
+    unfilled = np.zeros(n)
+    is_sell = np.asarray(cols["side"], dtype=str) == "sell" if "side" in cols else np.zeros(n, dtype=bool)
+    for side, mask, px, sz in (("buy", ~is_sell, ask_px, ask_sz), ("sell", is_sell, bid_px, bid_sz)):
+        if not mask.any():
+            continue
+        walked = walk_book_batch(qty[mask], px, sz, mid=mid, side=side)
+        fill_price[mask] = walked["fill_price"]
+        slippage[mask] = walked["slippage"]
+        unfilled[mask] = walked["unfilled_usd"]
+
+    impact = estimate_market_impact(qty, volatility, volume=volume, lambda_param=lambda_param)
+    fee = calculate_fees_batch(qty, tiers, is_maker=is_maker, is_vip=is_vip)
+    net_cost = slippage + impact + fee
+
+    if "spread" in cols:
+        spread = cols["spread"]
+    elif stats is not None:
+        spread = stats["spread"]
+    else:
+        spread = ask_px[0] - bid_px[0] if has_top else 0.0
+    model = active_model()
+    maker_prob = predict_maker_taker_batch(qty, volatility, spread, model=model)
+
+    result = {
+        "fill_price": fill_price,
+        "slippage": slippage,
+        "impact": impact,
+        "fee": fee,
+        "net_cost": net_cost,
+        "unfilled_usd": unfilled,
+        "maker_prob": maker_prob,
+        "predicted_role": np.where(maker_prob > 0.5, "Maker", "Taker"),
+        "model_version": np.full(n, model.version),
+    }
+    if hasattr(orders, "columns"):
+        import pandas as pd
+        return pd.DataFrame(result, index=orders.index)
+    return result
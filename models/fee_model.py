@@ -1,14 +1,202 @@
 # models/fee_model.py
+import json
+import numbers
+import os
+from types import MappingProxyType
 
-# Define the fee tiers for different fee levels on the exchange
-FEE_TIERS = {
-    "Tier 1": {"maker": 0.0008, "taker": 0.0010},
-    "Tier 2": {"maker": 0.0006, "taker": 0.0008},
-    "Tier 3": {"maker": 0.0005, "taker": 0.0007},
-    "VIP 1": {"maker": 0.0004, "taker": 0.0006},
-    "VIP 2": {"maker": 0.0003, "taker": 0.0005},
-    "VIP 3": {"maker": 0.0002, "taker": 0.0004},
-}
+import numpy as np
+
+FEE_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "fee_schedules.json")
+DEFAULT_EXCHANGE = "okx"
+DEFAULT_INSTRUMENT_TYPE = "spot"
+
+# Column of a role in the rate table
+MAKER, TAKER = 0, 1
+
+
+class FeeEngine:
+    """
+    Immutable fee schedule for one exchange and instrument type.
+
+    Effective rates, with the VIP discount already applied to positive
+    rates (rebates are left untouched), are precomputed into one flat,
+    read-only array laid out as `[tier][is_vip][role]`:
+
+        rates[(tier * 2 + is_vip) * 2 + role]    role: 0 = maker, 1 = taker
+
+    Every lookup is then pure index arithmetic with no branches on the
+    order's attributes, and nothing shared is ever written after __init__.
+
+    Parameters:
+    - exchange, instrument_type: Labels of the schedule.
+    - tiers: List of {"name", "min_volume_30d", "maker", "taker"} dicts,
+      ordered by ascending 30-day volume threshold.
+    - discounts: {"vip": factor} multiplier for VIP accounts (default 1.0).
+    """
+
+    __slots__ = ("exchange", "instrument_type", "tier_names", "thresholds", "rates",
+                 "_rate_list", "_index")
+
+    def __init__(self, exchange, instrument_type, tiers, discounts=None):
+        vip_factor = float((discounts or {}).get("vip", 1.0))
+        base = np.array([[t["maker"], t["taker"]] for t in tiers], dtype=np.float64)
+        discounted = np.where(base > 0, base * vip_factor, base)
+        rates = np.stack([base, discounted], axis=1).reshape(-1)
+        thresholds = np.array([t.get("min_volume_30d", 0) for t in tiers], dtype=np.float64)
+        if np.any(np.diff(thresholds) < 0):
+            raise ValueError(f"{exchange}/{instrument_type}: tiers must be ordered by min_volume_30d")
+        rates.flags.writeable = False
+        thresholds.flags.writeable = False
+
+        set_ = object.__setattr__
+        set_(self, "exchange", exchange)
+        set_(self, "instrument_type", instrument_type)
+        set_(self, "tier_names", tuple(t["name"] for t in tiers))
+        set_(self, "thresholds", thresholds)
+        set_(self, "rates", rates)
+        set_(self, "_rate_list", tuple(rates.tolist()))
+        set_(self, "_index", MappingProxyType({name: i for i, name in enumerate(self.tier_names)}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FeeEngine is immutable")
+
+    def __repr__(self):
+        return f"FeeEngine({self.exchange!r}, {self.instrument_type!r}, tiers={len(self.tier_names)})"
+
+    # ------------------------------------------------------------------
+    # Tier resolution
+    # ------------------------------------------------------------------
+    def tier_index(self, fee_tier):
+        """
+        Row of a tier: a tier name, or an integer index (Python or NumPy, as
+        returned by `tier_for_volume`). Raises ValueError for unknown tiers.
+        """
+        if isinstance(fee_tier, str):
+            index = self._index.get(fee_tier)
+            if index is not None:
+                return index
+        elif isinstance(fee_tier, numbers.Integral):
+            index = int(fee_tier)
+            if 0 <= index < len(self.tier_names):
+                return index
+            raise ValueError(f"{self.exchange}/{self.instrument_type}: no fee tier {index}")
+        raise ValueError(f"{self.exchange}/{self.instrument_type}: unknown fee tier {fee_tier!r}")
+
+    def tier_indices(self, fee_tier):
+        """Vectorized `tier_index`; integer arrays are passed through as indices."""
+        tiers = np.asarray(fee_tier)
+        if tiers.dtype.kind in "iu":
+            if tiers.size and (tiers.min() < 0 or tiers.max() >= len(self.tier_names)):
+                raise ValueError(f"{self.exchange}/{self.instrument_type}: fee tier index out of range")
+            return tiers.astype(np.intp)
+        names, inverse = np.unique(tiers, return_inverse=True)
+        lookup = np.array([self.tier_index(n) for n in names.tolist()], dtype=np.intp)
+        return lookup[inverse.reshape(tiers.shape)]
+
+    def tier_for_volume(self, volume_30d):
+        """Tier index (scalar or array) earned by a trailing 30-day USD volume."""
+        idx = np.searchsorted(self.thresholds, volume_30d, side="right") - 1
+        return np.maximum(idx, 0)
+
+    def tier_name_for_volume(self, volume_30d):
+        return self.tier_names[int(self.tier_for_volume(volume_30d))]
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def rate(self, fee_tier, is_maker=False, is_vip=False):
+        """Effective fee rate of one order (negative for a rebate)."""
+        tier = self.tier_index(fee_tier)
+        return self._rate_list[(tier * 2 + bool(is_vip)) * 2 + 1 - bool(is_maker)]
+
+    def fee(self, quantity_usd, fee_tier, is_maker=False, is_vip=False):
+        """Fee in USD of one order."""
+        return quantity_usd * self.rate(fee_tier, is_maker, is_vip)
+
+    def flat_indices(self, tier_idx, is_maker=False, is_vip=False, out=None):
+        """Positions in `rates` for arrays of (tier index, is_maker, is_vip)."""
+        out = np.multiply(tier_idx, 2, out=out, casting="unsafe")
+        out += np.asarray(is_vip, dtype=np.intp)
+        out *= 2
+        out += 1
+        out -= np.asarray(is_maker, dtype=np.intp)
+        return out
+
+    def rates_for(self, tier_idx, is_maker=False, is_vip=False):
+        """Vectorized effective rates for integer tier indices."""
+        return self.rates[self.flat_indices(np.asarray(tier_idx, dtype=np.intp), is_maker, is_vip)]
+
+    def fees(self, quantity_usd, tier_idx, is_maker=False, is_vip=False, out=None, index_out=None):
+        """
+        Vectorized fees in USD. Arguments broadcast against each other.
+
+        Parameters:
+        - quantity_usd: Array of trade amounts in USD.
+        - tier_idx: Integer tier indices (see `tier_indices` / `tier_for_volume`).
+        - is_maker, is_vip: Boolean arrays or scalars.
+        - out, index_out: Optional preallocated float64 / intp arrays of the
+          broadcast shape, so hot loops allocate nothing.
+        """
+        idx = self.flat_indices(np.asarray(tier_idx, dtype=np.intp), is_maker, is_vip, out=index_out)
+        if out is None:
+            return self.rates.take(idx) * np.asarray(quantity_usd, dtype=np.float64)
+        self.rates.take(idx, out=out)
+        out *= quantity_usd
+        return out
+
+    def table(self):
+        """{tier: {"maker", "taker", "maker_vip", "taker_vip"}} view of the effective rates."""
+        r = self._rate_list
+        return {
+            name: {"maker": r[4 * i], "taker": r[4 * i + 1], "maker_vip": r[4 * i + 2], "taker_vip": r[4 * i + 3]}
+            for i, name in enumerate(self.tier_names)
+        }
+
+
+def load_fee_engines(path=FEE_CONFIG_PATH):
+    """
+    Build a FeeEngine for every (exchange, instrument type) in a JSON config.
+
+    Returns:
+    - Dict keyed by (exchange, instrument_type).
+    """
+    with open(path, "r") as f:
+        config = json.load(f)
+    return {
+        (exchange, instrument_type): FeeEngine(exchange, instrument_type, schedule["tiers"],
+                                               schedule.get("discounts"))
+        for exchange, types in config.items()
+        for instrument_type, schedule in types.items()
+    }
+
+
+FEE_ENGINES = MappingProxyType(load_fee_engines())
+
+
+def get_fee_engine(exchange=DEFAULT_EXCHANGE, instrument_type=DEFAULT_INSTRUMENT_TYPE):
+    try:
+        return FEE_ENGINES[(exchange.lower(), instrument_type.lower())]
+    except KeyError:
+        raise ValueError(f"No fee schedule for {exchange}/{instrument_type}") from None
+
+
+DEFAULT_ENGINE = get_fee_engine()
+
+# Read-only views of the default (OKX spot) schedule, kept for existing callers
+FEE_TIERS = MappingProxyType({
+    name: MappingProxyType({"maker": rates["maker"], "taker": rates["taker"]})
+    for name, rates in DEFAULT_ENGINE.table().items()
+})
+TIER_NAMES = list(DEFAULT_ENGINE.tier_names)
+TIER_RATES = DEFAULT_ENGINE.rates.reshape(-1, 2, 2)[:, 0, :]
+
+
+def tier_indices(fee_tier):
+    """
+    Map an array of tier names (or integer tier indices) to rows of TIER_RATES.
+    Unknown tiers raise ValueError, like `calculate_fees`.
+    """
+    return DEFAULT_ENGINE.tier_indices(fee_tier)
 
 def calculate_fees(quantity_usd, fee_tier, is_maker=False, is_vip=False):
     """
@@ -23,21 +211,26 @@ def calculate_fees(quantity_usd, fee_tier, is_maker=False, is_vip=False):
     
     Returns:
     - The calculated fee in USD.
-    """
-    # Select the fee tier based on the user's selection (defaults to Tier 1 if invalid tier)
-    tier_fees = FEE_TIERS.get(fee_tier, FEE_TIERS["Tier 1"])
 
-    # If VIP status is enabled, apply a VIP discount (example: 10% off VIP fee)
-    if is_vip:
-        vip_discount_factor = 0.90  # Apply a 10% discount for VIP traders
-        tier_fees["maker"] *= vip_discount_factor
-        tier_fees["taker"] *= vip_discount_factor
+    Raises:
+    - ValueError for a fee tier the schedule does not have.
+    """
+    # Precomputed effective rate (VIP discount included); no shared state is modified
+    return DEFAULT_ENGINE.fee(quantity_usd, fee_tier, is_maker, is_vip)
 
-    # Choose the appropriate fee rate based on whether the user is a maker or taker
-    fee_rate = tier_fees["maker"] if is_maker else tier_fees["taker"]
 
-    # Calculate the fee in USD based on the trade size and the fee rate
-    fee = quantity_usd * fee_rate
+def calculate_fees_batch(quantity_usd, fee_tier, is_maker=False, is_vip=False):
+    """
+    Vectorized `calculate_fees` for arrays of orders. Arguments broadcast
+    against each other; the shared rate table is never modified.
 
-    return fee
+    Parameters:
+    - quantity_usd: Array of trade amounts in USD.
+    - fee_tier: Tier names ("Tier 1", "VIP 1", ...) or row indices into TIER_RATES.
+    - is_maker: Boolean array (or scalar) selecting the maker rate.
+    - is_vip: Boolean array (or scalar) applying the VIP discount.
 
+    Returns:
+    - Array of fees in USD.
+    """
+    return DEFAULT_ENGINE.fees(quantity_usd, DEFAULT_ENGINE.tier_indices(fee_tier), is_maker, is_vip)
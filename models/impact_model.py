@@ -1,4 +1,5 @@
 # models/impact_model.py
+from models.almgren_chriss import optimal_trajectory
 
 def estimate_market_impact(quantity_usd, volatility, volume=1e6, lambda_param=0.01):
     """
@@ -23,3 +24,13 @@ def estimate_market_impact(quantity_usd, volatility, volume=1e6, lambda_param=0.
     
     # Final market impact, in USD
     return impact * quantity_usd
+
+
+def almgren_chriss_trajectory(quantity, horizon, n_slices, volatility, eta, gamma=0.0, risk_aversion=0.0):
+    """
+    Shares traded in each of the N intervals of the Almgren-Chriss optimal
+    schedule. See `models.almgren_chriss` for the frontier, calibration and
+    the cached solver.
+    """
+    _, trades = optimal_trajectory(quantity, horizon, n_slices, volatility, eta, gamma, risk_aversion)
+    return trades
@@ -2,59 +2,275 @@ import threading
 
 _model_lock = threading.Lock()
 
-import numpy as np
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-import joblib
+import json
+import math
 import os
+import time
+from collections import namedtuple
+
+import numpy as np
 
 # Paths for saving/loading model
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "maker_taker_model.pkl")
 SCALER_PATH = os.path.join(os.path.dirname(__file__), "scaler.pkl")
+# Exported coefficients used for inference (no sklearn/joblib needed to read them)
+PARAMS_PATH = os.path.join(os.path.dirname(__file__), "maker_taker_params.json")
+
+FEATURES = ["quantity_usd", "volatility", "spread"]
+VERSIONS_DIR = os.path.join(os.path.dirname(__file__), "maker_taker_versions")
+
+# Logistic weights with the StandardScaler folded in, plus where they came from.
+# Immutable, so a model can be swapped with one reference assignment.
+MakerTakerModel = namedtuple("MakerTakerModel", ["version", "weights", "bias", "coef", "source", "loaded_at"])
+
+# The model used for inference; replaced as a whole, never mutated
+_active = None
+
 
-# Initialize
-model = None
-scaler = None
+def fold_scaler(coef, intercept, mean, scale):
+    """
+    Fold StandardScaler into the logistic weights:
+    w·((x - mean) / scale) + b  ==  (w / scale)·x + (b - w·mean / scale)
+    """
+    coef = np.asarray(coef, dtype=np.float64).ravel()
+    mean = np.asarray(mean, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+    folded = coef / scale
+    return folded, float(np.ravel(intercept)[0] - folded @ mean)
+
+
+def export_model_params(model, scaler, path=PARAMS_PATH, version=None):
+    """Write the fitted coefficients, intercept, mean and scale to a small JSON artifact."""
+    params = {
+        "version": version,
+        "features": FEATURES,
+        "coef": np.ravel(model.coef_).tolist(),
+        "intercept": float(np.ravel(model.intercept_)[0]),
+        "mean": np.asarray(scaler.mean_).tolist(),
+        "scale": np.asarray(scaler.scale_).tolist(),
+    }
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return params
+
+
+def export_from_pickles(model_path=MODEL_PATH, scaler_path=SCALER_PATH, path=PARAMS_PATH):
+    """One-off conversion of the joblib pickles into the JSON artifact."""
+    import joblib
+    return export_model_params(joblib.load(model_path), joblib.load(scaler_path), path)
 
 
 def train_maker_taker_model(features, labels):
     """
     Train the Logistic Regression model to classify Maker/Taker behavior.
-    
+
     :param features: List or array of features [quantity_usd, volatility, spread]
     :param labels: List or array of labels [0 (Taker), 1 (Maker)]
     """
-    global model, scaler
+    global _active
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(features)
-    
+
     model = LogisticRegression()
     model.fit(X_scaled, labels)
-    
+
     # Save to disk
     joblib.dump(model, MODEL_PATH)
     joblib.dump(scaler, SCALER_PATH)
+    params = export_model_params(model, scaler)
+    _active = build_model(params, PARAMS_PATH)
     print("✅ Maker/Taker model and scaler saved successfully.")
 
+
+def read_params(path=PARAMS_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_model(params, source, version=None):
+    """Validate exported parameters and fold them into an immutable MakerTakerModel."""
+    weights, bias = fold_scaler(params["coef"], [params["intercept"]], params["mean"], params["scale"])
+    if len(weights) != len(FEATURES) or not (np.all(np.isfinite(weights)) and math.isfinite(bias)):
+        raise ValueError(f"Invalid model parameters in {source}")
+    weights.flags.writeable = False
+    if version is None:
+        version = params.get("version") or f"mtime-{int(os.path.getmtime(source))}"
+    return MakerTakerModel(version, weights, bias, tuple(weights.tolist()), source, time.time())
+
+
 def load_model():
-    """Thread-safe model and scaler loader."""
-    global model, scaler
+    """Thread-safe loader for the exported inference parameters. Returns the active model."""
+    global _active
     with _model_lock:
-        if model is not None and scaler is not None:
-            return  # Already loaded
-
-        if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
-            model = joblib.load(MODEL_PATH)
-            scaler = joblib.load(SCALER_PATH)
-        else:
-            raise FileNotFoundError("Model or scaler file not found. Please train the model first.")
-
-def predict_maker_taker(quantity_usd, volatility, spread):
-    if model is None or scaler is None:
-        load_model()
-
-    features = np.array([[quantity_usd, volatility, spread]])
-    scaled = scaler.transform(features)
-    probs = model.predict_proba(scaled)[0]
+        if _active is not None:
+            return _active  # Already loaded
+
+        if not os.path.exists(PARAMS_PATH):
+            if os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH):
+                export_from_pickles()
+            else:
+                raise FileNotFoundError("Model or scaler file not found. Please train the model first.")
+        _active = build_model(read_params(PARAMS_PATH), PARAMS_PATH)
+        return _active
+
+
+def active_model():
+    """The model currently used for inference (loading it on first use)."""
+    model = _active
+    return model if model is not None else load_model()
+
+
+def predict_maker_taker(quantity_usd, volatility, spread, model=None):
+    """
+    Predict the role of one order.
+
+    Pass the `model` from `active_model()` to know which version produced
+    the prediction; the model is read once, so a concurrent swap never tears.
+    """
+    if model is None:
+        model = active_model()
+
+    w0, w1, w2 = model.coef
+    z = w0 * quantity_usd + w1 * volatility + w2 * spread + model.bias
+    p_maker = 1.0 / (1.0 + math.exp(-z)) if z >= -700 else 0.0
+    probs = np.array([1.0 - p_maker, p_maker])
     label = "Maker" if probs[1] > 0.5 else "Taker"
     return label, probs
+
+def predict_maker_taker_batch(quantity_usd, volatility, spread, model=None):
+    """
+    Vectorized `predict_maker_taker`: one dot product and sigmoid for every order.
+
+    Arguments are arrays (or scalars) that broadcast to a common length.
+
+    Returns:
+    - Array of maker probabilities (the `probs[1]` of the scalar version).
+    """
+    if model is None:
+        model = active_model()
+
+    q, v, s = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(quantity_usd, dtype=np.float64)),
+        np.atleast_1d(np.asarray(volatility, dtype=np.float64)),
+        np.atleast_1d(np.asarray(spread, dtype=np.float64)),
+    )
+    w = model.weights
+    z = w[0] * q + w[1] * v + w[2] * s + model.bias
+    with np.errstate(over="ignore"):
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+class ModelRegistry:
+    """
+    Watches the model artifacts and hot-swaps new versions into inference.
+
+    A daemon thread polls the watched file's mtime and size every
+    `poll_interval` seconds. A changed artifact is read and validated on
+    that thread, then published with a single reference assignment, so
+    predictions in flight keep the model object they already read and the
+    feed and dashboard never restart. Files that fail to load are reported
+    and the previous model stays active.
+
+    Parameters:
+    - follow: "promoted" to watch PARAMS_PATH (what `--promote` replaces),
+      or "latest" to follow the newest version directory in `versions_dir`.
+    - poll_interval: Seconds between polls.
+    """
+
+    def __init__(self, follow="promoted", params_path=PARAMS_PATH, versions_dir=VERSIONS_DIR, poll_interval=2.0):
+        if follow not in ("promoted", "latest"):
+            raise ValueError(f"Unknown follow mode: {follow}")
+        self.follow = follow
+        self.params_path = params_path
+        self.versions_dir = versions_dir
+        self.poll_interval = poll_interval
+        self.history = []  # (loaded_at, version, source) of every model swapped in
+        self.errors = 0
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _target(self):
+        if self.follow == "promoted":
+            return self.params_path, None
+        if not os.path.isdir(self.versions_dir):
+            return None, None
+        versions = sorted(d for d in os.listdir(self.versions_dir)
+                          if os.path.exists(os.path.join(self.versions_dir, d, "params.json")))
+        if not versions:
+            return None, None
+        return os.path.join(self.versions_dir, versions[-1], "params.json"), versions[-1]
+
+    def poll(self):
+        """Check the artifact once; swap in a new model if it changed. Returns True on a swap."""
+        global _active
+        path, version = self._target()
+        if path is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        stamp = (path, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+        # Recorded before loading, so a broken file is reported once and retried when it changes
+        self._stamp = stamp
+        try:
+            model = build_model(read_params(path), path, version)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            print(f"❌ Failed to load maker/taker model from {path}: {e}")
+            return False
+        current = _active
+        if current is not None and current.version == model.version and current.coef == model.coef:
+            return False
+        _active = model  # Single reference assignment: readers see the old or the new model
+        self.history.append((model.loaded_at, model.version, path))
+        print(f"✅ Maker/Taker model {model.version} loaded from {path}")
+        return True
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"❌ Model registry error: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Start polling in a daemon thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+    def active(self):
+        return active_model()
+
+
+_registry = None
+
+
+def get_registry(**kwargs):
+    """Process-wide ModelRegistry, created and started on first use."""
+    global _registry
+    with _model_lock:
+        if _registry is None:
+            _registry = ModelRegistry(**kwargs)
+            _registry.start()
+        return _registry
+
+if __name__ == "__main__":
+    # python -m models.maker_taker_model  -> convert the pickles into PARAMS_PATH
+    export_from_pickles()
+    print(f"✅ Exported inference parameters to {PARAMS_PATH}")
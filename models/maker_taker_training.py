@@ -0,0 +1,397 @@
+# models/maker_taker_training.py
+"""
+Out-of-core training pipeline for the maker/taker classifier.
+
+1. Feature extraction (one process per instrument): replay a TickRecorder
+   capture, maintain the book and the streaming estimators, and append the
+   (t, spread, volatility) timeline to a binary file. Fills found in the
+   capture (OKX `fills` / `orders` pushes with an `execType`) are written
+   out as labeled rows at the same time.
+2. External fill files (JSONL, one OKX fill or push per line) are read in
+   chunks and joined to the memory-mapped timelines with `searchsorted`.
+3. Training streams the joined rows from disk in chunks: one pass fits the
+   StandardScaler with `partial_fit`, then SGD logistic regression is
+   trained with `partial_fit` for a few epochs. A deterministic hold-out
+   split gives the validation metrics.
+4. The folded parameters are written to a versioned directory next to
+   MODEL_PATH with a metadata.json and can be promoted to PARAMS_PATH.
+
+Nothing in the pipeline holds more than one chunk (plus one book) in memory.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from models.maker_taker_model import FEATURES, PARAMS_PATH, VERSIONS_DIR, export_model_params
+
+FILL_CHANNELS = ("fills", "orders")
+CHUNK_ROWS = 100_000
+
+# Timeline rows written by the feature extractors
+TIMELINE_DTYPE = np.dtype([("t", "<f8"), ("spread", "<f8"), ("volatility", "<f8")])
+# Labeled fills before the join
+FILL_DTYPE = np.dtype([("t", "<f8"), ("quantity_usd", "<f8"), ("is_maker", "i1")])
+# Joined training rows: the model features plus the label
+SAMPLE_DTYPE = np.dtype([(name, "<f8") for name in FEATURES] + [("label", "i1")])
+
+
+def parse_fill(fill):
+    """
+    (t seconds, quantity_usd, is_maker) of one OKX fill dict, or None if it
+    carries no execution. Accepts `fills` and `orders` channel payloads.
+    """
+    exec_type = fill.get("execType")
+    size = float(fill.get("fillSz") or 0)
+    price = float(fill.get("fillPx") or 0)
+    if exec_type not in ("M", "T") or size <= 0 or price <= 0:
+        return None
+    ts = fill.get("fillTime") or fill.get("ts")
+    return float(ts) / 1000.0, price * size, exec_type == "M"
+
+
+class _RowWriter:
+    """Appends structured rows to a binary file in buffered chunks."""
+
+    def __init__(self, path, dtype, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.rows = []
+        self.count = 0
+        open(path, "wb").close()
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            with open(self.path, "ab") as f:
+                np.array(self.rows, dtype=self.dtype).tofile(f)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def read_rows(path, dtype, chunk_rows=CHUNK_ROWS):
+    """Yield consecutive chunks of a row file as memory-mapped views."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    rows = np.memmap(path, dtype=dtype, mode="r")
+    for start in range(0, len(rows), chunk_rows):
+        yield rows[start:start + chunk_rows]
+
+
+def extract_instrument(args):
+    """
+    Worker: replay a capture for one instrument and write its timeline and in-capture fills.
+
+    Parameters:
+    - args: (capture_dir, prefix, inst_id, workdir)
+
+    Returns:
+    - Dict with the instrument, row counts and the two output paths.
+    """
+    capture_dir, prefix, inst_id, workdir = args
+    from utils.market_stats import MarketStats
+    from utils.tick_capture import TickReplayer
+    from wsclient.decoder import get_decoder
+    from wsclient.orderbook import OrderBook
+
+    loads = get_decoder()
+    book = OrderBook(inst_id)
+    stats = MarketStats(inst_id)
+    timeline = _RowWriter(os.path.join(workdir, f"{inst_id}.timeline"), TIMELINE_DTYPE)
+    fills = _RowWriter(os.path.join(workdir, f"{inst_id}.capture_fills"), FILL_DTYPE)
+
+    for _, message in TickReplayer(capture_dir, prefix).raw_messages():
+        if inst_id not in message:
+            continue  # Cheap filter before decoding
+        data = loads(message)
+        arg = data.get("arg") or {}
+        channel = arg.get("channel")
+        if channel == "books" and arg.get("instId") == inst_id:
+            for book_data in data.get("data", []):
+                if not book.apply(book_data, data.get("action", "snapshot")):
+                    book.reset()
+                    continue
+                latest = stats.update(book)
+                if latest is not None:
+                    timeline.append((latest["t"], latest["spread"], stats.volatility()))
+        elif channel in FILL_CHANNELS:
+            for fill in data.get("data", []):
+                if fill.get("instId") == inst_id:
+                    parsed = parse_fill(fill)
+                    if parsed is not None:
+                        fills.append(parsed)
+
+    timeline.flush()
+    fills.flush()
+    return {"inst_id": inst_id, "timeline": timeline.path, "timeline_rows": timeline.count,
+            "fills": fills.path, "capture_fills": fills.count}
+
+
+def iter_fill_files(paths, chunk_rows=CHUNK_ROWS):
+    """
+    Yield (inst_id, FILL_DTYPE chunk) from JSONL fill files without loading
+    them whole. Lines are OKX fill dicts or full `fills`/`orders` pushes.
+    """
+    from wsclient.decoder import get_decoder
+    loads = get_decoder()
+    for path in paths:
+        pending = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = loads(line)
+                for fill in data.get("data", [data]) if isinstance(data, dict) else data:
+                    parsed = parse_fill(fill)
+                    if parsed is None:
+                        continue
+                    rows = pending.setdefault(fill.get("instId", ""), [])
+                    rows.append(parsed)
+                    if len(rows) >= chunk_rows:
+                        yield fill.get("instId", ""), np.array(rows, dtype=FILL_DTYPE)
+                        rows.clear()
+        for inst_id, rows in pending.items():
+            if rows:
+                yield inst_id, np.array(rows, dtype=FILL_DTYPE)
+
+
+def join_fills(fills, timeline, max_staleness_s=5.0):
+    """
+    Attach the latest book features at or before each fill's time.
+
+    Parameters:
+    - fills: FILL_DTYPE rows.
+    - timeline: TIMELINE_DTYPE rows sorted by time (usually a memmap).
+    - max_staleness_s: Fills with no book update within this many seconds are dropped.
+
+    Returns:
+    - SAMPLE_DTYPE rows.
+    """
+    if len(timeline) == 0 or len(fills) == 0:
+        return np.zeros(0, dtype=SAMPLE_DTYPE)
+    idx = np.searchsorted(timeline["t"], fills["t"], side="right") - 1
+    valid = idx >= 0
+    idx = np.maximum(idx, 0)
+    valid &= (fills["t"] - timeline["t"][idx]) <= max_staleness_s
+    features = timeline[idx[valid]]
+    samples = np.empty(int(valid.sum()), dtype=SAMPLE_DTYPE)
+    samples["quantity_usd"] = fills["quantity_usd"][valid]
+    samples["volatility"] = features["volatility"]
+    samples["spread"] = features["spread"]
+    samples["label"] = fills["is_maker"][valid]
+    return samples
+
+
+def build_samples(capture_dir, inst_ids=None, fill_files=(), workdir=None, prefix="okx",
+                  workers=None, max_staleness_s=5.0, chunk_rows=CHUNK_ROWS):
+    """
+    Run feature extraction (in parallel across instruments) and the fill join.
+
+    Returns:
+    - (samples_path, report) where samples_path is a SAMPLE_DTYPE row file.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from utils.tick_capture import TickReplayer
+
+    workdir = workdir or tempfile.mkdtemp(prefix="maker_taker_")
+    os.makedirs(workdir, exist_ok=True)
+    if inst_ids is None:
+        inst_ids = TickReplayer(capture_dir, prefix).instruments
+    jobs = [(capture_dir, prefix, inst_id, workdir) for inst_id in inst_ids]
+
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            extracted = list(pool.map(extract_instrument, jobs))
+    else:
+        extracted = [extract_instrument(job) for job in jobs]
+    by_inst = {item["inst_id"]: item for item in extracted}
+    timelines = {inst_id: np.memmap(item["timeline"], dtype=TIMELINE_DTYPE, mode="r")
+                 if item["timeline_rows"] else np.zeros(0, dtype=TIMELINE_DTYPE)
+                 for inst_id, item in by_inst.items()}
+
+    samples_path = os.path.join(workdir, "samples.bin")
+    written = dropped = 0
+    with open(samples_path, "wb") as out:
+        def write(inst_id, fills):
+            nonlocal written, dropped
+            timeline = timelines.get(inst_id)
+            if timeline is None:
+                dropped += len(fills)
+                return
+            samples = join_fills(fills, timeline, max_staleness_s)
+            samples.tofile(out)
+            written += len(samples)
+            dropped += len(fills) - len(samples)
+
+        for inst_id, item in by_inst.items():
+            for chunk in read_rows(item["fills"], FILL_DTYPE, chunk_rows):
+                write(inst_id, chunk)
+        for inst_id, chunk in iter_fill_files(fill_files, chunk_rows):
+            write(inst_id, chunk)
+
+    report = {
+        "instruments": extracted,
+        "fill_files": list(fill_files),
+        "samples": written,
+        "dropped_fills": dropped,
+        "workdir": workdir,
+    }
+    return samples_path, report
+
+
+def _validation_mask(chunk_index, size, fraction, seed):
+    rng = np.random.default_rng([seed, chunk_index])
+    return rng.random(size) < fraction
+
+
+def _features(chunk):
+    return np.column_stack([chunk[name] for name in FEATURES]).astype(np.float64)
+
+
+def train_from_samples(samples_path, epochs=3, chunk_rows=CHUNK_ROWS, validation_fraction=0.2,
+                       alpha=1e-4, seed=42):
+    """
+    Fit StandardScaler + SGD logistic regression chunk by chunk.
+
+    Returns:
+    - (model, scaler, metrics) with validation accuracy, log loss, AUC and row counts.
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    train_rows = 0
+    for i, chunk in enumerate(read_rows(samples_path, SAMPLE_DTYPE, chunk_rows)):
+        train = ~_validation_mask(i, len(chunk), validation_fraction, seed)
+        if train.any():
+            scaler.partial_fit(_features(chunk[train]))
+            train_rows += int(train.sum())
+    if train_rows == 0:
+        raise ValueError("No training samples: check the capture and fill files")
+
+    model = SGDClassifier(loss="log_loss", alpha=alpha, random_state=seed)
+    for epoch in range(epochs):
+        for i, chunk in enumerate(read_rows(samples_path, SAMPLE_DTYPE, chunk_rows)):
+            train = ~_validation_mask(i, len(chunk), validation_fraction, seed)
+            if train.any():
+                model.partial_fit(scaler.transform(_features(chunk[train])), chunk["label"][train],
+                                  classes=np.array([0, 1]))
+
+    metrics = evaluate(model, scaler, samples_path, chunk_rows, validation_fraction, seed)
+    metrics["train_rows"] = train_rows
+    metrics["epochs"] = epochs
+    return model, scaler, metrics
+
+
+def evaluate(model, scaler, samples_path, chunk_rows=CHUNK_ROWS, validation_fraction=0.2, seed=42, bins=200):
+    """Streaming validation metrics: accuracy, log loss, maker rate and binned ROC AUC."""
+    eps = 1e-12
+    rows = correct = makers = 0
+    log_loss = 0.0
+    pos_hist = np.zeros(bins)
+    neg_hist = np.zeros(bins)
+    for i, chunk in enumerate(read_rows(samples_path, SAMPLE_DTYPE, chunk_rows)):
+        valid = _validation_mask(i, len(chunk), validation_fraction, seed)
+        if not valid.any():
+            continue
+        y = chunk["label"][valid].astype(np.int64)
+        p = model.predict_proba(scaler.transform(_features(chunk[valid])))[:, 1]
+        rows += len(y)
+        makers += int(y.sum())
+        correct += int(((p > 0.5) == (y == 1)).sum())
+        log_loss -= float(np.sum(y * np.log(p + eps) + (1 - y) * np.log(1 - p + eps)))
+        k = np.minimum((p * bins).astype(np.int64), bins - 1)
+        pos_hist += np.bincount(k[y == 1], minlength=bins)
+        neg_hist += np.bincount(k[y == 0], minlength=bins)
+
+    auc = None
+    if pos_hist.sum() and neg_hist.sum():
+        # P(score_pos > score_neg), ties within a bin counted as one half
+        neg_below = np.concatenate(([0.0], np.cumsum(neg_hist)[:-1]))
+        auc = float((pos_hist * (neg_below + 0.5 * neg_hist)).sum() / (pos_hist.sum() * neg_hist.sum()))
+    return {
+        "validation_rows": rows,
+        "accuracy": correct / rows if rows else None,
+        "log_loss": log_loss / rows if rows else None,
+        "maker_rate": makers / rows if rows else None,
+        "auc": auc,
+    }
+
+
+def save_artifacts(model, scaler, metrics, report=None, versions_dir=VERSIONS_DIR, promote=False, params=None):
+    """
+    Write params.json and metadata.json into `versions_dir/<version>/`.
+
+    Parameters:
+    - promote: Also atomically replace PARAMS_PATH, which live inference loads.
+
+    Returns:
+    - The version directory.
+    """
+    import sklearn
+
+    version = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    path = os.path.join(versions_dir, version)
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(versions_dir, f"{version}.{suffix}")
+        suffix += 1
+    os.makedirs(path)
+
+    params_path = os.path.join(path, "params.json")
+    export_model_params(model, scaler, params_path, version=os.path.basename(path))
+    metadata = {
+        "version": os.path.basename(path),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "features": FEATURES,
+        "estimator": type(model).__name__,
+        "hyperparameters": params or {},
+        "sklearn": sklearn.__version__,
+        "metrics": metrics,
+        "data": report or {},
+    }
+    with open(os.path.join(path, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, default=str)
+
+    if promote:
+        shutil.copyfile(params_path, f"{PARAMS_PATH}.tmp")
+        os.replace(f"{PARAMS_PATH}.tmp", PARAMS_PATH)
+    return path
+
+
+def run_pipeline(capture_dir, fill_files=(), inst_ids=None, prefix="okx", workers=None, epochs=3,
+                 chunk_rows=CHUNK_ROWS, validation_fraction=0.2, alpha=1e-4, seed=42,
+                 max_staleness_s=5.0, workdir=None, keep_workdir=False, versions_dir=VERSIONS_DIR,
+                 promote=False):
+    """
+    Extract features, train and version the maker/taker classifier end to end.
+
+    Returns:
+    - Dict with the version directory, validation metrics and the data report.
+    """
+    cleanup = workdir is None and not keep_workdir
+    samples_path, report = build_samples(capture_dir, inst_ids, fill_files, workdir, prefix,
+                                         workers, max_staleness_s, chunk_rows)
+    try:
+        print(f"📦 {report['samples']:,} labeled samples ({report['dropped_fills']:,} fills without a book)")
+        model, scaler, metrics = train_from_samples(samples_path, epochs, chunk_rows,
+                                                    validation_fraction, alpha, seed)
+        hyperparameters = {"epochs": epochs, "alpha": alpha, "chunk_rows": chunk_rows,
+                           "validation_fraction": validation_fraction, "seed": seed,
+                           "max_staleness_s": max_staleness_s}
+        version_dir = save_artifacts(model, scaler, metrics, report, versions_dir, promote, hyperparameters)
+    finally:
+        if cleanup:
+            shutil.rmtree(report["workdir"], ignore_errors=True)
+    print(f"✅ Saved {version_dir} (validation accuracy {metrics['accuracy']}, AUC {metrics['auc']})")
+    return {"version_dir": version_dir, "metrics": metrics, "report": report}
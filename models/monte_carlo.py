@@ -0,0 +1,177 @@
+# models/monte_carlo.py
+import os
+import time
+
+import numpy as np
+
+from models.almgren_chriss import optimal_trajectory
+
+SCHEDULES = ("twap", "vwap", "ac")
+
+
+def default_impact_params(price, spread, daily_volume_usd=1e6):
+    """
+    Almgren-Chriss rule-of-thumb coefficients (time unit: days).
+
+    Permanent impact costs one spread per 10% of daily volume traded and
+    temporary impact costs one spread per 1% of daily volume traded per day.
+
+    Returns:
+    - (eta, gamma) in price units.
+    """
+    daily_volume = daily_volume_usd / price
+    gamma = spread / (0.10 * daily_volume)
+    eta = spread / (0.01 * daily_volume)
+    return eta, gamma
+
+
+def build_schedule(schedule, quantity, horizon, n_slices, volatility, eta, gamma,
+                   risk_aversion=1e-6, volume_profile=None):
+    """
+    Shares traded in each of `n_slices` intervals.
+
+    Parameters:
+    - schedule: "twap" (equal slices), "vwap" (proportional to `volume_profile`)
+      or "ac" (Almgren-Chriss optimal trajectory for `risk_aversion`).
+    - volume_profile: Expected relative volume per slice for "vwap" (flat if None).
+    """
+    if schedule == "twap":
+        return np.full(n_slices, quantity / n_slices)
+    if schedule == "vwap":
+        profile = np.ones(n_slices) if volume_profile is None else np.asarray(volume_profile, dtype=np.float64)
+        if len(profile) != n_slices:
+            raise ValueError("volume_profile must have one entry per slice")
+        return quantity * profile / profile.sum()
+    if schedule == "ac":
+        _, trades = optimal_trajectory(quantity, horizon, n_slices, volatility, eta, gamma, risk_aversion)
+        return trades
+    raise ValueError(f"Unknown schedule: {schedule}")
+
+
+def log_returns_from_prices(prices):
+    """Log returns of a recorded price series, for bootstrap simulation."""
+    prices = np.asarray(prices, dtype=np.float64)
+    prices = prices[prices > 0]
+    return np.diff(np.log(prices))
+
+
+def simulate_costs(seed, paths, price, sigma, horizon, trades, eta, gamma, side="buy", returns=None):
+    """
+    Implementation shortfall (USD) of executing `trades` over `paths` price paths.
+
+    Paths are GBM with per-unit-time volatility `sigma` or, if `returns` is
+    given, i.i.d. bootstrap draws from those log returns (one per slice).
+    Permanent impact shifts the price by gamma per share traded; temporary
+    impact adds eta times the trading rate to each slice's execution price.
+
+    Returns:
+    - Array of `paths` costs; positive means worse than the arrival price.
+    """
+    rng = np.random.default_rng(seed)
+    trades = np.asarray(trades, dtype=np.float64)
+    n_slices = len(trades)
+    tau = horizon / n_slices
+
+    if returns is None:
+        log_ret = (-0.5 * sigma ** 2 * tau) + sigma * np.sqrt(tau) * rng.standard_normal((paths, n_slices))
+    else:
+        log_ret = rng.choice(np.asarray(returns, dtype=np.float64), size=(paths, n_slices))
+
+    # Unaffected price at the start of each slice: S0 for the first, then the path
+    log_path = np.cumsum(log_ret, axis=1)
+    start_log = np.empty_like(log_path)
+    start_log[:, 0] = 0.0
+    start_log[:, 1:] = log_path[:, :-1]
+    unaffected = price * np.exp(start_log)
+
+    sign = 1.0 if side == "buy" else -1.0
+    traded_before = np.concatenate(([0.0], np.cumsum(trades)[:-1]))
+    exec_prices = unaffected + sign * (gamma * traded_before + eta * trades / tau)
+
+    quantity = trades.sum()
+    return sign * (exec_prices @ trades - quantity * price)
+
+
+def _run_shard(args):
+    return simulate_costs(*args)
+
+
+def summarize_costs(costs, notional):
+    """Mean, std, VaR and CVaR (95% and 99%) of a cost sample, in USD and bps."""
+    costs = np.sort(np.asarray(costs, dtype=np.float64))
+    summary = {"paths": len(costs), "mean": float(costs.mean()), "std": float(costs.std())}
+    for level in (95, 99):
+        var = float(np.quantile(costs, level / 100))
+        tail = costs[costs >= var]
+        summary[f"var_{level}"] = var
+        summary[f"cvar_{level}"] = float(tail.mean()) if len(tail) else var
+    summary["mean_bps"] = summary["mean"] / notional * 1e4 if notional else 0.0
+    return summary
+
+
+def run_simulation(quantity_usd, price, volatility, horizon=1.0, n_slices=20, schedule="twap",
+                   paths=10_000, eta=None, gamma=None, spread=None, daily_volume_usd=1e6,
+                   risk_aversion=1e-6, side="buy", returns=None, volume_profile=None,
+                   seed=42, shards=8, workers=None, return_costs=False):
+    """
+    Monte Carlo distribution of the cost of executing a parent order.
+
+    Parameters:
+    - quantity_usd: Parent order notional in USD.
+    - price: Arrival (mid) price.
+    - volatility: Relative volatility per unit of `horizon` time (e.g. daily σ with horizon in days).
+    - horizon: Execution horizon T.
+    - n_slices: Number of child orders N.
+    - schedule: "twap", "vwap" or "ac".
+    - paths: Number of simulated price paths.
+    - eta, gamma: Temporary/permanent impact coefficients; derived from
+      `spread` and `daily_volume_usd` with `default_impact_params` when omitted.
+    - risk_aversion: λ for the Almgren-Chriss schedule.
+    - returns: Recorded log returns to bootstrap from instead of GBM.
+    - seed, shards: Paths are split into `shards` independent streams spawned
+      from `seed`, so results do not depend on the number of workers.
+    - workers: Processes to use (None: in-process for small runs, else all cores).
+    - return_costs: Include the per-path cost array in the result.
+
+    Returns:
+    - Dict with the schedule, the cost summary (USD, VaR/CVaR) and timing.
+    """
+    start = time.perf_counter()
+    quantity = quantity_usd / price
+    if eta is None or gamma is None:
+        default_eta, default_gamma = default_impact_params(price, spread if spread else price * 1e-4, daily_volume_usd)
+        eta = default_eta if eta is None else eta
+        gamma = default_gamma if gamma is None else gamma
+
+    trades = build_schedule(schedule, quantity, horizon, n_slices, volatility * price, eta, gamma,
+                            risk_aversion, volume_profile)
+
+    shards = max(1, min(shards, paths))
+    sizes = np.full(shards, paths // shards)
+    sizes[:paths % shards] += 1
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    jobs = [(seeds[i], int(sizes[i]), price, volatility, horizon, trades, eta, gamma, side, returns)
+            for i in range(shards)]
+
+    if workers is None:
+        workers = 1 if paths * n_slices < 5_000_000 else (os.cpu_count() or 1)
+    if workers > 1 and shards > 1:
+        from concurrent.futures import ProcessPoolExecutor  # Spawning machinery only when used
+
+        with ProcessPoolExecutor(max_workers=min(workers, shards)) as pool:
+            parts = list(pool.map(_run_shard, jobs))
+    else:
+        parts = [_run_shard(job) for job in jobs]
+    costs = np.concatenate(parts)
+
+    result = {
+        "schedule": schedule,
+        "trades": trades,
+        "eta": eta,
+        "gamma": gamma,
+        "summary": summarize_costs(costs, quantity_usd),
+        "elapsed_s": time.perf_counter() - start,
+    }
+    if return_costs:
+        result["costs"] = costs
+    return result
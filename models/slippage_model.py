@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def estimate_slippage(quantity_usd, avg_ask, avg_bid, market_depth=10, slippage_factor=0.0005):
     """
     Estimate the slippage for a market order based on order book spread and trade quantity.
@@ -23,3 +26,97 @@ def estimate_slippage(quantity_usd, avg_ask, avg_bid, market_depth=10, slippage_
     slippage = slippage_factor * liquidity_factor * spread * (quantity_usd / 1000)
     
     return slippage
+
+
+def walk_book_batch(quantities_usd, prices, sizes, mid=None, side="buy"):
+    """
+    Fill a vector of USD notionals against one side of the book in a single pass.
+
+    The cumulative notional of the side (price x size) is built once with
+    `cumsum`, and every order size is located in it with one `searchsorted`,
+    so pricing a ladder costs O(levels + sizes log levels) with no Python loop.
+
+    Parameters:
+    - quantities_usd: Array of order notionals in USD.
+    - prices: Level prices, best first (asks ascending for buys, bids descending for sells).
+    - sizes: Level sizes in base currency, aligned with `prices`.
+    - mid: Reference mid price for slippage (defaults to the touch price).
+    - side: "buy" (walking asks) or "sell" (walking bids).
+
+    Returns:
+    - Dict of arrays: fill_price (VWAP), slippage (USD vs mid), slippage_bps,
+      levels (levels touched), filled_usd, filled_qty, unfilled_usd.
+    """
+    q = np.atleast_1d(np.asarray(quantities_usd, dtype=np.float64))
+    prices = np.asarray(prices, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    n = len(prices)
+
+    if n == 0:
+        nan = np.full(q.shape, np.nan)
+        zero = np.zeros(q.shape)
+        return {"fill_price": nan, "slippage": zero, "slippage_bps": zero,
+                "levels": np.zeros(q.shape, dtype=np.int64), "filled_usd": zero,
+                "filled_qty": zero, "unfilled_usd": q.copy()}
+
+    if mid is None:
+        mid = prices[0]
+
+    cum_usd = np.cumsum(prices * sizes)
+    cum_qty = np.cumsum(sizes)
+
+    # Index of the level where each order completes
+    k = np.searchsorted(cum_usd, q, side="left")
+    exhausted = k >= n
+    k_clip = np.minimum(k, n - 1)
+
+    # Notional and quantity taken from the fully consumed levels before k
+    prev_usd = np.where(k_clip > 0, cum_usd[k_clip - 1], 0.0)
+    prev_qty = np.where(k_clip > 0, cum_qty[k_clip - 1], 0.0)
+
+    filled_usd = np.where(exhausted, cum_usd[-1], q)
+    partial_usd = np.where(exhausted, 0.0, q - prev_usd)
+    filled_qty = np.where(exhausted, cum_qty[-1], prev_qty + partial_usd / prices[k_clip])
+    unfilled_usd = q - filled_usd
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fill_price = np.where(filled_qty > 0, filled_usd / filled_qty, np.nan)
+
+    sign = 1.0 if side == "buy" else -1.0
+    slippage_frac = np.where(filled_qty > 0, sign * (fill_price - mid) / mid, 0.0)
+    levels = np.where(q > 0, np.minimum(k + 1, n), 0)
+
+    return {
+        "fill_price": fill_price,
+        "slippage": slippage_frac * filled_usd,
+        "slippage_bps": slippage_frac * 1e4,
+        "levels": levels,
+        "filled_usd": filled_usd,
+        "filled_qty": filled_qty,
+        "unfilled_usd": unfilled_usd,
+    }
+
+
+def walk_book(quantity_usd, prices, sizes, mid=None, side="buy"):
+    """
+    Fill a single USD notional against one side of the book.
+
+    Same parameters as `walk_book_batch`; returns the same keys as Python scalars.
+    """
+    result = walk_book_batch(quantity_usd, prices, sizes, mid=mid, side=side)
+    return {key: value[0].item() for key, value in result.items()}
+
+
+def book_slippage(quantity_usd, asks, bids, side="buy"):
+    """
+    Convenience wrapper taking the legacy [[price, size], ...] book lists.
+
+    Returns:
+    - The walk_book result for the requested side, with slippage measured
+      against the top-of-book mid.
+    """
+    asks = np.asarray(asks, dtype=np.float64).reshape(-1, 2)
+    bids = np.asarray(bids, dtype=np.float64).reshape(-1, 2)
+    mid = (asks[0, 0] + bids[0, 0]) / 2 if len(asks) and len(bids) else None
+    levels = asks if side == "buy" else bids
+    return walk_book(quantity_usd, levels[:, 0], levels[:, 1], mid=mid, side=side)
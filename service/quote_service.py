@@ -0,0 +1,444 @@
+# service/quote_service.py
+"""
+Async HTTP + WebSocket quote service for the cost models.
+
+    python -m service.quote_service [--host 0.0.0.0] [--port 8080] [--fake]
+
+Endpoints:
+- GET  /quote?inst_id=ETH-USDT&quantity_usd=50000[&side=buy&fee_tier=Tier 1&is_maker=0&is_vip=0&volatility=]
+- POST /quotes   JSON list of the same parameters, answered in one batch
+- GET  /health   feed, batching and cache statistics
+- WS   /ws       {"id": ..., "quote": {...}} for one quote, or
+                 {"id": ..., "subscribe": {...}} to be pushed a fresh quote on every
+                 book update (at most every `min_interval` seconds);
+                 {"id": ..., "unsubscribe": true} stops a subscription.
+
+Concurrent requests are collected for up to `max_delay` seconds (or
+`max_batch` requests) and priced in one vectorized pass per instrument
+against a single copy of the live book. The depth walk is cached per
+(instrument, book version, side, size bucket) until the book changes; impact,
+fees and the maker/taker probability are computed for every request.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import namedtuple
+
+import numpy as np
+from aiohttp import WSMsgType, web
+
+from models.cost_model import book_sides
+from models.fee_model import DEFAULT_ENGINE, calculate_fees_batch
+from models.impact_model import estimate_market_impact
+from models.maker_taker_model import active_model, predict_maker_taker_batch
+from models.slippage_model import walk_book_batch
+from utils.market_stats import StatsTracker
+
+# Quantities within the same 0.5% bucket share one depth walk
+SIZE_BUCKET_RATIO = 1.005
+MAX_DELAY_S = 0.001
+MAX_BATCH = 4096
+DEFAULT_VOLATILITY = 0.05
+
+QuoteRequest = namedtuple("QuoteRequest", ["inst_id", "quantity_usd", "side", "fee_tier", "is_maker",
+                                           "is_vip", "volatility"])
+
+
+class QuoteError(ValueError):
+    """A malformed request or an instrument with no book yet."""
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "maker")
+    return bool(value)
+
+
+def parse_request(params):
+    """Validate a dict of query/JSON parameters into a QuoteRequest."""
+    try:
+        inst_id = str(params["inst_id"])
+        quantity = float(params["quantity_usd"])
+    except (KeyError, TypeError, ValueError):
+        raise QuoteError("inst_id and a numeric quantity_usd are required") from None
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise QuoteError("quantity_usd must be positive")
+    side = str(params.get("side", "buy")).lower()
+    if side not in ("buy", "sell"):
+        raise QuoteError("side must be buy or sell")
+    volatility = params.get("volatility")
+    if volatility in (None, ""):
+        volatility = None
+    else:
+        try:
+            volatility = float(volatility)
+        except (TypeError, ValueError):
+            raise QuoteError("volatility must be numeric") from None
+    fee_tier = str(params.get("fee_tier", "Tier 1"))
+    try:
+        DEFAULT_ENGINE.tier_index(fee_tier)
+    except ValueError as e:
+        raise QuoteError(str(e)) from None
+    is_vip = _flag(params["is_vip"]) if "is_vip" in params else fee_tier.startswith("VIP")
+    return QuoteRequest(inst_id, quantity, side, fee_tier, _flag(params.get("is_maker", False)),
+                        is_vip, volatility)
+
+
+def size_bucket(quantity_usd):
+    return int(math.floor(math.log(quantity_usd) / math.log(SIZE_BUCKET_RATIO)))
+
+
+def bucket_quantity(bucket):
+    """Representative (geometric mid) quantity of a size bucket."""
+    return SIZE_BUCKET_RATIO ** (bucket + 0.5)
+
+
+class _BookCopy:
+    """Private copy of a book's levels, so batches are priced outside the feed lock."""
+
+    __slots__ = ("levels", "version", "ts")
+
+    def __init__(self, book):
+        self.levels = tuple(np.array(a) for a in book.depth_levels())
+        self.version = book.updates
+        self.ts = book.ts
+
+    def depth_levels(self, depth=None):
+        return self.levels
+
+
+class QuoteEngine:
+    """
+    Micro-batching, caching quote evaluator over a FeedManager (or FakeFeed).
+
+    `quote(request)` is awaited by many coroutines at once; a single flush
+    task groups the pending requests by instrument and prices every cache
+    miss in one vectorized pass.
+    """
+
+    def __init__(self, feed, tracker=None, max_delay=MAX_DELAY_S, max_batch=MAX_BATCH):
+        self.feed = feed
+        self.tracker = tracker if tracker is not None else StatsTracker(feed)
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_handle = None
+        self._wakeup = None
+        self._cache = {}  # inst_id -> (book version, {(size bucket, side): depth walk})
+        self._waiters = {}  # inst_id -> asyncio.Event set on the next book update
+        self._loop = None
+        self.stats = {"requests": 0, "batches": 0, "evaluated": 0, "cache_hits": 0, "errors": 0}
+        feed.add_listener(self._on_book_update)
+
+    # ------------------------------------------------------------------
+    # Book update notifications (called from the feed thread)
+    # ------------------------------------------------------------------
+    def _on_book_update(self, channel, inst_id):
+        loop = self._loop
+        if loop is not None and channel == "books" and inst_id in self._waiters:
+            loop.call_soon_threadsafe(self._notify, inst_id)
+
+    def _notify(self, inst_id):
+        event = self._waiters.pop(inst_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait_for_update(self, inst_id):
+        """Resolve after the next applied book update for `inst_id`."""
+        self._loop = asyncio.get_running_loop()
+        event = self._waiters.get(inst_id)
+        if event is None:
+            event = self._waiters[inst_id] = asyncio.Event()
+        await event.wait()
+
+    # ------------------------------------------------------------------
+    # Batching
+    # ------------------------------------------------------------------
+    async def quote(self, request):
+        """Price one QuoteRequest (batched with concurrent callers)."""
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        future = loop.create_future()
+        self._pending.append((request, future))
+        self.stats["requests"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    async def quote_many(self, requests):
+        return await asyncio.gather(*(self.quote(r) for r in requests), return_exceptions=True)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self.stats["batches"] += 1
+        by_inst = {}
+        for request, future in pending:
+            by_inst.setdefault(request.inst_id, []).append((request, future))
+        for inst_id, items in by_inst.items():
+            try:
+                results = self.evaluate(inst_id, [request for request, _ in items])
+            except Exception as e:
+                self.stats["errors"] += len(items)
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e if isinstance(e, QuoteError) else QuoteError(str(e)))
+                continue
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    def snapshot(self, inst_id):
+        book = self.feed.get_book(inst_id)
+        lock = self.feed.lock_for(inst_id)
+        if book is None or lock is None:
+            raise QuoteError(f"Unknown instrument: {inst_id}")
+        with lock:
+            if not book.ready:
+                raise QuoteError(f"No order book for {inst_id} yet")
+            return _BookCopy(book)
+
+    def evaluate(self, inst_id, requests):
+        """
+        Price a list of requests for one instrument in one vectorized pass.
+
+        Only the depth walk (fill price and slippage per filled USD) is cached,
+        per (side, size bucket) until the book changes; unfilled size, impact,
+        fees and the maker/taker probability are computed for each requested
+        quantity, since none of them scale linearly within a bucket.
+        """
+        book = self.snapshot(inst_id)
+        version, cache = self._cache.get(inst_id, (None, None))
+        if version != book.version:
+            cache = {}
+            self._cache[inst_id] = (book.version, cache)
+
+        ask_px, ask_sz, bid_px, bid_sz = book_sides(book)
+        has_top = len(ask_px) > 0 and len(bid_px) > 0
+        keys = [(size_bucket(request.quantity_usd), request.side) for request in requests]
+        misses = list(dict.fromkeys(key for key in keys if key not in cache))
+        if misses:
+            mid = (ask_px[0] + bid_px[0]) / 2 if has_top else None
+            for side, px, sz in (("buy", ask_px, ask_sz), ("sell", bid_px, bid_sz)):
+                side_keys = [key for key in misses if key[1] == side]
+                if not side_keys:
+                    continue
+                walked = walk_book_batch([bucket_quantity(key[0]) for key in side_keys], px, sz, mid=mid, side=side)
+                depth_usd = float(np.dot(px, sz))
+                for i, key in enumerate(side_keys):
+                    filled = walked["filled_usd"][i]
+                    cache[key] = (float(walked["fill_price"][i]),
+                                  float(walked["slippage"][i] / filled) if filled > 0 else 0.0,
+                                  depth_usd)
+            self.stats["evaluated"] += len(misses)
+        self.stats["cache_hits"] += len(requests) - len(misses)
+
+        stats = self.tracker.get(inst_id)
+        live_vol = stats["volatility"] if stats is not None and stats["volatility"] > 0 else DEFAULT_VOLATILITY
+        if stats is not None:
+            spread = stats["spread"]
+        else:
+            spread = ask_px[0] - bid_px[0] if has_top else 0.0
+        walks = [cache[key] for key in keys]
+        qty = np.array([request.quantity_usd for request in requests])
+        volatility = np.array([live_vol if r.volatility is None else r.volatility for r in requests])
+        filled = np.minimum(qty, [walk[2] for walk in walks])
+        slippage = np.array([walk[1] for walk in walks]) * filled
+        impact = estimate_market_impact(qty, volatility)
+        fee = calculate_fees_batch(qty, np.array([r.fee_tier for r in requests]),
+                                   is_maker=np.array([r.is_maker for r in requests]),
+                                   is_vip=np.array([r.is_vip for r in requests]))
+        net_cost = slippage + impact + fee
+        model = active_model()
+        maker_prob = predict_maker_taker_batch(qty, volatility, spread, model=model)
+
+        results = []
+        for i, request in enumerate(requests):
+            q = request.quantity_usd
+            results.append({
+                "inst_id": inst_id,
+                "quantity_usd": q,
+                "side": request.side,
+                "fee_tier": request.fee_tier,
+                "fill_price": walks[i][0],
+                "slippage": float(slippage[i]),
+                "impact": float(impact[i]),
+                "fee": float(fee[i]),
+                "net_cost": float(net_cost[i]),
+                "net_cost_bps": float(net_cost[i]) / q * 1e4,
+                "unfilled_usd": q - float(filled[i]),
+                "maker_prob": float(maker_prob[i]),
+                "predicted_role": "Maker" if maker_prob[i] > 0.5 else "Taker",
+                "volatility": float(volatility[i]),
+                "model_version": model.version,
+                "book_version": book.version,
+                "book_ts": book.ts,
+            })
+        return results
+
+    def health(self):
+        books = {}
+        for inst_id in sorted({inst for _, inst in self.feed.subscriptions}):
+            book = self.feed.get_book(inst_id)
+            books[inst_id] = {
+                "ready": bool(book is not None and book.ready),
+                "version": book.updates if book is not None else None,
+                "age_s": time.time() - self.feed.received[inst_id] if inst_id in self.feed.received else None,
+                "integrity": self.feed.integrity_status(inst_id),
+            }
+        requests = self.stats["requests"]
+        return dict(self.stats, books=books,
+                    cache_hit_rate=self.stats["cache_hits"] / requests if requests else 0.0,
+                    avg_batch=requests / self.stats["batches"] if self.stats["batches"] else 0.0)
+
+
+# ----------------------------------------------------------------------
+# HTTP / WebSocket handlers
+# ----------------------------------------------------------------------
+def _error(status, message):
+    return web.json_response({"error": message}, status=status)
+
+
+async def handle_quote(request):
+    engine = request.app["engine"]
+    try:
+        return web.json_response(await engine.quote(parse_request(request.query)))
+    except QuoteError as e:
+        return _error(400, str(e))
+
+
+async def handle_quotes(request):
+    engine = request.app["engine"]
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return _error(400, "Body must be a JSON list of quote requests")
+    if not isinstance(body, list):
+        return _error(400, "Body must be a JSON list of quote requests")
+    parsed = []
+    for params in body:
+        try:
+            parsed.append(parse_request(params))
+        except QuoteError as e:
+            parsed.append(e)
+    valid = [p for p in parsed if isinstance(p, QuoteRequest)]
+    results = iter(await engine.quote_many(valid))
+    out = []
+    for p in parsed:
+        result = p if isinstance(p, QuoteError) else next(results)
+        out.append({"error": str(result)} if isinstance(result, Exception) else result)
+    return web.json_response(out)
+
+
+async def handle_health(request):
+    return web.json_response(request.app["engine"].health())
+
+
+async def _push_quotes(ws, engine, request_id, quote_request, min_interval):
+    """Send a fresh quote after every book update, at most every `min_interval` seconds."""
+    while not ws.closed:
+        try:
+            try:
+                result = await engine.quote(quote_request)
+                message = {"id": request_id, "quote": result}
+            except QuoteError as e:
+                message = {"id": request_id, "error": str(e)}
+            if ws.closed:
+                break
+            await ws.send_json(message)
+        except ConnectionResetError:
+            # The client went away mid-send (aiohttp's ClientConnectionResetError is one too)
+            break
+        await asyncio.sleep(min_interval)
+        await engine.wait_for_update(quote_request.inst_id)
+
+
+async def handle_ws(request):
+    engine = request.app["engine"]
+    min_interval = request.app["min_interval"]
+    ws = web.WebSocketResponse(heartbeat=20)
+    await ws.prepare(request)
+    subscriptions = {}
+    try:
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                data = json.loads(msg.data)
+                request_id = data.get("id")
+                # Ids key the subscriptions, so only plain scalars are accepted
+                if request_id is not None and (isinstance(request_id, bool)
+                                               or not isinstance(request_id, (str, int))):
+                    raise QuoteError("id must be a string or an integer")
+                if "quote" in data:
+                    result = await engine.quote(parse_request(data["quote"]))
+                    await ws.send_json({"id": request_id, "quote": result})
+                elif "subscribe" in data:
+                    quote_request = parse_request(data["subscribe"])
+                    if request_id in subscriptions:
+                        subscriptions.pop(request_id).cancel()
+                    subscriptions[request_id] = asyncio.ensure_future(
+                        _push_quotes(ws, engine, request_id, quote_request, min_interval))
+                elif "unsubscribe" in data:
+                    task = subscriptions.pop(request_id, None)
+                    if task is not None:
+                        task.cancel()
+                    await ws.send_json({"id": request_id, "unsubscribed": True})
+                else:
+                    raise QuoteError("Expected a quote, subscribe or unsubscribe message")
+            except (QuoteError, json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+                await ws.send_json({"error": str(e)})
+    finally:
+        for task in subscriptions.values():
+            task.cancel()
+    return ws
+
+
+def create_app(feed, max_delay=MAX_DELAY_S, max_batch=MAX_BATCH, min_interval=0.1, engine=None):
+    """Build the aiohttp application around a FeedManager (or FakeFeed)."""
+    app = web.Application()
+    app["engine"] = engine if engine is not None else QuoteEngine(feed, max_delay=max_delay, max_batch=max_batch)
+    app["min_interval"] = min_interval
+    app.router.add_get("/quote", handle_quote)
+    app.router.add_post("/quotes", handle_quotes)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/ws", handle_ws)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fake", action="store_true", help="Serve synthetic books instead of the OKX feed")
+    parser.add_argument("--max-delay-ms", type=float, default=MAX_DELAY_S * 1000)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--push-interval", type=float, default=0.1, help="Minimum seconds between WS pushes")
+    args = parser.parse_args()
+
+    if args.fake:
+        from wsclient.fake_feed import FakeFeed
+        from wsclient.okx_ws import SUPPORTED_INSTRUMENTS
+        feed = FakeFeed(SUPPORTED_INSTRUMENTS)
+        feed.start()
+    else:
+        from wsclient.okx_ws import feed, start_ws_thread
+        start_ws_thread()
+
+    app = create_app(feed, args.max_delay_ms / 1000, args.max_batch, args.push_interval)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
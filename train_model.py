@@ -1,17 +1,55 @@
 # train_model.py
-import numpy as np
-from models.maker_taker_model import train_maker_taker_model
-
-# Generate dummy training data (replace with your real data)
-num_samples = 1000
-features = np.array([
-    np.random.uniform(10, 10000, num_samples),  # quantity_usd
-    np.random.uniform(0, 1, num_samples),       # volatility
-    np.random.uniform(0.1, 5, num_samples)      # spread
-]).T  # Shape: (1000, 3)
-
-# Labels: 0=Taker, 1=Maker (dummy binary labels)
-labels = np.random.randint(0, 2, num_samples)
-
-# Train and save
-train_maker_taker_model(features, labels)
+"""
+Train the maker/taker classifier from captured tick data.
+
+    python train_model.py --capture captures/ [--fills fills.jsonl ...] [--promote]
+
+Book features come from a TickRecorder capture; labels are OKX fills
+(`execType` M/T) found in the capture or in the given JSONL files. Each run
+writes a new version under models/maker_taker_versions/; --promote also
+makes it the model used for live inference.
+"""
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capture", required=True, help="TickRecorder capture directory")
+    parser.add_argument("--prefix", default="okx", help="Capture file prefix")
+    parser.add_argument("--fills", nargs="*", default=[], help="JSONL files of OKX fills")
+    parser.add_argument("--inst", nargs="*", help="Instruments to use (default: all in the capture)")
+    parser.add_argument("--workers", type=int, help="Feature extraction processes (default: all cores)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--chunk-rows", type=int, help="Rows per memmapped chunk (default: 100000)")
+    parser.add_argument("--validation", type=float, default=0.2, help="Hold-out fraction")
+    parser.add_argument("--alpha", type=float, default=1e-4, help="SGD L2 regularization")
+    parser.add_argument("--max-staleness", type=float, default=5.0,
+                        help="Drop fills with no book update within this many seconds")
+    parser.add_argument("--workdir", help="Keep intermediate files here instead of a temp dir")
+    parser.add_argument("--versions-dir", help="Where versions are written (default: models/maker_taker_versions)")
+    parser.add_argument("--promote", action="store_true", help="Use the new version for live inference")
+    args = parser.parse_args()
+
+    # numpy and the pipeline load after argument parsing, so --help and typos return instantly
+    from models.maker_taker_training import CHUNK_ROWS, VERSIONS_DIR, run_pipeline
+
+    run_pipeline(
+        args.capture,
+        fill_files=args.fills,
+        inst_ids=args.inst,
+        prefix=args.prefix,
+        workers=args.workers,
+        epochs=args.epochs,
+        chunk_rows=args.chunk_rows or CHUNK_ROWS,
+        validation_fraction=args.validation,
+        alpha=args.alpha,
+        seed=42,
+        max_staleness_s=args.max_staleness,
+        workdir=args.workdir,
+        versions_dir=args.versions_dir or VERSIONS_DIR,
+        promote=args.promote,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,29 @@
 import sys
 import os
-import time
 import streamlit as st
-import numpy as np
-import pandas as pd
 
 # Local imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from wsclient.okx_ws import start_ws_thread, latest_data
-from models.fee_model import calculate_fees
-from models.slippage_model import estimate_slippage
-from models.impact_model import estimate_market_impact
-from models.maker_taker_model import predict_maker_taker
-from utils.latency import record_latency, latency_records
-from utils.history_buffer import MetricsBuffer
-
-# Start WebSocket thread
-start_ws_thread()
+from wsclient.okx_ws import start_ws_thread, feed, SUPPORTED_INSTRUMENTS
+from utils.latency import record_span, snapshot as latency_snapshot
+from utils.metrics_engine import get_engine
 
 # Streamlit Config
 st.set_page_config(page_title="GoQuant Real-Time Trade Simulator", layout="wide")
 st.title("📈 GoQuant Real-Time Trade Simulator")
 
-# State
-buffer = MetricsBuffer(maxlen=100)
+
+# Start WebSocket thread, metrics engine and maker/taker model once per process
+@st.cache_resource
+def start_engine():
+    start_ws_thread()
+    return get_engine(feed)
+
+
+engine = start_engine()
+
+# Rows of engine history shown in the chart and CSV export
+CHART_ROWS = 5000
 
 # Layout
 col1, col2 = st.columns([1, 2])
@@ -34,69 +34,58 @@ col1, col2 = st.columns([1, 2])
 with col1:
     st.header("⚙️ Input Parameters")
     exchange     = st.selectbox("Exchange", ["OKX"], index=0, disabled=True)
-    spot_asset   = st.selectbox("Spot Asset", ["BTC-USDT", "ETH-USDT", "SOL-USDT"])
+    spot_asset   = st.selectbox("Spot Asset", SUPPORTED_INSTRUMENTS)
     order_type   = st.radio("Order Type", ["Market"], index=0, disabled=True)
     quantity_usd = st.number_input("Quantity (USD)", min_value=10.0, max_value=10000.0, value=100.0, step=10.0)
-    volatility   = st.slider("Volatility (σ)", min_value=0.0, max_value=1.0, value=0.05, step=0.01)
+    live_vol     = st.checkbox("Live volatility (EWMA of mid returns)", value=True)
+    volatility   = st.slider("Volatility (σ)", min_value=0.0, max_value=1.0, value=0.05, step=0.01, disabled=live_vol)
     fee_tier     = st.selectbox("Fee Tier", ["Regular", "VIP 1", "VIP 2", "VIP 3"])
     is_maker     = st.radio("Order Role", ["Maker", "Taker"]) == "Maker"
+    refresh_s    = st.slider("Refresh interval (s)", min_value=0.5, max_value=10.0, value=1.0, step=0.5)
+
+view = engine.track(spot_asset, quantity_usd=quantity_usd, volatility=None if live_vol else volatility,
+                    fee_tier="Tier 1" if fee_tier == "Regular" else fee_tier, is_maker=is_maker,
+                    is_vip=fee_tier.startswith("VIP"))
+
 
 # ----------------------------
 # Right Panel: Outputs
 # ----------------------------
-with col2:
+@st.fragment(run_every=refresh_s)
+def output_panel():
+    import pandas as pd  # Only the chart, CSV and latency table need it
+
     st.header("📊 Output Metrics")
 
-    if latest_data:
-        start_time = time.time()
-
-        # Process Order Book
-        asks = latest_data.get("asks", [])
-        bids = latest_data.get("bids", [])
-        avg_ask = np.mean([float(a[0]) for a in asks]) if asks else 0
-        avg_bid = np.mean([float(b[0]) for b in bids]) if bids else 0
-        spread = abs(avg_ask - avg_bid)
-
-        st.write(f"**Latest Bid Price:** {avg_bid:.2f} USDT")
-        st.write(f"**Latest Ask Price:** {avg_ask:.2f} USDT")
-
-        # Compute Trading Metrics
-        slippage = estimate_slippage(quantity_usd, avg_ask, avg_bid)
-        impact   = estimate_market_impact(quantity_usd, volatility)
-        fees     = calculate_fees(quantity_usd, fee_tier, is_maker)
-        net_cost = slippage + impact + fees
-
-        # Predict Maker/Taker with trained model
-        try:
-            role, probs = predict_maker_taker(quantity_usd, volatility, spread)
-            prob_maker = probs[1]
-            st.metric("Predicted Role", role)
-            st.progress(prob_maker if role == "Maker" else 1 - prob_maker)
-        except Exception as e:
-            role = "Unknown"
-            st.error(f"⚠️ Maker/Taker prediction failed: {str(e)}")
-
-        # Record Latency
-        latency = record_latency(start_time)
-        recent_latency = latency_records[-1] if latency_records else 0
-
-        # Add to Buffer
-        buffer.add(
-            timestamp=latest_data.get("timestamp", time.strftime("%H:%M:%S")),
-            slippage=slippage,
-            impact=impact,
-            fee=fees,
-            net_cost=net_cost,
-            latency=recent_latency,
-            maker_taker_role=role
-        )
+    metrics = engine.latest(view)
+
+    if metrics:
+        integrity = feed.integrity_status(spot_asset)
+        if integrity["state"] == "stale":
+            st.warning(f"⚠️ Order book is {integrity['age_s']:.1f}s old. Waiting for fresh updates...")
+        elif integrity["state"] == "resyncing":
+            st.warning(f"🔁 Order book resyncing after: {integrity['last_problem'] or 'reconnect'}")
+
+        st.write(f"**Best Bid Price:** {metrics['best_bid']:.2f} USDT")
+        st.write(f"**Best Ask Price:** {metrics['best_ask']:.2f} USDT")
+        if metrics["microprice"] is not None:
+            st.write(f"**Microprice:** {metrics['microprice']:.2f} USDT | **Imbalance:** {metrics['imbalance']:+.2f}"
+                     f" | **σ:** {metrics['volatility']:.4f}")
+
+        # Predicted Maker/Taker from the trained model
+        role = metrics["maker_taker_role"]
+        prob_maker = metrics["maker_prob"]
+        st.metric("Predicted Role", role)
+        st.progress(prob_maker if role == "Maker" else 1 - prob_maker)
+        st.caption(f"Model version: {metrics['model_version']}")
 
         # Show Metrics
-        st.metric("Expected Slippage (USD)", f"${slippage:.4f}")
-        st.metric("Expected Fees (USD)", f"${fees:.4f}")
-        st.metric("Market Impact (USD)", f"${impact:.4f}")
-        st.metric("Net Cost (USD)", f"${net_cost:.4f}")
-        st.metric("Internal Latency (ms)", f"{recent_latency * 1000:.2f}")
+        st.metric("Expected Slippage (USD)", f"${metrics['slippage']:.4f}")
+        st.metric("Expected Fees (USD)", f"${metrics['fee']:.4f}")
+        st.metric("Market Impact (USD)", f"${metrics['impact']:.4f}")
+        st.metric("Net Cost (USD)", f"${metrics['net_cost']:.4f}")
+        st.metric("Internal Latency (ms)", f"{metrics['latency'] * 1000:.2f}")
+        st.metric("Engine Throughput (updates/s)", f"{engine.stats()['updates_per_sec']:.1f}")
 
     else:
         st.warning("Waiting for real-time order book data...")
@@ -104,17 +93,12 @@ with col2:
     # ----------------------------
     # Chart + Export
     # ----------------------------
-    if buffer.timestamps:
+    history = engine.history(view, CHART_ROWS)
+    if len(history["Timestamp"]):
         st.subheader("📈 Metrics Over Time")
-        df = pd.DataFrame({
-            "Timestamp": list(buffer.timestamps),
-            "Slippage": list(buffer.slippages),
-            "Impact": list(buffer.impacts),
-            "Fees": list(buffer.fees),
-            "Net Cost": list(buffer.net_costs),
-            "Latency (ms)": [l * 1000 for l in buffer.latencies],
-            "Order Role": list(buffer.maker_taker_roles),
-        }).set_index("Timestamp")
+        df = pd.DataFrame(history)
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], unit="s")
+        df = df.set_index("Timestamp")
 
         st.line_chart(df[["Slippage", "Impact", "Fees", "Net Cost", "Latency (ms)"]])
 
@@ -127,4 +111,22 @@ with col2:
             mime="text/csv"
         )
 
-    st.caption("🔄 Metrics update in real-time from WebSocket stream.")
\ No newline at end of file
+    # Engine compute -> rendered, counted once per engine update this session shows
+    if metrics and st.session_state.get("rendered_ns") != metrics["computed_ns"]:
+        st.session_state["rendered_ns"] = metrics["computed_ns"]
+        record_span("model_to_render", metrics["computed_ns"])
+
+    with st.expander("⏱️ Pipeline Latency (ms)"):
+        st.dataframe(pd.DataFrame(latency_snapshot()).T)
+
+    with st.expander("🩺 Feed Integrity"):
+        report = feed.integrity.snapshot()
+        st.dataframe(pd.DataFrame({key: {k: v for k, v in s.items() if k != "lag"} for key, s in report.items()}).T)
+        st.caption("Exchange-to-local lag (ms)")
+        st.dataframe(pd.DataFrame({key: s["lag"] for key, s in report.items()}).T)
+
+    st.caption("🔄 Metrics update in real-time from WebSocket stream.")
+
+
+with col2:
+    output_panel()
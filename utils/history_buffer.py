@@ -1,19 +1,185 @@
-from collections import deque
-class MetricsBuffer:
-    def __init__(self, maxlen=100):
-        self.timestamps = deque(maxlen=maxlen)
-        self.slippages = deque(maxlen=maxlen)
-        self.impacts = deque(maxlen=maxlen)
-        self.fees = deque(maxlen=maxlen)
-        self.net_costs = deque(maxlen=maxlen)
-        self.latencies = deque(maxlen=maxlen)
-        self.maker_taker_roles = deque(maxlen=maxlen)
+import os
+import time
+
+import numpy as np
+
+# Typed columns of the metric history
+METRICS_DTYPE = np.dtype([
+    ("timestamp", "<f8"),   # epoch seconds
+    ("slippage", "<f8"),
+    ("impact", "<f8"),
+    ("fee", "<f8"),
+    ("net_cost", "<f8"),
+    ("latency", "<f8"),     # seconds
+    ("is_maker", "i1"),     # 1 = Maker, 0 = Taker
+])
+
+
+class RingBuffer:
+    """
+    Preallocated columnar ring buffer over a structured NumPy dtype.
+
+    Every row is written twice (at `i` and `i + capacity`), so the last N
+    rows are always one contiguous slice and `last()` / `between()` return
+    zero-copy views. Running sums give O(1) mean/std for every numeric
+    column; evicted rows can be spilled to a raw binary file.
+
+    Parameters:
+    - capacity: Maximum number of rows kept in memory.
+    - dtype: Structured dtype of a row; the first field must be the time column.
+    - spill_path: Optional file that receives rows before they are evicted.
+    """
+
+    def __init__(self, capacity=100, dtype=METRICS_DTYPE, spill_path=None):
+        self.capacity = int(capacity)
+        self.dtype = np.dtype(dtype)
+        self.time_field = self.dtype.names[0]
+        self._data = np.zeros(2 * self.capacity, dtype=self.dtype)
+        self._column_idx = {name: k for k, name in enumerate(self.dtype.names)}
+        self._numeric_idx = [k for k, name in enumerate(self.dtype.names) if self.dtype[name].kind in "fiub"]
+        # Running sums per column, indexed by field position
+        self._sum = [0.0] * len(self.dtype.names)
+        self._sumsq = [0.0] * len(self.dtype.names)
+        self.total = 0  # rows ever appended
+        self.spill_path = spill_path
+        self._spilled = 0  # absolute index of the first row not yet spilled
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, row):
+        """Append one row (a tuple in dtype field order) in O(1)."""
+        i = self.total % self.capacity
+        sums, sumsqs = self._sum, self._sumsq
+        if self.total >= self.capacity:
+            if self.spill_path is not None and self._spilled <= self.total - self.capacity:
+                self._spill(self.total)
+            old = self._data[i].item()
+            for k in self._numeric_idx:
+                value = float(old[k])
+                sums[k] -= value
+                sumsqs[k] -= value * value
+
+        self._data[i] = row
+        self._data[i + self.capacity] = row
+        for k in self._numeric_idx:
+            value = float(row[k])
+            sums[k] += value
+            sumsqs[k] += value * value
+        self.total += 1
+
+        # Re-derive the running sums once per lap to bound floating point drift
+        if self.total % self.capacity == 0:
+            self._resum()
+
+    def _resum(self):
+        window = self.last()
+        for k in self._numeric_idx:
+            column = window[self.dtype.names[k]].astype(np.float64)
+            self._sum[k] = float(column.sum())
+            self._sumsq[k] = float((column * column).sum())
+
+    def last(self, n=None):
+        """Zero-copy, contiguous view of the newest `n` rows (oldest first)."""
+        size = len(self)
+        n = size if n is None else max(0, min(n, size))
+        end = self.total % self.capacity + (self.capacity if self.total >= self.capacity else 0)
+        return self._data[end - n:end]
+
+    def between(self, start=None, end=None):
+        """Zero-copy view of rows whose time column lies in [start, end]."""
+        window = self.last()
+        times = window[self.time_field]
+        lo = 0 if start is None else np.searchsorted(times, start, side="left")
+        hi = len(window) if end is None else np.searchsorted(times, end, side="right")
+        return window[lo:hi]
+
+    def mean(self, column):
+        """Mean of `column` over the whole window, O(1)."""
+        n = len(self)
+        return self._sum[self._column_idx[column]] / n if n else 0.0
+
+    def std(self, column):
+        """Population standard deviation of `column` over the whole window, O(1)."""
+        n = len(self)
+        if n == 0:
+            return 0.0
+        k = self._column_idx[column]
+        mean = self._sum[k] / n
+        return float(np.sqrt(max(self._sumsq[k] / n - mean * mean, 0.0)))
+
+    def quantiles(self, column, qs=(0.5, 0.9, 0.99), n=None):
+        """Quantiles of `column` over the newest `n` rows (vectorized over the view)."""
+        window = self.last(n)[column]
+        if len(window) == 0:
+            return np.zeros(len(qs))
+        return np.quantile(window, qs)
+
+    def _spill(self, upto):
+        """Append rows [_spilled, upto) to the spill file."""
+        start = max(self._spilled, upto - self.capacity)
+        count = upto - start
+        if count <= 0:
+            return
+        rows = self.last()[len(self) - (self.total - start):][:count]
+        with open(self.spill_path, "ab") as f:
+            rows.tofile(f)
+        self._spilled = upto
+
+    def flush(self):
+        """Spill everything still only held in memory."""
+        if self.spill_path is not None:
+            self._spill(self.total)
+
+    @staticmethod
+    def load_spill(path, dtype=METRICS_DTYPE):
+        """Memory-map a spill file back as a structured array."""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+
+class MetricsBuffer(RingBuffer):
+    """Metric history for the dashboards, backed by a METRICS_DTYPE ring buffer."""
+
+    def __init__(self, maxlen=100, spill_path=None):
+        super().__init__(capacity=maxlen, dtype=METRICS_DTYPE, spill_path=spill_path)
 
     def add(self, timestamp, slippage, impact, fee, net_cost, latency, maker_taker_role):
-        self.timestamps.append(timestamp)
-        self.slippages.append(slippage)
-        self.impacts.append(impact)
-        self.fees.append(fee)
-        self.net_costs.append(net_cost)
-        self.latencies.append(latency)
-        self.maker_taker_roles.append(maker_taker_role)
+        # Accept OKX millisecond timestamps (str or number) or epoch seconds
+        try:
+            ts = float(timestamp)
+            if ts > 1e11:
+                ts /= 1000.0
+        except (TypeError, ValueError):
+            ts = time.time()
+        self.append((ts, slippage, impact, fee, net_cost, latency, maker_taker_role == "Maker"))
+
+    # Column views of the whole window, kept for the former deque attributes
+    @property
+    def timestamps(self):
+        return self.last()["timestamp"]
+
+    @property
+    def slippages(self):
+        return self.last()["slippage"]
+
+    @property
+    def impacts(self):
+        return self.last()["impact"]
+
+    @property
+    def fees(self):
+        return self.last()["fee"]
+
+    @property
+    def net_costs(self):
+        return self.last()["net_cost"]
+
+    @property
+    def latencies(self):
+        return self.last()["latency"]
+
+    @property
+    def maker_taker_roles(self):
+        return np.where(self.last()["is_maker"] == 1, "Maker", "Taker")
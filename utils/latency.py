@@ -1,26 +1,258 @@
+import json
+import os
+import sys
+import tempfile
+import threading
 import time
 
-# Global list to store latency records (in seconds)
-latency_records = []
+# Monotonic clock used for every in-process span
+now_ns = time.perf_counter_ns
+
+# Named pipeline stages tracked by default
+STAGES = (
+    "exchange_to_receive",  # exchange `ts` -> local receive (wall clock)
+    "receive_to_decode",    # raw message -> parsed dict
+    "decode_to_book",       # parsed dict -> book delta applied
+    "book_to_model",        # book read -> cost models evaluated
+    "model_to_render",      # models evaluated -> UI rendered
+)
+
+# Where `export_snapshot` writes by default, so the CLI can find it
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "latency_snapshot.json")
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory, log-bucketed latency histogram (HDR style).
+
+    Values in nanoseconds are mapped to 2^(precision_bits - 1) linear
+    sub-buckets per power of two, so a bucket is at most 2^-(precision_bits - 1)
+    of its values wide (1.56% at the default 7 bits) and the bucket midpoints
+    that are reported are within half that, 2^-precision_bits (0.78%). Memory stays
+    constant no matter how many samples are recorded.
+    """
+
+    def __init__(self, precision_bits=7, max_value_ns=60 * 10**9):
+        self.precision_bits = precision_bits
+        self._sub = 1 << precision_bits
+        self._half = self._sub >> 1
+        self.max_trackable = max_value_ns
+        self.counts = [0] * (self._index(max_value_ns) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.last = 0
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        if value < self._sub:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return (shift + 1) * self._half + ((value >> shift) - self._half)
+
+    def _value_at(self, index):
+        """Midpoint of the bucket at `index`, in nanoseconds."""
+        if index < self._sub:
+            return index
+        shift = index // self._half - 1
+        low = (index - shift * self._half) << shift
+        return low + ((1 << shift) >> 1)
+
+    def record(self, value_ns):
+        value_ns = int(value_ns)
+        if value_ns < 0:
+            value_ns = 0
+        index = min(self._index(value_ns), len(self.counts) - 1)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ns
+            self.last = value_ns
+            if value_ns > self.max:
+                self.max = value_ns
+            if self.min is None or value_ns < self.min:
+                self.min = value_ns
+
+    def percentile(self, q):
+        """Value (ns) at percentile `q` in [0, 100]; 0 if empty."""
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * q / 100.0)))
+        running = 0
+        for index, c in enumerate(self.counts):
+            if c:
+                running += c
+                if running >= target:
+                    return min(self._value_at(index), self.max)
+        return self.max
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.count = 0
+            self.total = 0
+            self.min = None
+            self.max = 0
+            self.last = 0
+
+    def summary(self):
+        """p50/p90/p99/p99.9/max/mean/last in milliseconds, plus the sample count."""
+        ms = 1e-6
+        return {
+            "count": self.count,
+            "p50": self.percentile(50) * ms,
+            "p90": self.percentile(90) * ms,
+            "p99": self.percentile(99) * ms,
+            "p999": self.percentile(99.9) * ms,
+            "max": self.max * ms,
+            "mean": (self.total / self.count) * ms if self.count else 0.0,
+            "last": self.last * ms,
+        }
+
+
+# Process-wide registry of named histograms
+histograms = {}
+_registry_lock = threading.Lock()
+
+
+def get_histogram(stage):
+    hist = histograms.get(stage)
+    if hist is None:
+        with _registry_lock:
+            hist = histograms.setdefault(stage, LatencyHistogram())
+    return hist
+
+
+for _stage in STAGES:
+    get_histogram(_stage)
+
+
+def record_ns(stage, duration_ns):
+    """Record one duration (nanoseconds) for a named stage."""
+    get_histogram(stage).record(duration_ns)
+
+
+def record_span(stage, start_ns, end_ns=None):
+    """Record `end_ns - start_ns` (both from `now_ns()`) and return the end timestamp."""
+    if end_ns is None:
+        end_ns = now_ns()
+    get_histogram(stage).record(end_ns - start_ns)
+    return end_ns
+
+
+def record_exchange_lag(exchange_ts_ms, received_ns=None):
+    """Record exchange timestamp (epoch ms) -> local receive time (epoch ns, wall clock)."""
+    if received_ns is None:
+        received_ns = time.time_ns()
+    get_histogram("exchange_to_receive").record(received_ns - int(exchange_ts_ms) * 1_000_000)
+
+
+class timed:
+    """
+    Context manager recording the duration of its block:
+
+        with timed("book_to_model"):
+            ...
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = now_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed_ns = now_ns() - self.start
+        get_histogram(self.stage).record(self.elapsed_ns)
+        return False
+
+
+def snapshot():
+    """Summaries of every histogram, keyed by stage name."""
+    return {stage: hist.summary() for stage, hist in list(histograms.items())}
+
+
+def export_snapshot(path=SNAPSHOT_PATH):
+    """Atomically write `snapshot()` as JSON so other processes can read it."""
+    data = {"generated_at": time.time(), "stages": snapshot()}
+    # A private temp file per call, so concurrent exporters never replace each other's file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return data
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(path=SNAPSHOT_PATH, interval_s=1.0):
+    """Export the snapshot every `interval_s` seconds from one daemon thread per process (idempotent)."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None or not _exporter.is_alive():
+            def run():
+                while True:
+                    time.sleep(interval_s)
+                    try:
+                        export_snapshot(path)
+                    except OSError as e:
+                        print(f"⚠️ Latency snapshot export failed: {e}")
+
+            _exporter = threading.Thread(target=run, daemon=True, name="latency-exporter")
+            _exporter.start()
+        return _exporter
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_snapshot(stages):
+    lines = [f"{'stage':<22}{'count':>10}{'p50':>12}{'p90':>12}{'p99':>12}{'p99.9':>12}{'max':>12}  (ms)"]
+    for stage, s in stages.items():
+        lines.append(f"{stage:<22}{s['count']:>10}{s['p50']:>12.3f}{s['p90']:>12.3f}"
+                     f"{s['p99']:>12.3f}{s['p999']:>12.3f}{s['max']:>12.3f}")
+    return "\n".join(lines)
+
+
+# Legacy helpers -----------------------------------------------------------
 
 # Function to record latency based on WebSocket message processing time
-def record_latency(start_time):
+def record_latency(start_time, stage="processing"):
     """
-    Calculate latency as the time difference between when the WebSocket message
-    was received and the time when it was processed.
+    Record the time elapsed since `start_time` (a `time.time()` value) into
+    the histogram for `stage` and return it in seconds.
     """
-    end_time = time.time()  # Current time when processing is complete
-    latency = end_time - start_time  # Latency is the difference in time
-    latency_records.append(latency)  # Append the latency to the list
+    latency = time.time() - start_time
+    get_histogram(stage).record(latency * 1e9)
+    return latency
 
-    return latency  # Return the calculated latency
 
-# Optional: Function to get the latest latency from the recorded latencies
-def get_latest_latency():
+def get_latest_latency(stage="processing"):
     """
-    Return the most recent latency recorded. If no latency is recorded,
-    it returns None.
+    Return the most recent latency (seconds) recorded for `stage`, or None
+    if nothing was recorded yet.
     """
-    if latency_records:
-        return latency_records[-1]  # Return the most recent latency
-    return None  # Return None if no latency records exist
+    hist = histograms.get(stage)
+    if hist is None or hist.count == 0:
+        return None
+    return hist.last * 1e-9
+
+
+if __name__ == "__main__":
+    # python -m utils.latency [snapshot.json]
+    path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    data = load_snapshot(path)
+    age = time.time() - data["generated_at"]
+    print(f"⏱️ Latency snapshot from {path} ({age:.1f}s old)")
+    print(format_snapshot(data["stages"]))
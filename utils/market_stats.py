@@ -0,0 +1,264 @@
+# utils/market_stats.py
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Volatilities are reported per this many seconds (daily, like the σ slider)
+VOL_HORIZON_S = 86_400.0
+
+DEFAULT_EWMA_HALFLIVES_S = (30.0, 300.0, 1800.0)
+DEFAULT_REALIZED_WINDOWS_S = (60.0, 300.0, 3600.0)
+DEFAULT_DEPTH_BPS = (5.0, 10.0, 50.0)
+
+# Returns needed before a volatility estimate is handed to the cost models
+MIN_VOL_SAMPLES = 20
+
+
+class Welford:
+    """Running mean and variance in O(1) per sample (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class EWMAVolatility:
+    """
+    Time-decayed EWMA of squared log returns.
+
+    Ticks arrive at irregular intervals, so each update is weighted by the
+    time elapsed since the previous one and the variance rate is the EWMA
+    of squared returns divided by the EWMA of the elapsed time.
+
+    Parameters:
+    - halflife_s: Seconds after which an observation's weight has halved.
+    """
+
+    def __init__(self, halflife_s):
+        self.halflife_s = halflife_s
+        self._sq = 0.0
+        self._dt = 0.0
+        self.count = 0
+
+    def update(self, log_return, dt):
+        alpha = 1 - math.exp(-math.log(2) * dt / self.halflife_s)
+        self._sq += alpha * (log_return * log_return - self._sq)
+        self._dt += alpha * (dt - self._dt)
+        self.count += 1
+
+    def volatility(self, horizon_s=VOL_HORIZON_S):
+        if self._dt <= 0:
+            return 0.0
+        return math.sqrt(self._sq / self._dt * horizon_s)
+
+
+class RealizedVolatility:
+    """
+    Realized volatility over a sliding time window.
+
+    A running sum of squared returns is kept; returns older than the
+    window are subtracted as they expire, so each tick costs amortized O(1).
+
+    Parameters:
+    - window_s: Window length in seconds.
+    """
+
+    def __init__(self, window_s):
+        self.window_s = window_s
+        self._returns = deque()
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, log_return, t):
+        sq = log_return * log_return
+        self._returns.append((t, sq))
+        self._sum += sq
+        cutoff = t - self.window_s
+        while self._returns and self._returns[0][0] <= cutoff:
+            self._sum -= self._returns.popleft()[1]
+        # Re-add from scratch periodically to bound floating point drift
+        self._count += 1
+        if self._count % 100_000 == 0:
+            self._sum = sum(s for _, s in self._returns)
+
+    def volatility(self, horizon_s=VOL_HORIZON_S):
+        if len(self._returns) < 2:
+            return 0.0
+        span = min(self.window_s, self._returns[-1][0] - self._returns[0][0])
+        if span <= 0:
+            return 0.0
+        return math.sqrt(max(self._sum, 0.0) / span * horizon_s)
+
+
+class MarketStats:
+    """
+    Streaming microstructure estimators for one instrument.
+
+    `update(book)` is called once per applied book update and costs O(1)
+    plus a binary search per depth band: top-of-book spread, microprice,
+    imbalance, depth within each bps band, spread mean/std (Welford) and
+    EWMA / realized volatility of mid log returns over several horizons.
+
+    Parameters:
+    - inst_id: Instrument the estimators belong to.
+    - ewma_halflives_s: Half-lives of the EWMA volatility estimators.
+    - realized_windows_s: Windows of the realized volatility estimators.
+    - depth_bps: Bands around the mid for the depth-at-bps measures.
+    - volatility_halflife_s: Half-life of the estimate returned by `volatility()`.
+    """
+
+    def __init__(self, inst_id, ewma_halflives_s=DEFAULT_EWMA_HALFLIVES_S,
+                 realized_windows_s=DEFAULT_REALIZED_WINDOWS_S, depth_bps=DEFAULT_DEPTH_BPS,
+                 volatility_halflife_s=300.0):
+        self.inst_id = inst_id
+        self.ewma = {h: EWMAVolatility(h) for h in set(ewma_halflives_s) | {volatility_halflife_s}}
+        self.volatility_halflife_s = volatility_halflife_s
+        self.realized = {w: RealizedVolatility(w) for w in realized_windows_s}
+        self.depth_bps = tuple(depth_bps)
+        self.spread_bps = Welford()
+        self.updates = 0
+        self._last_mid = None
+        self._last_t = None
+        self._latest = None
+
+    def update(self, book, t=None):
+        """Fold one book state into the estimators. Caller holds the book's lock."""
+        bids, asks = book.bids, book.asks
+        if bids.n == 0 or asks.n == 0:
+            return None
+        if t is None:
+            t = float(book.ts) / 1000.0 if book.ts else time.time()
+
+        bid, ask = float(bids.prices[0]), float(asks.prices[0])
+        bid_sz, ask_sz = float(bids.sizes[0]), float(asks.sizes[0])
+        mid = (bid + ask) / 2
+        spread = ask - bid
+        top = bid_sz + ask_sz
+        microprice = (bid * ask_sz + ask * bid_sz) / top if top > 0 else mid
+        imbalance = (bid_sz - ask_sz) / top if top > 0 else 0.0
+
+        # Depth within each band: asks ascending, bids descending
+        ask_px, ask_q = asks.prices[:asks.n], asks.sizes[:asks.n]
+        bid_px, bid_q = bids.prices[:bids.n], bids.sizes[:bids.n]
+        bid_ascending = bid_px[::-1]  # Reversed view, no copy
+        depth = {}
+        for bps in self.depth_bps:
+            k_ask = int(np.searchsorted(ask_px, mid * (1 + bps / 1e4), side="right"))
+            # Bids at or above the band edge = all bids minus those strictly below it
+            k_bid = bids.n - int(np.searchsorted(bid_ascending, mid * (1 - bps / 1e4), side="left"))
+            depth[bps] = (float(bid_px[:k_bid] @ bid_q[:k_bid]), float(ask_px[:k_ask] @ ask_q[:k_ask]))
+
+        if mid > 0:
+            self.spread_bps.update(spread / mid * 1e4)
+            if self._last_mid is None:
+                self._last_mid, self._last_t = mid, t
+            elif t > self._last_t:
+                # Updates sharing a timestamp are folded into one return
+                r = math.log(mid / self._last_mid)
+                dt = t - self._last_t
+                for estimator in self.ewma.values():
+                    estimator.update(r, dt)
+                for estimator in self.realized.values():
+                    estimator.update(r, t)
+                self._last_mid, self._last_t = mid, t
+        self.updates += 1
+
+        band_bid, band_ask = depth[self.depth_bps[0]] if self.depth_bps else (0.0, 0.0)
+        band_total = band_bid + band_ask
+        self._latest = {
+            "inst_id": self.inst_id,
+            "t": t,
+            "best_bid": bid,
+            "best_ask": ask,
+            "mid": mid,
+            "spread": spread,
+            "spread_bps": spread / mid * 1e4 if mid > 0 else 0.0,
+            "microprice": microprice,
+            "imbalance": imbalance,
+            "depth_imbalance": (band_bid - band_ask) / band_total if band_total > 0 else 0.0,
+            "depth_usd": depth,
+        }
+        return self._latest
+
+    def volatility(self, horizon_s=VOL_HORIZON_S):
+        """
+        The volatility fed to the cost models: the EWMA estimate with the
+        `volatility_halflife_s` half-life, or 0.0 until MIN_VOL_SAMPLES returns.
+        """
+        estimator = self.ewma[self.volatility_halflife_s]
+        return estimator.volatility(horizon_s) if estimator.count >= MIN_VOL_SAMPLES else 0.0
+
+    def snapshot(self, horizon_s=VOL_HORIZON_S):
+        """The latest top-of-book measures plus every volatility estimate."""
+        if self._latest is None:
+            return None
+        data = dict(self._latest)
+        data["volatility"] = self.volatility(horizon_s)
+        data["ewma_vol"] = {h: e.volatility(horizon_s) for h, e in self.ewma.items()}
+        data["realized_vol"] = {w: r.volatility(horizon_s) for w, r in self.realized.items()}
+        data["spread_bps_mean"] = self.spread_bps.mean
+        data["spread_bps_std"] = self.spread_bps.std
+        data["updates"] = self.updates
+        return data
+
+
+class StatsTracker:
+    """
+    Keeps a MarketStats per instrument up to date from a FeedManager.
+
+    The estimators are updated inside the feed's listener, under the book
+    lock, on every applied `books` update, so readers only ever fetch the
+    latest values.
+    """
+
+    def __init__(self, feed, channel="books", **stats_kwargs):
+        self.feed = feed
+        self.channel = channel
+        self.stats_kwargs = stats_kwargs
+        self.stats = {}
+        self._lock = threading.Lock()
+        feed.add_listener(self._on_book_update)
+
+    def _stats_for(self, inst_id):
+        stats = self.stats.get(inst_id)
+        if stats is None:
+            with self._lock:
+                stats = self.stats.setdefault(inst_id, MarketStats(inst_id, **self.stats_kwargs))
+        return stats
+
+    def _on_book_update(self, channel, inst_id):
+        if channel != self.channel:
+            return
+        book = self.feed.get_book(inst_id, channel)
+        lock = self.feed.lock_for(inst_id)
+        if book is None or lock is None:
+            return
+        with lock:
+            if book.ready:
+                self._stats_for(inst_id).update(book)
+
+    def get(self, inst_id):
+        """Snapshot of `inst_id`'s estimators, or None before its first book."""
+        stats = self.stats.get(inst_id)
+        return stats.snapshot() if stats is not None else None
+
+    def close(self):
+        self.feed.remove_listener(self._on_book_update)
@@ -0,0 +1,331 @@
+# utils/metrics_engine.py
+import threading
+import time
+
+import numpy as np
+
+from models.fee_model import get_fee_engine
+from models.impact_model import estimate_market_impact
+from models.maker_taker_model import active_model, get_registry, load_model, predict_maker_taker
+from models.slippage_model import walk_book_batch
+from utils.history_buffer import MetricsBuffer
+from utils.latency import now_ns, record_span
+from utils.market_stats import StatsTracker
+
+# Used while the live volatility estimate is still warming up
+FALLBACK_VOLATILITY = 0.05
+
+DEFAULT_PARAMS = {
+    "quantity_usd": 100.0,
+    "volatility": None,  # None: live EWMA estimate from the tick stream
+    "fee_tier": "Tier 1",
+    "is_maker": False,
+    "is_vip": False,
+    "exchange": "okx",
+    "instrument_type": "spot",
+}
+
+# Views nobody has read for this long are dropped (the engine's default view is kept)
+VIEW_IDLE_S = 60.0
+# Live views at most; tracking one more drops the least recently read
+MAX_VIEWS = 16
+# History rows of views other than the default (the dashboards chart 5000)
+VIEW_HISTORY_SIZE = 10_000
+
+
+def view_key(inst_id, params):
+    """Hashable key of an instrument priced with a full parameter set."""
+    return (inst_id, tuple(sorted(params.items())))
+
+
+class MetricsView:
+    """Latest metrics and history of one instrument priced with one parameter set."""
+
+    def __init__(self, inst_id, params, history_size):
+        self.inst_id = inst_id
+        self.params = params
+        self.buffer = MetricsBuffer(maxlen=history_size)
+        self.lock = threading.Lock()
+        self.latest = None
+        self.last_version = None
+        self.last_read = time.time()
+
+
+class MetricsEngine:
+    """
+    Long-lived worker that recomputes the cost metrics on every book update.
+
+    The engine is woken by the FeedManager listener hook and computes
+    slippage, impact, fees, net cost and the maker/taker role for every
+    tracked view: an (instrument, order parameters) pair with its own latest
+    metrics and history buffer. Sessions call `track()` with their inputs
+    and read `latest(key)` / `history(key)` snapshots, so two browser tabs
+    never overwrite each other's parameters or history, and page refreshes
+    never throttle or duplicate the computation. Views sharing a book are
+    priced from one read of it under the book lock. Every UI input change
+    starts a new view, so session views keep a short history and at most
+    `max_views` stay live. Volatility (unless fixed in the params) and the
+    spread come from the streaming estimators of a StatsTracker.
+    """
+
+    def __init__(self, feed, inst_id="BTC-USDT", params=None, history_size=100_000, tracker=None,
+                 idle_s=VIEW_IDLE_S, max_views=MAX_VIEWS, view_history_size=VIEW_HISTORY_SIZE):
+        self.feed = feed
+        # Registered before the engine's own listener so estimators update first
+        self.tracker = tracker if tracker is not None else StatsTracker(feed)
+        self.history_size = history_size
+        self.view_history_size = view_history_size
+        self.idle_s = idle_s
+        self.max_views = max_views
+        self.default_key = None
+        self._views = {}
+        self._instruments = frozenset()
+        self._views_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_evict = time.time()
+        self.computed = 0
+        self._rate_window = (time.time(), 0)
+        self.updates_per_sec = 0.0
+        self.default_key = self._track(inst_id, params or {}, history_size)
+        feed.add_listener(self._on_book_update)
+
+    # ------------------------------------------------------------------
+    # Views (called from the UI thread)
+    # ------------------------------------------------------------------
+    def track(self, inst_id, **params):
+        """
+        Start (or keep) computing metrics for `inst_id` priced with `params`.
+
+        Parameters:
+        - inst_id: Instrument to price, e.g. "BTC-USDT".
+        - params: Overrides of DEFAULT_PARAMS (quantity_usd, volatility, fee_tier, ...).
+
+        Returns:
+        - The view key to pass to `latest` and `history`. Sessions with the
+          same inputs share a view.
+
+        Raises:
+        - ValueError: If the fee tier is unknown.
+        """
+        return self._track(inst_id, params, self.view_history_size)
+
+    def _track(self, inst_id, params, history_size):
+        params = dict(DEFAULT_PARAMS, **params)
+        get_fee_engine(params["exchange"], params["instrument_type"]).tier_index(params["fee_tier"])
+        key = view_key(inst_id, params)
+        view = self._views.get(key)
+        if view is None:
+            with self._views_lock:
+                view = self._views.get(key)
+                if view is None:
+                    view = MetricsView(inst_id, params, history_size)
+                    views = dict(self._views)
+                    evictable = [k for k in views if k != self.default_key]
+                    if len(views) >= self.max_views and evictable:
+                        del views[min(evictable, key=lambda k: views[k].last_read)]
+                    views[key] = view
+                    self._set_views(views)
+                    self._wake.set()
+        view.last_read = time.time()
+        return key
+
+    def _set_views(self, views):
+        # Copy-on-write: the worker iterates a dict that is never mutated under it
+        self._views = views
+        self._instruments = frozenset(view.inst_id for view in views.values())
+
+    def evict_idle(self, now=None):
+        """Drop views not read for `idle_s` seconds (never the default view). Returns how many were dropped."""
+        now = time.time() if now is None else now
+        with self._views_lock:
+            views = {key: view for key, view in self._views.items()
+                     if key == self.default_key or now - view.last_read < self.idle_s}
+            dropped = len(self._views) - len(views)
+            if dropped:
+                self._set_views(views)
+        return dropped
+
+    def start(self):
+        """Start the worker thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            load_model()
+            get_registry()  # Hot-swaps retrained models in without restarting the feed
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _on_book_update(self, channel, inst_id):
+        if channel == "books" and inst_id in self._instruments:
+            self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.step()
+                if time.time() - self._last_evict >= 1.0:
+                    self._last_evict = time.time()
+                    self.evict_idle()
+            except Exception as e:
+                print(f"❌ Metrics engine error: {e}")
+
+    def step(self):
+        """Recompute every view whose book changed. Returns {view key: metrics} for the views updated."""
+        by_instrument = {}
+        for key, view in self._views.items():
+            by_instrument.setdefault(view.inst_id, []).append((key, view))
+        results = {}
+        for inst_id, views in by_instrument.items():
+            results.update(self._step_instrument(inst_id, views))
+        return results
+
+    def _step_instrument(self, inst_id, views):
+        book = self.feed.get_book(inst_id)
+        lock = self.feed.lock_for(inst_id)
+        if book is None or lock is None:
+            return {}
+
+        start = now_ns()
+        with lock:
+            if not book.ready:
+                return {}
+            version = book.updates
+            pending = [(key, view) for key, view in views if view.last_version != version]
+            if not pending:
+                return {}
+            ts = book.ts
+            best_bid, best_ask = book.best_bid(), book.best_ask()
+            spread = book.spread()
+            ask_px, ask_sz = book.asks.levels()
+            # Every view's order size is walked in one pass over the ask side
+            quantities = np.array([view.params["quantity_usd"] for _, view in pending], dtype=np.float64)
+            walked = walk_book_batch(quantities, ask_px, ask_sz, mid=book.mid(), side="buy")
+        received = self.feed.received.get(inst_id, time.time())
+
+        stats = self.tracker.get(inst_id)
+        live_volatility = stats["volatility"] if stats is not None and stats["volatility"] > 0 else FALLBACK_VOLATILITY
+        model = active_model()
+
+        results = {}
+        for i, (key, view) in enumerate(pending):
+            params = view.params
+            quantity_usd = params["quantity_usd"]
+            volatility = live_volatility if params["volatility"] is None else params["volatility"]
+            slippage = float(walked["slippage"][i])
+            impact = estimate_market_impact(quantity_usd, volatility)
+            fee_engine = get_fee_engine(params["exchange"], params["instrument_type"])
+            fees = fee_engine.fee(quantity_usd, params["fee_tier"], params["is_maker"], params["is_vip"])
+            net_cost = slippage + impact + fees
+            role, probs = predict_maker_taker(quantity_usd, volatility, spread, model=model)
+            computed_ns = now_ns()
+            latency = time.time() - received
+
+            metrics = {
+                "inst_id": inst_id,
+                "timestamp": ts,
+                "best_bid": best_bid,
+                "best_ask": best_ask,
+                "spread": spread,
+                "volatility": volatility,
+                "microprice": stats["microprice"] if stats is not None else None,
+                "imbalance": stats["imbalance"] if stats is not None else None,
+                "slippage": slippage,
+                "impact": impact,
+                "fee": fees,
+                "net_cost": net_cost,
+                "maker_taker_role": role,
+                "maker_prob": float(probs[1]),
+                "model_version": model.version,
+                "latency": latency,
+                "computed_at": time.time(),
+                "computed_ns": computed_ns,  # now_ns() clock, for the model_to_render span
+            }
+            with view.lock:
+                view.buffer.add(
+                    timestamp=ts,
+                    slippage=slippage,
+                    impact=impact,
+                    fee=fees,
+                    net_cost=net_cost,
+                    latency=latency,
+                    maker_taker_role=role
+                )
+            view.latest = metrics
+            view.last_version = version
+            results[key] = metrics
+            self._count_update()
+        record_span("book_to_model", start)
+        return results
+
+    def _count_update(self):
+        self.computed += 1
+        started, count = self._rate_window
+        elapsed = time.time() - started
+        if elapsed >= 1.0:
+            self.updates_per_sec = (self.computed - count) / elapsed
+            self._rate_window = (time.time(), self.computed)
+
+    # ------------------------------------------------------------------
+    # Readers (called from the UI thread)
+    # ------------------------------------------------------------------
+    def _view(self, key):
+        key = self.default_key if key is None else key
+        view = self._views.get(key)
+        if view is None:
+            # Evicted while its session was away: start tracking it again
+            self.track(key[0], **dict(key[1]))
+            view = self._views[key]
+        view.last_read = time.time()
+        return view
+
+    def latest(self, key=None):
+        """The most recent metrics dict of a view (the default view if `key` is None), or None before its first update."""
+        return self._view(key).latest
+
+    def history(self, key=None, n=None):
+        """Copy of the newest `n` history rows of a view as a dict of column arrays."""
+        view = self._view(key)
+        with view.lock:
+            # One contiguous block copy; the live view would be overwritten under the reader
+            rows = view.buffer.last(n).copy()
+        return {
+            "Timestamp": rows["timestamp"],
+            "Slippage": rows["slippage"],
+            "Impact": rows["impact"],
+            "Fees": rows["fee"],
+            "Net Cost": rows["net_cost"],
+            "Latency (ms)": rows["latency"] * 1000,
+            "Order Role": np.where(rows["is_maker"] == 1, "Maker", "Taker"),
+        }
+
+    def stats(self):
+        return {"computed": self.computed, "updates_per_sec": self.updates_per_sec, "views": len(self._views)}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(feed=None, inst_id="BTC-USDT"):
+    """Process-wide engine singleton, created (and started) on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            if feed is None:
+                from wsclient.okx_ws import feed
+            _engine = MetricsEngine(feed, inst_id)
+            _engine.start()
+        return _engine
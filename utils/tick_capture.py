@@ -0,0 +1,291 @@
+# utils/tick_capture.py
+import glob
+import gzip
+import json
+import mmap
+import os
+import shutil
+import struct
+import time
+
+import numpy as np
+
+# One fixed-width row per book level in every captured push
+TICK_DTYPE = np.dtype([
+    ("recv_ns", "<i8"),   # local receive time, epoch ns
+    ("ts", "<i8"),        # exchange timestamp, epoch ms
+    ("msg", "<u4"),       # message sequence number within the capture
+    ("inst", "<u2"),      # index into the capture's instrument list
+    ("side", "i1"),       # 0 = bid, 1 = ask
+    ("action", "i1"),     # 0 = snapshot, 1 = update
+    ("level", "<u2"),     # position of the level inside the message
+    ("price", "<f8"),
+    ("size", "<f8"),
+])
+
+MAGIC = b"OKXTICKS"
+HEADER = struct.Struct("<8sII")  # magic, version, record size
+VERSION = 1
+RAW_ENTRY = struct.Struct("<qI")  # recv_ns, payload length
+
+BID, ASK = 0, 1
+SNAPSHOT, UPDATE = 0, 1
+BOOK_CHANNELS = ("books", "books5", "bbo-tbt")
+
+
+class TickRecorder:
+    """
+    Appends book updates to segmented binary capture files.
+
+    Every push produces fixed-width TICK_DTYPE rows in `<prefix>-NNNNNN.ticks`
+    and, optionally, the raw message in `<prefix>-NNNNNN.raw`. A segment is
+    closed (and gzip-compressed if requested) after `segment_records` rows.
+    The instrument list lives in `<prefix>.meta.json`.
+    """
+
+    def __init__(self, directory, prefix="okx", segment_records=1_000_000, compress=False,
+                 record_raw=True):
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_records = segment_records
+        self.compress = compress
+        self.record_raw = record_raw
+        self.instruments = []
+        self._inst_index = {}
+        self.msg_count = 0
+        self.segment = 0
+        self._rows_in_segment = 0
+        self._ticks = None
+        self._raw = None
+        self._buffer = np.zeros(1024, dtype=TICK_DTYPE)
+        os.makedirs(directory, exist_ok=True)
+        self._open_segment()
+
+    def _path(self, segment, ext):
+        return os.path.join(self.directory, f"{self.prefix}-{segment:06d}.{ext}")
+
+    def _open_segment(self):
+        self.segment += 1
+        self._rows_in_segment = 0
+        self._ticks = open(self._path(self.segment, "ticks"), "wb")
+        self._ticks.write(HEADER.pack(MAGIC, VERSION, TICK_DTYPE.itemsize))
+        self._raw = open(self._path(self.segment, "raw"), "wb") if self.record_raw else None
+
+    def _close_segment(self):
+        paths = [self._path(self.segment, "ticks")]
+        self._ticks.close()
+        if self._raw is not None:
+            self._raw.close()
+            paths.append(self._path(self.segment, "raw"))
+        if self.compress:
+            for path in paths:
+                with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+
+    def _write_meta(self):
+        meta = {"version": VERSION, "dtype": TICK_DTYPE.descr, "instruments": self.instruments}
+        path = os.path.join(self.directory, f"{self.prefix}.meta.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _inst(self, inst_id):
+        index = self._inst_index.get(inst_id)
+        if index is None:
+            index = len(self.instruments)
+            self.instruments.append(inst_id)
+            self._inst_index[inst_id] = index
+            self._write_meta()
+        return index
+
+    def record(self, message, received_ns=None, data=None):
+        """
+        Capture one raw WebSocket message.
+
+        Parameters:
+        - message: The raw message text.
+        - received_ns: Local receive time in epoch ns (defaults to now).
+        - data: The already decoded message, to avoid decoding twice.
+        """
+        if received_ns is None:
+            received_ns = time.time_ns()
+        if data is None:
+            data = json.loads(message)
+        arg = data.get("arg") or {}
+        payload = data.get("data")
+        if "event" in data or not payload:
+            return
+
+        if self._raw is not None:
+            raw = message.encode() if isinstance(message, str) else message
+            self._raw.write(RAW_ENTRY.pack(received_ns, len(raw)))
+            self._raw.write(raw)
+
+        if arg.get("channel") in BOOK_CHANNELS:
+            action = UPDATE if data.get("action") == "update" else SNAPSHOT
+            inst = self._inst(arg.get("instId", ""))
+            for book_data in payload:
+                self._write_book(inst, action, book_data, received_ns)
+        self.msg_count += 1
+
+        if self._rows_in_segment >= self.segment_records:
+            self._close_segment()
+            self._open_segment()
+
+    def _write_book(self, inst, action, book_data, received_ns):
+        bids = book_data.get("bids", ())
+        asks = book_data.get("asks", ())
+        n = len(bids) + len(asks)
+        if n > len(self._buffer):
+            self._buffer = np.zeros(n, dtype=TICK_DTYPE)
+        rows = self._buffer[:n]
+        rows["recv_ns"] = received_ns
+        rows["ts"] = int(book_data.get("ts", 0))
+        rows["msg"] = self.msg_count
+        rows["inst"] = inst
+        rows["action"] = action
+        rows["side"][:len(bids)] = BID
+        rows["side"][len(bids):] = ASK
+        rows["level"][:len(bids)] = np.arange(len(bids))
+        rows["level"][len(bids):] = np.arange(len(asks))
+        levels = list(bids) + list(asks)
+        rows["price"] = [level[0] for level in levels]
+        rows["size"] = [level[1] for level in levels]
+        self._ticks.write(rows.tobytes())
+        self._rows_in_segment += n
+
+    def flush(self):
+        self._ticks.flush()
+        if self._raw is not None:
+            self._raw.flush()
+
+    def close(self):
+        self._close_segment()
+
+
+class TickReplayer:
+    """
+    Memory-maps captured segments and feeds them back through an
+    `on_message(ws, message)` callback at 1x, Nx or maximum speed.
+    """
+
+    def __init__(self, directory, prefix="okx"):
+        self.directory = directory
+        self.prefix = prefix
+        meta_path = os.path.join(directory, f"{prefix}.meta.json")
+        self.instruments = []
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.instruments = json.load(f)["instruments"]
+
+    def _segments(self, ext):
+        paths = glob.glob(os.path.join(self.directory, f"{self.prefix}-*.{ext}"))
+        paths += glob.glob(os.path.join(self.directory, f"{self.prefix}-*.{ext}.gz"))
+        return sorted(paths)
+
+    def tick_segments(self):
+        """Yield each segment's TICK_DTYPE rows (a zero-copy memmap unless compressed)."""
+        for path in self._segments("ticks"):
+            if path.endswith(".gz"):
+                with gzip.open(path, "rb") as f:
+                    buf = f.read()
+                magic, _, itemsize = HEADER.unpack_from(buf)
+                self._check(path, magic, itemsize)
+                yield np.frombuffer(buf, dtype=TICK_DTYPE, offset=HEADER.size)
+            else:
+                with open(path, "rb") as f:
+                    magic, _, itemsize = HEADER.unpack(f.read(HEADER.size))
+                self._check(path, magic, itemsize)
+                if os.path.getsize(path) == HEADER.size:
+                    continue
+                yield np.memmap(path, dtype=TICK_DTYPE, mode="r", offset=HEADER.size)
+
+    @staticmethod
+    def _check(path, magic, itemsize):
+        if magic != MAGIC or itemsize != TICK_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a compatible tick capture")
+
+    def ticks(self):
+        """All rows across segments as one array."""
+        segments = list(self.tick_segments())
+        if not segments:
+            return np.zeros(0, dtype=TICK_DTYPE)
+        return segments[0] if len(segments) == 1 else np.concatenate(segments)
+
+    def raw_messages(self):
+        """Yield (recv_ns, message) from the raw segments, in capture order."""
+        for path in self._segments("raw"):
+            if path.endswith(".gz"):
+                with gzip.open(path, "rb") as f:
+                    buf = f.read()
+            elif os.path.getsize(path) == 0:
+                continue
+            else:
+                with open(path, "rb") as f:
+                    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            offset = 0
+            while offset + RAW_ENTRY.size <= len(buf):
+                received_ns, length = RAW_ENTRY.unpack_from(buf, offset)
+                offset += RAW_ENTRY.size
+                yield received_ns, buf[offset:offset + length].decode()
+                offset += length
+
+    def normalized_messages(self):
+        """
+        Yield (recv_ns, message) rebuilt from the fixed-width rows in OKX
+        `books` format. The original strings (and therefore the checksum)
+        are not preserved, so no `checksum` field is emitted.
+        """
+        for rows in self.tick_segments():
+            if len(rows) == 0:
+                continue
+            bounds = np.flatnonzero(np.diff(rows["msg"])) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(rows)]))
+            for start, end in zip(starts, ends):
+                group = rows[start:end]
+                first = group[0]
+                is_bid = group["side"] == BID
+                levels = {
+                    "bids": [[repr(p), repr(s), "0", "0"] for p, s in
+                             zip(group["price"][is_bid].tolist(), group["size"][is_bid].tolist())],
+                    "asks": [[repr(p), repr(s), "0", "0"] for p, s in
+                             zip(group["price"][~is_bid].tolist(), group["size"][~is_bid].tolist())],
+                }
+                inst = self.instruments[first["inst"]] if first["inst"] < len(self.instruments) else ""
+                message = {
+                    "arg": {"channel": "books", "instId": inst},
+                    "action": "update" if first["action"] == UPDATE else "snapshot",
+                    "data": [dict(levels, ts=str(int(first["ts"])))],
+                }
+                yield int(first["recv_ns"]), json.dumps(message)
+
+    def replay(self, on_message, speed=1.0, source="raw"):
+        """
+        Feed captured messages into `on_message(None, message)`.
+
+        Parameters:
+        - on_message: Usually `FeedManager.on_message`.
+        - speed: 1.0 for real time, N for N times faster, None or 0 for max speed.
+        - source: "raw" to replay the exact messages, "normalized" to rebuild
+          them from the fixed-width rows.
+
+        Returns:
+        - The number of messages replayed.
+        """
+        messages = self.raw_messages() if source == "raw" else self.normalized_messages()
+        count = 0
+        first_recv = None
+        wall_start = time.perf_counter()
+        for received_ns, message in messages:
+            if speed:
+                if first_recv is None:
+                    first_recv = received_ns
+                due = (received_ns - first_recv) / 1e9 / speed
+                delay = due - (time.perf_counter() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+            on_message(None, message)
+            count += 1
+        return count
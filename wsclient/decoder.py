@@ -0,0 +1,137 @@
+# wsclient/decoder.py
+import json
+
+import numpy as np
+
+# Optional fast JSON backends; the stdlib is always available as a fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Below this many levels, parse_levels converts element by element
+SMALL_BATCH = 8
+
+
+def _stdlib_loads(message):
+    return json.loads(message)
+
+
+def _make_msgspec_loads():
+    decoder = msgspec.json.Decoder()
+
+    def loads(message):
+        if isinstance(message, str):
+            message = message.encode()
+        return decoder.decode(message)
+
+    return loads
+
+
+def available_backends():
+    """Names of the JSON backends importable in this environment, fastest first."""
+    names = []
+    if orjson is not None:
+        names.append("orjson")
+    if msgspec is not None:
+        names.append("msgspec")
+    names.append("json")
+    return names
+
+
+def get_decoder(backend=None):
+    """
+    Return a `loads(message) -> dict` callable.
+
+    Parameters:
+    - backend: "orjson", "msgspec" or "json". None picks the fastest installed one.
+    """
+    if backend is None:
+        backend = available_backends()[0]
+    if backend == "orjson":
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        return orjson.loads
+    if backend == "msgspec":
+        if msgspec is None:
+            raise ImportError("msgspec is not installed")
+        return _make_msgspec_loads()
+    if backend == "json":
+        return _stdlib_loads
+    raise ValueError(f"Unknown decoder backend: {backend}")
+
+
+def parse_levels(levels, prices, sizes, depth=None):
+    """
+    Parse OKX [price, size, ...] string levels straight into float64 arrays.
+
+    Only the first `depth` levels (bounded by the arrays' length) are
+    converted; the rest of the message is never touched.
+
+    Parameters:
+    - levels: The `asks` or `bids` list of a book push.
+    - prices, sizes: Preallocated float64 arrays to write into.
+    - depth: Maximum number of levels to parse (None for all that fit).
+
+    Returns:
+    - The number of levels written.
+    """
+    n = min(len(levels), len(prices))
+    if depth is not None:
+        n = min(n, depth)
+    if n == 0:
+        return 0
+    if n <= SMALL_BATCH:
+        # Element-wise stores beat building temporary lists for a handful of levels
+        for i in range(n):
+            level = levels[i]
+            prices[i] = float(level[0])
+            sizes[i] = float(level[1])
+        return n
+    top = levels[:n]
+    # NumPy parses the decimal strings itself, without a Python float() per value
+    prices[:n] = [level[0] for level in top]
+    sizes[:n] = [level[1] for level in top]
+    return n
+
+
+class BookDecoder:
+    """
+    Decodes `books`-style pushes into reusable float64 arrays.
+
+    Meant for consumers that only need the top of book (e.g. top 5 levels)
+    from a full-depth snapshot channel: nothing past `depth` is converted
+    and no per-message arrays are allocated.
+    """
+
+    def __init__(self, depth=5, backend=None):
+        self.depth = depth
+        self.loads = get_decoder(backend)
+        self.bid_prices = np.zeros(depth, dtype=np.float64)
+        self.bid_sizes = np.zeros(depth, dtype=np.float64)
+        self.ask_prices = np.zeros(depth, dtype=np.float64)
+        self.ask_sizes = np.zeros(depth, dtype=np.float64)
+        self.n_bids = 0
+        self.n_asks = 0
+
+    def decode(self, message):
+        """
+        Decode one raw message.
+
+        Returns:
+        - The parsed dict (with its book levels still as strings). When it is a
+          book push, the top `depth` levels of `data[0]` are also written to the
+          decoder's arrays.
+        """
+        data = self.loads(message)
+        payload = data.get("data")
+        if payload:
+            book_data = payload[0]
+            self.n_bids = parse_levels(book_data.get("bids", ()), self.bid_prices, self.bid_sizes, self.depth)
+            self.n_asks = parse_levels(book_data.get("asks", ()), self.ask_prices, self.ask_sizes, self.depth)
+        return data
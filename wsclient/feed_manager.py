@@ -0,0 +1,345 @@
+# wsclient/feed_manager.py
+import json
+import threading
+import time
+import traceback
+from collections import deque
+
+from utils.latency import now_ns, record_exchange_lag, record_span
+from wsclient.decoder import get_decoder
+from wsclient.integrity import CHECKSUM, MALFORMED, RESYNCING, STALE, IntegrityMonitor
+from wsclient.orderbook import OrderBook
+
+# OKX WebSocket public endpoint
+OKX_SPOT_WS_URL = "wss://ws.okx.com:8443/ws/v5/public"
+
+# Depth kept for each order book channel
+BOOK_CHANNELS = {
+    "books": 400,
+    "books5": 5,
+    "bbo-tbt": 1,
+}
+TRADE_CHANNELS = ("trades",)
+
+# Keep subscribe/unsubscribe requests well under the OKX per-message size limit
+MAX_ARGS_PER_REQUEST = 100
+
+# Seconds between integrity watchdog passes
+WATCHDOG_INTERVAL_S = 1.0
+
+
+def backoff_delays(initial=1, maximum=60):
+    """Exponential reconnect delays: 1, 2, 4, ... capped at `maximum` seconds."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * 2, maximum)
+
+
+class FeedManager:
+    """
+    One OKX WebSocket connection carrying many instruments and channels.
+
+    Subscriptions are batched into as few requests as possible, and every
+    push is routed by `arg.channel`/`arg.instId` into a per-symbol OrderBook
+    (or trade deque). Instruments can be added and removed while connected.
+
+    Every book push goes through an IntegrityMonitor: a sequence gap,
+    checksum failure or book that stops updating resubscribes only that
+    instrument, leaving the connection and the other symbols alone.
+    """
+
+    def __init__(self, inst_ids=("BTC-USDT",), channels=("books",), url=OKX_SPOT_WS_URL,
+                 trade_history=1000, verbose=False, decoder=None, recorder=None, integrity=None):
+        self.url = url
+        self.recorder = recorder
+        self.integrity = integrity or IntegrityMonitor()
+        self.loads = get_decoder(decoder)
+        self.verbose = verbose
+        self.trade_history = trade_history
+        self.subscriptions = set()
+        self.books = {channel: {} for channel in BOOK_CHANNELS}
+        self.trades = {}
+        self.received = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+        self._ws = None
+        self._thread = None
+        self._watchdog = None
+        self._opened = False
+        self._listeners = []
+        self.subscribe(inst_ids, channels)
+
+    # ------------------------------------------------------------------
+    # Subscription management
+    # ------------------------------------------------------------------
+    def _args(self, inst_ids, channels):
+        if isinstance(inst_ids, str):
+            inst_ids = [inst_ids]
+        if isinstance(channels, str):
+            channels = [channels]
+        return [(channel, inst_id) for inst_id in inst_ids for channel in channels]
+
+    def _send(self, op, pairs):
+        ws = self._ws
+        if ws is None or not pairs:
+            return
+        for i in range(0, len(pairs), MAX_ARGS_PER_REQUEST):
+            chunk = pairs[i:i + MAX_ARGS_PER_REQUEST]
+            args = [{"channel": channel, "instId": inst_id} for channel, inst_id in chunk]
+            try:
+                ws.send(json.dumps({"op": op, "args": args}))
+            except Exception:
+                print(f"❌ Failed to send {op}:\n", traceback.format_exc())
+                return
+
+    def subscribe(self, inst_ids, channels=("books",)):
+        """Add instruments/channels; sent immediately if the socket is open."""
+        pairs = []
+        with self._registry_lock:
+            for channel, inst_id in self._args(inst_ids, channels):
+                if channel not in BOOK_CHANNELS and channel not in TRADE_CHANNELS:
+                    raise ValueError(f"Unsupported channel: {channel}")
+                if (channel, inst_id) in self.subscriptions:
+                    continue
+                self.subscriptions.add((channel, inst_id))
+                self._locks.setdefault(inst_id, threading.Lock())
+                if channel in BOOK_CHANNELS:
+                    self.books[channel][inst_id] = OrderBook(inst_id, depth=BOOK_CHANNELS[channel])
+                else:
+                    self.trades[inst_id] = deque(maxlen=self.trade_history)
+                pairs.append((channel, inst_id))
+        self._send("subscribe", pairs)
+
+    def unsubscribe(self, inst_ids, channels=("books",)):
+        """Drop instruments/channels and their local state."""
+        pairs = []
+        with self._registry_lock:
+            for channel, inst_id in self._args(inst_ids, channels):
+                if (channel, inst_id) not in self.subscriptions:
+                    continue
+                self.subscriptions.discard((channel, inst_id))
+                if channel in BOOK_CHANNELS:
+                    self.books[channel].pop(inst_id, None)
+                    self.integrity.forget(channel, inst_id)
+                else:
+                    self.trades.pop(inst_id, None)
+                pairs.append((channel, inst_id))
+        self._send("unsubscribe", pairs)
+
+    def resubscribe(self, inst_id, channel="books", reason="manual"):
+        """
+        Re-request a fresh snapshot for a single instrument without touching the others.
+
+        Returns:
+        - True if the request was sent, False if a resync of this book is
+          already in flight (within the monitor's cooldown).
+        """
+        book = self.books.get(channel, {}).get(inst_id)
+        if book is not None:
+            with self._locks[inst_id]:
+                book.reset()
+        if not self.integrity.begin_resync(channel, inst_id, reason):
+            return False
+        print(f"🔁 Resubscribing to {channel}:{inst_id} for a fresh snapshot ({reason})")
+        self._send("unsubscribe", [(channel, inst_id)])
+        self._send("subscribe", [(channel, inst_id)])
+        return True
+
+    def check_integrity(self, now=None):
+        """Resubscribe books that stopped updating or never got their snapshot. Returns them."""
+        if self._ws is None:
+            return []  # Nothing to resubscribe on; the reconnect loop handles this
+        due = [(channel, inst_id) for channel, inst_id in self.integrity.due_for_resync(now)
+               if inst_id in self.books.get(channel, {})]
+        for channel, inst_id in due:
+            pending = self.integrity.state(channel, inst_id).resync_pending
+            self.resubscribe(inst_id, channel, "retry" if pending else STALE)
+        return due
+
+    def integrity_status(self, inst_id, channel="books"):
+        """State ("ok", "waiting", "resyncing", "stale"), age, lag and counters of one book."""
+        return self.integrity.status(inst_id, channel)
+
+    # ------------------------------------------------------------------
+    # WebSocket callbacks
+    # ------------------------------------------------------------------
+    def on_open(self, ws):
+        print("🔗 WebSocket connection opened")
+        self._ws = ws
+        self._opened = True
+        with self._registry_lock:
+            pairs = sorted(self.subscriptions)
+            # A new connection always starts from fresh snapshots
+            for books in self.books.values():
+                for book in books.values():
+                    book.reset()
+            self.integrity.reset()
+        self._send("subscribe", pairs)
+
+    def on_message(self, ws, message):
+        received_ns = now_ns()
+        received_wall_ns = time.time_ns()
+        try:
+            data = self.loads(message)
+            decoded_ns = record_span("receive_to_decode", received_ns)
+            if "event" in data:
+                if data["event"] == "error":
+                    print(f"❌ OKX error: {data.get('msg')}")
+                elif self.verbose:
+                    print(f"✅ {data['event']} {data.get('arg', {})}")
+                return
+            arg = data.get("arg")
+            if not arg or "data" not in data:
+                return
+            if self.recorder is not None:
+                self.recorder.record(message, received_wall_ns, data)
+            self.route(arg.get("channel"), arg.get("instId"), data, received_wall_ns)
+            applied_ns = record_span("decode_to_book", decoded_ns)
+            if data["data"] and "ts" in data["data"][0]:
+                record_exchange_lag(data["data"][0]["ts"], received_wall_ns)
+        except Exception:
+            print("❌ Error in on_message:\n", traceback.format_exc())
+            return
+        if self.verbose:
+            print(f"✅ Processing latency: {(applied_ns - received_ns) / 1e6:.3f} ms")
+
+    def route(self, channel, inst_id, data, received_ns=None):
+        """Apply one parsed push to the state of (channel, instId); `received_ns` is epoch ns."""
+        lock = self._locks.get(inst_id)
+        if lock is None:
+            return
+
+        if channel in BOOK_CHANNELS:
+            book = self.books[channel].get(inst_id)
+            if book is None:
+                return
+            # books5 and bbo-tbt pushes are always full snapshots
+            action = data.get("action", "snapshot") if channel == "books" else "snapshot"
+            integrity = self.integrity
+            problem = None
+            with lock:
+                for book_data in data["data"]:
+                    try:
+                        problem = integrity.check(channel, inst_id, action, book_data)
+                        if problem is None and not book.apply(book_data, action):
+                            integrity.checksum_failed(channel, inst_id)
+                            problem = CHECKSUM
+                    except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+                        # The book may be half-updated, so only a fresh snapshot can be trusted
+                        integrity.malformed_payload(channel, inst_id, e)
+                        problem = MALFORMED
+                    if problem is not None:
+                        break
+                    integrity.record(channel, inst_id, action, book_data, received_ns)
+                self.received[inst_id] = time.time()
+            if problem == RESYNCING:
+                return  # Deltas still in flight from before the resubscribe
+            if problem is not None:
+                print(f"⚠️ {channel}:{inst_id} {integrity.state(channel, inst_id).last_problem}")
+                self.resubscribe(inst_id, channel, problem)
+                return
+            for listener in self._listeners:
+                listener(channel, inst_id)
+
+        elif channel in TRADE_CHANNELS:
+            trades = self.trades.get(inst_id)
+            if trades is None:
+                return
+            with lock:
+                for trade in data["data"]:
+                    trades.append((int(trade["ts"]), float(trade["px"]), float(trade["sz"]), trade["side"]))
+
+    def on_error(self, ws, error):
+        print("❌ WebSocket error:", error)
+
+    def on_close(self, ws, close_status_code, close_msg):
+        self._ws = None
+        print(f"🔌 WebSocket closed: {close_status_code} - {close_msg}")
+
+    # ------------------------------------------------------------------
+    # Connection lifecycle
+    # ------------------------------------------------------------------
+    def run(self):
+        import websocket  # Only the live connection needs it, not replays or FakeFeed
+
+        delays = backoff_delays()
+        while True:
+            try:
+                ws = websocket.WebSocketApp(
+                    self.url,
+                    on_open=self.on_open,
+                    on_message=self.on_message,
+                    on_error=self.on_error,
+                    on_close=self.on_close
+                )
+                ws.run_forever(ping_interval=20, ping_timeout=10)
+            except Exception:
+                print("❌ Exception in WebSocket thread:\n", traceback.format_exc())
+            if self._opened:
+                # The last connection came up, so start the backoff over
+                delays = backoff_delays()
+                self._opened = False
+            delay = next(delays)
+            print(f"🔁 Reconnecting in {delay} seconds...")
+            time.sleep(delay)
+
+    def watch(self, interval=WATCHDOG_INTERVAL_S):
+        """Integrity watchdog loop: resubscribes stale books on a timer, since they send nothing."""
+        while True:
+            time.sleep(interval)
+            try:
+                self.check_integrity()
+            except Exception:
+                print("❌ Exception in integrity watchdog:\n", traceback.format_exc())
+
+    def start(self):
+        """Run the connection and its integrity watchdog in daemon threads (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.run, daemon=True)
+            self._thread.start()
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._watchdog = threading.Thread(target=self.watch, daemon=True)
+            self._watchdog.start()
+        return self._thread
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+    def add_listener(self, callback):
+        """
+        Call `callback(channel, inst_id)` from the feed thread after every
+        successfully applied book update. Callbacks must be cheap (e.g. set
+        an Event) since they run on the ingestion path.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def get_book(self, inst_id, channel="books"):
+        """The live OrderBook; hold `lock_for(inst_id)` while reading its arrays."""
+        return self.books.get(channel, {}).get(inst_id)
+
+    def lock_for(self, inst_id):
+        return self._locks.get(inst_id)
+
+    def get_latest_data(self, inst_id, channel="books"):
+        """Copy of one instrument's book in the legacy {timestamp, asks, bids, timestamp_unix} shape."""
+        book = self.get_book(inst_id, channel)
+        if book is None:
+            return {}
+        with self._locks[inst_id]:
+            if not book.ready:
+                return {}
+            data = book.to_dict()
+            data["timestamp_unix"] = self.received.get(inst_id, 0.0)
+        return data
+
+    def get_trades(self, inst_id):
+        lock = self._locks.get(inst_id)
+        if lock is None:
+            return []
+        with lock:
+            return list(self.trades.get(inst_id, ()))
@@ -0,0 +1,92 @@
+# wsclient/fixtures.py
+import json
+import random
+import zlib
+from decimal import Decimal
+
+
+def _checksum(bids, asks):
+    parts = []
+    for i in range(25):
+        if i < len(bids):
+            parts.extend(bids[i])
+        if i < len(asks):
+            parts.extend(asks[i])
+    crc = zlib.crc32(":".join(parts).encode())
+    return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+
+def synthetic_book_messages(count=1000, depth=400, inst_id="BTC-USDT", mid=60000.0,
+                            tick=0.1, changes=5, seed=42):
+    """
+    Generate a snapshot followed by `count - 1` incremental updates in the exact
+    OKX `books` wire format, with valid checksums.
+
+    Parameters:
+    - count: Total number of messages.
+    - depth: Levels per side in the snapshot.
+    - tick: Price increment; prices are printed with as many decimals as it has.
+    - changes: Levels touched per side in every update.
+    - seed: Seed for reproducible fixtures.
+
+    Returns:
+    - A list of raw JSON strings.
+    """
+    rng = random.Random(seed)
+    base = int(round(mid / tick))
+    # Enough decimals that neighbouring ticks never print as the same price
+    decimals = max(0, -Decimal(str(tick)).normalize().as_tuple().exponent)
+
+    def fmt_px(ticks):
+        return f"{ticks * tick:.{decimals}f}"
+
+    def fmt_sz():
+        return f"{rng.uniform(0.001, 5):.8f}".rstrip("0").rstrip(".")
+
+    bids = {base - 1 - i: fmt_sz() for i in range(depth)}
+    asks = {base + i: fmt_sz() for i in range(depth)}
+
+    def levels(side, descending):
+        keys = sorted(side, reverse=descending)[:depth]
+        return [[fmt_px(k), side[k], "0", str(rng.randint(1, 20))] for k in keys]
+
+    def top(side, descending):
+        keys = sorted(side, reverse=descending)[:25]
+        return [[fmt_px(k), side[k]] for k in keys]
+
+    messages = []
+    ts = 1700000000000
+    snap_bids, snap_asks = levels(bids, True), levels(asks, False)
+    messages.append(json.dumps({
+        "arg": {"channel": "books", "instId": inst_id},
+        "action": "snapshot",
+        "data": [{"asks": snap_asks, "bids": snap_bids, "ts": str(ts),
+                  "checksum": _checksum(top(bids, True), top(asks, False)),
+                  "prevSeqId": -1, "seqId": 1}],
+    }))
+
+    for i in range(1, count):
+        ts += rng.randint(5, 50)
+        upd_bids, upd_asks = [], []
+        for side, out, lo, hi in ((bids, upd_bids, base - depth, base - 1),
+                                  (asks, upd_asks, base, base + depth)):
+            for _ in range(changes):
+                key = rng.randint(lo, hi)
+                if key in side and rng.random() < 0.3:
+                    del side[key]
+                    out.append([fmt_px(key), "0", "0", "0"])
+                else:
+                    side[key] = fmt_sz()
+                    out.append([fmt_px(key), side[key], "0", str(rng.randint(1, 20))])
+        # The exchange only tracks `depth` levels per side
+        for side, descending in ((bids, True), (asks, False)):
+            for key in sorted(side, reverse=descending)[depth:]:
+                del side[key]
+        messages.append(json.dumps({
+            "arg": {"channel": "books", "instId": inst_id},
+            "action": "update",
+            "data": [{"asks": upd_asks, "bids": upd_bids, "ts": str(ts),
+                      "checksum": _checksum(top(bids, True), top(asks, False)),
+                      "prevSeqId": i, "seqId": i + 1}],
+        }))
+    return messages
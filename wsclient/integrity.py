@@ -0,0 +1,234 @@
+# wsclient/integrity.py
+import threading
+import time
+
+from utils.latency import LatencyHistogram
+
+# Seconds without an update before an instrument is reported stale
+STALE_AFTER_S = 5.0
+# Seconds without an update (or without the snapshot a resync asked for) before resubscribing
+RESYNC_AFTER_S = 30.0
+# Minimum seconds between two resubscribes of the same instrument
+RESYNC_COOLDOWN_S = 2.0
+
+# Instrument states reported by `status`
+HEALTHY = "ok"
+WAITING = "waiting"
+RESYNCING = "resyncing"
+STALE = "stale"
+
+# Reasons a book is resynced
+GAP = "gap"
+CHECKSUM = "checksum"
+MALFORMED = "malformed"
+
+
+class InstrumentIntegrity:
+    """Sequence state, counters and exchange-to-local lag of one (channel, instId)."""
+
+    def __init__(self, channel, inst_id):
+        self.channel = channel
+        self.inst_id = inst_id
+        self.seq_id = None
+        self.resyncing = False
+        self.last_received = None   # local wall clock, seconds
+        self.last_lag_ms = None
+        self.last_resync = None
+        self.resync_pending = False  # a resync was asked for inside the cooldown
+        self.last_problem = None
+        self.messages = 0
+        self.snapshots = 0
+        self.gaps = 0
+        self.checksum_failures = 0
+        self.malformed = 0          # payloads that could not be parsed or applied
+        self.stale_resyncs = 0
+        self.resyncs = 0
+        self.dropped = 0            # deltas discarded while waiting for a snapshot
+        self.lag = LatencyHistogram()
+
+
+class IntegrityMonitor:
+    """
+    Per-instrument book integrity: sequence gaps, checksum failures and staleness.
+
+    OKX chains every `books` push with `prevSeqId` -> `seqId`; a delta whose
+    `prevSeqId` is not the last applied `seqId` means updates were missed and
+    the book can no longer be trusted. The feed calls `check` before applying
+    a push and `record` after, and resubscribes just the affected instrument
+    when `begin_resync` says so, so one bad book never forces a reconnect of
+    every symbol. Deltas that arrive while the fresh snapshot is on its way
+    are dropped and counted.
+
+    Parameters:
+    - stale_after_s: Local age of the last update above which `status` reports "stale".
+    - max_lag_s: Exchange-to-local lag above which `status` reports "stale"
+      (None to ignore lag, e.g. for replayed or synthetic messages).
+    - resync_after_s: Age after which `due_for_resync` asks for a resubscribe.
+    - resync_cooldown_s: Minimum time between resubscribes of one instrument.
+    """
+
+    def __init__(self, stale_after_s=STALE_AFTER_S, resync_after_s=RESYNC_AFTER_S,
+                 resync_cooldown_s=RESYNC_COOLDOWN_S, max_lag_s=STALE_AFTER_S):
+        self.stale_after_s = stale_after_s
+        self.max_lag_s = max_lag_s
+        self.resync_after_s = resync_after_s
+        self.resync_cooldown_s = resync_cooldown_s
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def state(self, channel, inst_id):
+        key = (channel, inst_id)
+        state = self._states.get(key)
+        if state is None:
+            with self._lock:
+                state = self._states.setdefault(key, InstrumentIntegrity(channel, inst_id))
+        return state
+
+    def check(self, channel, inst_id, action, book_data):
+        """
+        Validate one payload before it is applied.
+
+        Returns:
+        - None if it can be applied, RESYNCING if it should be dropped while a
+          snapshot is pending, or GAP if updates were missed.
+        """
+        state = self.state(channel, inst_id)
+        if action == "snapshot":
+            state.resyncing = False
+            state.seq_id = None
+            return None
+        if state.resyncing:
+            state.dropped += 1
+            return RESYNCING
+        prev_seq_id = book_data.get("prevSeqId")
+        if prev_seq_id is None:
+            return None  # Channel without sequence numbers
+        if state.seq_id is None or int(prev_seq_id) != state.seq_id:
+            state.gaps += 1
+            state.last_problem = f"{GAP}: expected prevSeqId {state.seq_id}, got {prev_seq_id}"
+            return GAP
+        return None
+
+    def record(self, channel, inst_id, action, book_data, received_ns=None):
+        """Account for a payload that was applied cleanly (`received_ns` is epoch ns, wall clock)."""
+        if received_ns is None:
+            received_ns = time.time_ns()
+        state = self.state(channel, inst_id)
+        state.messages += 1
+        if action == "snapshot":
+            state.snapshots += 1
+        seq_id = book_data.get("seqId")
+        if seq_id is not None:
+            state.seq_id = int(seq_id)
+        state.last_received = received_ns / 1e9
+        ts = book_data.get("ts")
+        if ts is not None:
+            lag_ns = received_ns - int(ts) * 1_000_000
+            state.lag.record(lag_ns)
+            state.last_lag_ms = lag_ns / 1e6
+
+    def checksum_failed(self, channel, inst_id):
+        state = self.state(channel, inst_id)
+        state.checksum_failures += 1
+        state.last_problem = f"{CHECKSUM} mismatch after seqId {state.seq_id}"
+
+    def malformed_payload(self, channel, inst_id, error):
+        state = self.state(channel, inst_id)
+        state.malformed += 1
+        state.last_problem = f"{MALFORMED} payload: {error!r}"
+
+    def begin_resync(self, channel, inst_id, reason, now=None):
+        """
+        Mark the book as waiting for a snapshot.
+
+        Returns:
+        - True if a resubscribe should be sent now, False while the previous
+          one is within the cooldown.
+        """
+        now = time.time() if now is None else now
+        state = self.state(channel, inst_id)
+        state.resyncing = True
+        state.seq_id = None
+        if state.last_resync is not None and now - state.last_resync < self.resync_cooldown_s:
+            state.resync_pending = True
+            return False
+        state.last_resync = now
+        state.resync_pending = False
+        state.resyncs += 1
+        if reason == STALE:
+            state.stale_resyncs += 1
+        return True
+
+    def due_for_resync(self, now=None):
+        """
+        (channel, instId) pairs to resubscribe: books that went quiet, whose
+        requested snapshot never came, or whose resync was held back by the cooldown.
+        """
+        now = time.time() if now is None else now
+        due = []
+        for key, state in list(self._states.items()):
+            if state.resync_pending:
+                if now - state.last_resync >= self.resync_cooldown_s:
+                    due.append(key)
+                continue
+            since = state.last_resync if state.resyncing else state.last_received
+            if since is not None and now - since > self.resync_after_s:
+                due.append(key)
+        return due
+
+    def reset(self, now=None):
+        """A new connection starts every book from a fresh snapshot; counters are kept."""
+        now = time.time() if now is None else now
+        for state in list(self._states.values()):
+            state.seq_id = None
+            state.resyncing = True
+            state.resync_pending = False
+            state.last_resync = now
+
+    def forget(self, channel, inst_id):
+        with self._lock:
+            self._states.pop((channel, inst_id), None)
+
+    def status(self, inst_id, channel="books", now=None):
+        """
+        Health of one instrument.
+
+        Returns:
+        - Dict with state ("ok", "waiting", "resyncing" or "stale"), age_s,
+          lag_ms, seq_id, the counters and the last problem seen.
+        """
+        now = time.time() if now is None else now
+        state = self._states.get((channel, inst_id))
+        if state is None or state.last_received is None:
+            return {"state": WAITING, "age_s": None, "lag_ms": None}
+        age_s = now - state.last_received
+        if state.resyncing:
+            health = RESYNCING
+        elif age_s > self.stale_after_s or (
+                self.max_lag_s is not None and (state.last_lag_ms or 0.0) > self.max_lag_s * 1e3):
+            health = STALE
+        else:
+            health = HEALTHY
+        return {
+            "state": health,
+            "age_s": age_s,
+            "lag_ms": state.last_lag_ms,
+            "seq_id": state.seq_id,
+            "messages": state.messages,
+            "snapshots": state.snapshots,
+            "gaps": state.gaps,
+            "checksum_failures": state.checksum_failures,
+            "malformed": state.malformed,
+            "resyncs": state.resyncs,
+            "stale_resyncs": state.stale_resyncs,
+            "dropped": state.dropped,
+            "last_problem": state.last_problem,
+        }
+
+    def snapshot(self, now=None):
+        """`status` plus the exchange-to-local lag summary (ms) of every tracked book, keyed "channel:instId"."""
+        now = time.time() if now is None else now
+        report = {}
+        for (channel, inst_id), state in sorted(self._states.items()):
+            report[f"{channel}:{inst_id}"] = dict(self.status(inst_id, channel, now), lag=state.lag.summary())
+        return report
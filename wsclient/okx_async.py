@@ -0,0 +1,286 @@
+# wsclient/okx_async.py
+import asyncio
+import json
+import random
+import time
+import traceback
+from collections import OrderedDict, deque, namedtuple
+
+import websockets
+
+from utils.latency import now_ns, record_exchange_lag, record_span
+from wsclient.decoder import get_decoder
+from wsclient.feed_manager import BOOK_CHANNELS, MAX_ARGS_PER_REQUEST, OKX_SPOT_WS_URL, WATCHDOG_INTERVAL_S, backoff_delays
+from wsclient.integrity import CHECKSUM, MALFORMED, RESYNCING, STALE, IntegrityMonitor
+from wsclient.orderbook import OrderBook
+
+# One parsed push, after it has been applied to the instrument's book.
+# `book` is the live OrderBook, so it only matches this update's ts/action
+# under the coalesce policy; `levels` is a read-only copy of the top
+# `snapshot_depth` levels (bid_px, bid_sz, ask_px, ask_sz) as of this update.
+BookUpdate = namedtuple("BookUpdate", ["inst_id", "channel", "action", "ts", "book", "received", "levels"])
+
+# Levels per side copied into every BookUpdate
+SNAPSHOT_DEPTH = 25
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+
+
+def frozen_levels(book, depth=SNAPSHOT_DEPTH):
+    """Read-only copies of the top `depth` levels: (bid_px, bid_sz, ask_px, ask_sz)."""
+    levels = tuple(side.copy() for side in book.depth_levels(depth))
+    for side in levels:
+        side.flags.writeable = False
+    return levels
+
+
+class UpdateQueue:
+    """
+    Bounded asyncio queue with an explicit overflow policy.
+
+    - drop_oldest: keep the newest `maxsize` updates, discarding the oldest.
+    - coalesce: keep only the latest update per (channel, instId); a slow
+      consumer always sees the freshest book for every symbol.
+
+    `put_nowait` never blocks the socket reader, so a slow consumer cannot
+    stall ingestion.
+    """
+
+    def __init__(self, maxsize=1000, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, COALESCE):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = OrderedDict() if policy == COALESCE else deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put_nowait(self, update):
+        if self.policy == COALESCE:
+            key = (update.channel, update.inst_id)
+            if key in self._items:
+                self.dropped += 1
+                del self._items[key]
+            elif len(self._items) >= self.maxsize:
+                self.dropped += 1
+                self._items.popitem(last=False)
+            self._items[key] = update
+        else:
+            if len(self._items) >= self.maxsize:
+                self.dropped += 1
+                self._items.popleft()
+            self._items.append(update)
+        self._ready.set()
+
+    def close(self):
+        """Wake waiting consumers; `get` returns None once the queue is closed and drained."""
+        self.closed = True
+        self._ready.set()
+
+    async def get(self):
+        while not self._items:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        if self.policy == COALESCE:
+            return self._items.popitem(last=False)[1]
+        return self._items.popleft()
+
+
+class AsyncOKXClient:
+    """
+    asyncio OKX public feed client.
+
+    Many clients can share one event loop (see `run_clients`). Each keeps
+    its own books, answers the OKX text heartbeat, reconnects with jittered
+    exponential backoff and exposes parsed book updates as an async iterator:
+
+        client = AsyncOKXClient(["BTC-USDT", "ETH-USDT"], policy=COALESCE)
+        asyncio.create_task(client.run())
+        async for update in client:
+            print(update.inst_id, update.book.mid())
+
+    With drop_oldest, `update.book` may already hold newer deltas than the
+    update being read; use `update.levels`, the top levels frozen when the
+    update was queued.
+    """
+
+    def __init__(self, inst_ids=("BTC-USDT",), channels=("books",), url=OKX_SPOT_WS_URL,
+                 queue_size=1000, policy=DROP_OLDEST, ping_interval=20, ping_timeout=10,
+                 name="okx", decoder=None, integrity=None, snapshot_depth=SNAPSHOT_DEPTH):
+        self.url = url
+        self.snapshot_depth = snapshot_depth
+        self.loads = get_decoder(decoder)
+        self.name = name
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.subscriptions = [(channel, inst_id) for inst_id in inst_ids for channel in channels]
+        for channel, _ in self.subscriptions:
+            if channel not in BOOK_CHANNELS:
+                raise ValueError(f"Unsupported channel: {channel}")
+        self.books = {channel: {} for channel in BOOK_CHANNELS}
+        for channel, inst_id in self.subscriptions:
+            self.books[channel][inst_id] = OrderBook(inst_id, depth=BOOK_CHANNELS[channel])
+        self.queue = UpdateQueue(queue_size, policy)
+        self._ws = None
+        self._stopped = False
+        self.integrity = integrity or IntegrityMonitor()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        update = await self.queue.get()
+        if update is None:
+            raise StopAsyncIteration  # Stopped and every queued update consumed
+        return update
+
+    async def _send(self, op, pairs):
+        for i in range(0, len(pairs), MAX_ARGS_PER_REQUEST):
+            args = [{"channel": channel, "instId": inst_id}
+                    for channel, inst_id in pairs[i:i + MAX_ARGS_PER_REQUEST]]
+            await self._ws.send(json.dumps({"op": op, "args": args}))
+
+    async def resubscribe(self, inst_id, channel="books", reason="manual"):
+        """Re-request a fresh snapshot for one instrument on the live connection."""
+        self.books[channel][inst_id].reset()
+        if not self.integrity.begin_resync(channel, inst_id, reason):
+            return False
+        print(f"🔁 [{self.name}] Resubscribing to {channel}:{inst_id} for a fresh snapshot ({reason})")
+        await self._send("unsubscribe", [(channel, inst_id)])
+        await self._send("subscribe", [(channel, inst_id)])
+        return True
+
+    async def _watch(self):
+        """Resubscribe books that stopped updating; runs alongside each connection."""
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL_S)
+            for channel, inst_id in self.integrity.due_for_resync():
+                if inst_id in self.books.get(channel, {}):
+                    pending = self.integrity.state(channel, inst_id).resync_pending
+                    try:
+                        await self.resubscribe(inst_id, channel, "retry" if pending else STALE)
+                    except websockets.ConnectionClosed:
+                        return  # The reader sees the close too; the next connection starts a new watchdog
+                    except Exception:
+                        print(f"❌ [{self.name}] Watchdog error:\n", traceback.format_exc())
+
+    async def _handle(self, message):
+        if message == "pong":
+            return
+        received_ns = now_ns()
+        received_wall_ns = time.time_ns()
+        data = self.loads(message)
+        decoded_ns = record_span("receive_to_decode", received_ns)
+        if "event" in data:
+            if data["event"] == "error":
+                print(f"❌ [{self.name}] OKX error: {data.get('msg')}")
+            return
+        arg = data.get("arg")
+        if not arg or "data" not in data:
+            return
+        channel, inst_id = arg.get("channel"), arg.get("instId")
+        book = self.books.get(channel, {}).get(inst_id)
+        if book is None:
+            return
+
+        action = data.get("action", "snapshot") if channel == "books" else "snapshot"
+        integrity = self.integrity
+        problem = None
+        for book_data in data["data"]:
+            try:
+                problem = integrity.check(channel, inst_id, action, book_data)
+                if problem is None and not book.apply(book_data, action):
+                    integrity.checksum_failed(channel, inst_id)
+                    problem = CHECKSUM
+            except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+                # The book may be half-updated, so only a fresh snapshot can be trusted
+                integrity.malformed_payload(channel, inst_id, e)
+                problem = MALFORMED
+            if problem is not None:
+                break
+            integrity.record(channel, inst_id, action, book_data, received_wall_ns)
+        if problem == RESYNCING:
+            return  # Deltas still in flight from before the resubscribe
+        if problem is not None:
+            print(f"⚠️ [{self.name}] {channel}:{inst_id} {integrity.state(channel, inst_id).last_problem}")
+            await self.resubscribe(inst_id, channel, problem)
+            return
+        record_span("decode_to_book", decoded_ns)
+        if book.ts is not None:
+            record_exchange_lag(book.ts, received_wall_ns)
+        self.queue.put_nowait(BookUpdate(inst_id, channel, action, book.ts, book, time.time(),
+                                         frozen_levels(book, self.snapshot_depth)))
+
+    async def _read(self, ws):
+        """Receive until the connection drops, sending the OKX text ping when idle."""
+        awaiting_pong = False
+        while True:
+            timeout = self.ping_timeout if awaiting_pong else self.ping_interval
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout)
+            except asyncio.TimeoutError:
+                if awaiting_pong:
+                    print(f"❌ [{self.name}] Heartbeat timed out")
+                    return
+                await ws.send("ping")
+                awaiting_pong = True
+                continue
+            awaiting_pong = False
+            try:
+                await self._handle(message)
+            except websockets.ConnectionClosed:
+                raise
+            except Exception:
+                # One bad message must not tear down every instrument on the connection
+                print(f"❌ [{self.name}] Error handling message:\n", traceback.format_exc())
+
+    async def run(self):
+        """Connect, subscribe and ingest forever, reconnecting with jittered backoff."""
+        delays = backoff_delays()
+        while not self._stopped:
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_size=None) as ws:
+                    print(f"🔗 [{self.name}] WebSocket connection opened")
+                    self._ws = ws
+                    delays = backoff_delays()
+                    for books in self.books.values():
+                        for book in books.values():
+                            book.reset()
+                    self.integrity.reset()
+                    await self._send("subscribe", self.subscriptions)
+                    watchdog = asyncio.create_task(self._watch())
+                    try:
+                        await self._read(ws)
+                    finally:
+                        watchdog.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"❌ [{self.name}] Exception in WebSocket task:\n", traceback.format_exc())
+            finally:
+                self._ws = None
+            if self._stopped:
+                break
+            # Full jitter keeps many clients from reconnecting in lockstep
+            delay = random.uniform(0, next(delays))
+            print(f"🔁 [{self.name}] Reconnecting in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+
+    async def stop(self):
+        """Stop reconnecting; iteration ends once the queued updates are consumed."""
+        self._stopped = True
+        self.queue.close()
+        if self._ws is not None:
+            await self._ws.close()
+
+
+async def run_clients(clients):
+    """Run several clients (e.g. one per exchange or endpoint) on the current event loop."""
+    await asyncio.gather(*(client.run() for client in clients))
@@ -0,0 +1,231 @@
+# wsclient/orderbook.py
+import zlib
+
+import numpy as np
+
+from wsclient.decoder import parse_levels
+
+# OKX computes the book checksum over the top 25 levels of each side
+CHECKSUM_DEPTH = 25
+
+
+class BookSide:
+    """
+    One side of an L2 book held in preallocated, sorted NumPy arrays.
+
+    Bids are kept in descending price order and asks in ascending order, so
+    index 0 is always the top of book. The raw price/size strings are kept
+    alongside the floats because the OKX checksum is computed over the exact
+    strings the exchange sent.
+    """
+
+    def __init__(self, capacity=400, descending=False):
+        self.capacity = capacity
+        self.descending = descending
+        self.prices = np.zeros(capacity, dtype=np.float64)
+        self.sizes = np.zeros(capacity, dtype=np.float64)
+        self.raw_prices = np.empty(capacity, dtype=object)
+        self.raw_sizes = np.empty(capacity, dtype=object)
+        self.n = 0
+
+    def clear(self):
+        self.n = 0
+
+    def _find(self, price):
+        """
+        Binary search for `price`. Returns (index, found) where index is the
+        position the price occupies or should be inserted at.
+        """
+        prices = self.prices
+        lo, hi = 0, self.n
+        if self.descending:
+            while lo < hi:
+                mid = (lo + hi) >> 1
+                if prices[mid] > price:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        else:
+            while lo < hi:
+                mid = (lo + hi) >> 1
+                if prices[mid] < price:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo, lo < self.n and prices[lo] == price
+
+    def load(self, levels):
+        """Replace the side with an already sorted snapshot of [price, size, ...] levels."""
+        n = parse_levels(levels, self.prices, self.sizes)
+        top = levels[:n]
+        self.raw_prices[:n] = [level[0] for level in top]
+        self.raw_sizes[:n] = [level[1] for level in top]
+        self.n = n
+
+    def apply(self, raw_price, raw_size):
+        """
+        Apply a single incremental level in place. A size of zero removes the
+        level; an unknown price is inserted at its sorted position and pushes
+        the deepest level out if the side is full.
+        """
+        price = float(raw_price)
+        size = float(raw_size)
+        i, found = self._find(price)
+        n = self.n
+
+        if size == 0.0:
+            if found:
+                # Shift the deeper levels up by one
+                self.prices[i:n - 1] = self.prices[i + 1:n]
+                self.sizes[i:n - 1] = self.sizes[i + 1:n]
+                self.raw_prices[i:n - 1] = self.raw_prices[i + 1:n]
+                self.raw_sizes[i:n - 1] = self.raw_sizes[i + 1:n]
+                self.n = n - 1
+            return
+
+        if found:
+            self.sizes[i] = size
+            self.raw_sizes[i] = raw_size
+            return
+
+        if i >= self.capacity:
+            return  # Deeper than we track
+
+        end = min(n, self.capacity - 1)
+        if end > i:
+            # Shift the deeper levels down by one, dropping the last if full
+            self.prices[i + 1:end + 1] = self.prices[i:end]
+            self.sizes[i + 1:end + 1] = self.sizes[i:end]
+            self.raw_prices[i + 1:end + 1] = self.raw_prices[i:end]
+            self.raw_sizes[i + 1:end + 1] = self.raw_sizes[i:end]
+        self.prices[i] = price
+        self.sizes[i] = size
+        self.raw_prices[i] = raw_price
+        self.raw_sizes[i] = raw_size
+        self.n = min(n + 1, self.capacity)
+
+    def levels(self, depth=None):
+        """Zero-copy (prices, sizes) views of the top `depth` levels."""
+        n = self.n if depth is None else min(depth, self.n)
+        return self.prices[:n], self.sizes[:n]
+
+    def to_list(self, depth=None):
+        """Materialize the side as the legacy [[price, size], ...] list."""
+        prices, sizes = self.levels(depth)
+        return np.column_stack((prices, sizes)).tolist()
+
+
+class OrderBook:
+    """
+    Incremental L2 order book for a single OKX instrument.
+
+    Feed it the `data[0]` element of a `books` push together with the
+    message `action` ("snapshot" or "update"); deltas are applied in place
+    and the OKX CRC32 checksum is verified after every message.
+    """
+
+    def __init__(self, inst_id="BTC-USDT", depth=400, verify_checksum=True):
+        self.inst_id = inst_id
+        self.depth = depth
+        self.verify_checksum = verify_checksum
+        self.bids = BookSide(depth, descending=True)
+        self.asks = BookSide(depth, descending=False)
+        self.ts = None
+        self.seq_id = None
+        self.prev_seq_id = None
+        self.updates = 0
+        self.ready = False
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.ts = None
+        self.seq_id = None
+        self.prev_seq_id = None
+        self.ready = False
+
+    def apply(self, book_data, action="snapshot"):
+        """
+        Apply one OKX `books` payload.
+
+        Parameters:
+        - book_data: The `data[0]` dict of the push (asks, bids, ts, checksum, ...).
+        - action: "snapshot" to replace the book, "update" to apply deltas.
+
+        Returns:
+        - True if the book is consistent afterwards, False on a checksum mismatch
+          or an update arriving before any snapshot.
+        """
+        if action == "snapshot":
+            self.bids.load(book_data.get("bids", []))
+            self.asks.load(book_data.get("asks", []))
+            self.ready = True
+        else:
+            if not self.ready:
+                return False
+            bids, asks = book_data.get("bids", []), book_data.get("asks", [])
+            if not (bids or asks):
+                # Keepalive push (seqId == prevSeqId): nothing changed, so nothing to verify
+                self.ts = book_data.get("ts", self.ts)
+                self.seq_id = book_data.get("seqId", self.seq_id)
+                self.prev_seq_id = book_data.get("prevSeqId")
+                return True
+            for level in bids:
+                self.bids.apply(level[0], level[1])
+            for level in asks:
+                self.asks.apply(level[0], level[1])
+
+        self.ts = book_data.get("ts")
+        self.seq_id = book_data.get("seqId")
+        self.prev_seq_id = book_data.get("prevSeqId")
+        self.updates += 1
+
+        checksum = book_data.get("checksum")
+        if self.verify_checksum and checksum is not None and self.checksum() != int(checksum):
+            self.ready = False
+            return False
+        return True
+
+    def checksum(self):
+        """Signed CRC32 over the interleaved top-25 bid/ask levels, as OKX defines it."""
+        parts = []
+        bids, asks = self.bids, self.asks
+        for i in range(CHECKSUM_DEPTH):
+            if i < bids.n:
+                parts.append(bids.raw_prices[i])
+                parts.append(bids.raw_sizes[i])
+            if i < asks.n:
+                parts.append(asks.raw_prices[i])
+                parts.append(asks.raw_sizes[i])
+        crc = zlib.crc32(":".join(parts).encode())
+        return crc - (1 << 32) if crc >= (1 << 31) else crc
+
+    def best_bid(self):
+        return float(self.bids.prices[0]) if self.bids.n else 0.0
+
+    def best_ask(self):
+        return float(self.asks.prices[0]) if self.asks.n else 0.0
+
+    def mid(self):
+        if not (self.bids.n and self.asks.n):
+            return 0.0
+        return (float(self.bids.prices[0]) + float(self.asks.prices[0])) / 2
+
+    def spread(self):
+        if not (self.bids.n and self.asks.n):
+            return 0.0
+        return float(self.asks.prices[0]) - float(self.bids.prices[0])
+
+    def depth_levels(self, depth=None):
+        """Zero-copy views: (bid_prices, bid_sizes, ask_prices, ask_sizes)."""
+        bid_px, bid_sz = self.bids.levels(depth)
+        ask_px, ask_sz = self.asks.levels(depth)
+        return bid_px, bid_sz, ask_px, ask_sz
+
+    def to_dict(self, depth=None):
+        """Copy the book into the legacy `latest_data` shape used by the UI."""
+        return {
+            "timestamp": self.ts,
+            "asks": self.asks.to_list(depth),
+            "bids": self.bids.to_list(depth),
+        }
@@ -0,0 +1,214 @@
+# wsclient/shm_book.py
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Fixed header at the start of every instrument's segment
+HEADER_DTYPE = np.dtype([
+    ("seq", "<u8"),           # seqlock counter: odd while a write is in progress
+    ("depth", "<u4"),         # levels allocated per side
+    ("n_bids", "<u4"),
+    ("n_asks", "<u4"),
+    ("ts", "<i8"),            # exchange timestamp of the published book, epoch ms
+    ("updates", "<u8"),       # OrderBook.updates at publish time
+    ("published_ns", "<i8"),  # local publish time, epoch ns
+], align=True)
+
+DEFAULT_PREFIX = "okxbook"
+
+
+def segment_name(inst_id, prefix=DEFAULT_PREFIX):
+    return f"{prefix}_{inst_id}"
+
+
+def segment_size(depth):
+    return HEADER_DTYPE.itemsize + 4 * depth * np.dtype(np.float64).itemsize
+
+
+class _Segment:
+    """NumPy views over one instrument's shared memory block."""
+
+    def __init__(self, shm, depth):
+        self.shm = shm
+        buf = shm.buf
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buf)
+        offset = HEADER_DTYPE.itemsize
+        levels = np.ndarray((4, depth), dtype=np.float64, buffer=buf, offset=offset)
+        self.bid_prices, self.bid_sizes, self.ask_prices, self.ask_sizes = levels
+
+
+def _attach(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it."""
+    try:
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    except TypeError:  # Python < 3.13 has no `track`
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class BookPublisher:
+    """
+    Publishes the top `depth` levels of each instrument's book into a
+    `multiprocessing.shared_memory` segment named `<prefix>_<instId>`.
+
+    Writers follow a seqlock protocol: the sequence counter is made odd,
+    the levels and header are written, then the counter is made even again.
+    Readers in other processes never take a lock and never unpickle.
+    """
+
+    def __init__(self, inst_ids, depth=20, prefix=DEFAULT_PREFIX):
+        self.depth = depth
+        self.prefix = prefix
+        self.segments = {}
+        for inst_id in inst_ids:
+            self.add(inst_id)
+
+    def add(self, inst_id):
+        if inst_id in self.segments:
+            return
+        name = segment_name(inst_id, self.prefix)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=segment_size(self.depth))
+        except FileExistsError:
+            # Left over from a previous run: reuse it if the layout matches
+            shm = shared_memory.SharedMemory(name=name, create=False)
+            if shm.size < segment_size(self.depth):
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(name=name, create=True, size=segment_size(self.depth))
+        segment = _Segment(shm, self.depth)
+        segment.header["seq"] = 0
+        segment.header["depth"] = self.depth
+        segment.header["n_bids"] = 0
+        segment.header["n_asks"] = 0
+        self.segments[inst_id] = segment
+
+    def publish(self, book):
+        """Copy the top levels of an OrderBook into its segment. Caller holds the book's lock."""
+        segment = self.segments.get(book.inst_id)
+        if segment is None:
+            return
+        header = segment.header
+        bid_px, bid_sz, ask_px, ask_sz = book.depth_levels(self.depth)
+        nb, na = len(bid_px), len(ask_px)
+
+        seq = int(header["seq"])
+        header["seq"] = seq + 1  # odd: write in progress
+        segment.bid_prices[:nb] = bid_px
+        segment.bid_sizes[:nb] = bid_sz
+        segment.ask_prices[:na] = ask_px
+        segment.ask_sizes[:na] = ask_sz
+        header["n_bids"] = nb
+        header["n_asks"] = na
+        header["ts"] = int(book.ts) if book.ts is not None else 0
+        header["updates"] = book.updates
+        header["published_ns"] = time.time_ns()
+        header["seq"] = seq + 2  # even: consistent
+
+    def attach(self, feed, channel="books"):
+        """Publish every book update applied by a FeedManager."""
+        def on_update(update_channel, inst_id):
+            if update_channel != channel or inst_id not in self.segments:
+                return
+            book = feed.get_book(inst_id, channel)
+            with feed.lock_for(inst_id):
+                self.publish(book)
+
+        feed.add_listener(on_update)
+        return on_update
+
+    def close(self, unlink=True):
+        for segment in self.segments.values():
+            shm = segment.shm
+            segment.header = segment.bid_prices = segment.bid_sizes = None
+            segment.ask_prices = segment.ask_sizes = None
+            shm.close()
+            if unlink:
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+        self.segments = {}
+
+
+class BookReader:
+    """
+    Lock-free reader for a segment written by BookPublisher.
+
+    `snapshot()` returns a consistent copy of the top levels. `views()` returns
+    zero-copy arrays plus the sequence number they were read at; pass that to
+    `is_consistent()` after using them to know whether a write raced the read.
+    """
+
+    def __init__(self, inst_id, prefix=DEFAULT_PREFIX):
+        self.inst_id = inst_id
+        self.shm = _attach(segment_name(inst_id, prefix))
+        depth = int(np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)["depth"])
+        self.segment = _Segment(self.shm, depth)
+        self.depth = depth
+
+    def version(self):
+        return int(self.segment.header["seq"])
+
+    def views(self, max_spins=1000):
+        """
+        Zero-copy (seq, bid_prices, bid_sizes, ask_prices, ask_sizes) views.
+
+        Spins (up to `max_spins` times) while a write is in progress so the
+        returned seq is even. Returns None if the seq stays odd, e.g. because
+        the publisher died mid-write, instead of hanging the reader.
+        """
+        segment = self.segment
+        for _ in range(max_spins):
+            seq = int(segment.header["seq"])
+            if seq & 1 == 0:
+                break
+            time.sleep(0)  # Writer mid-update: yield and retry
+        else:
+            return None
+        nb = int(segment.header["n_bids"])
+        na = int(segment.header["n_asks"])
+        return (seq, segment.bid_prices[:nb], segment.bid_sizes[:nb],
+                segment.ask_prices[:na], segment.ask_sizes[:na])
+
+    def is_consistent(self, seq):
+        """True if no write happened since `views()` returned `seq`."""
+        return int(self.segment.header["seq"]) == seq
+
+    def snapshot(self, max_retries=1000):
+        """
+        Consistent copy of the published book.
+
+        Returns:
+        - Dict with bid/ask price and size arrays, ts, updates, published_ns and seq,
+          or None if no consistent read was possible within `max_retries`.
+        """
+        for _ in range(max_retries):
+            views = self.views(max_spins=1)
+            if views is None:
+                time.sleep(0)
+                continue
+            seq, bid_px, bid_sz, ask_px, ask_sz = views
+            header = self.segment.header
+            data = {
+                "bid_prices": bid_px.copy(),
+                "bid_sizes": bid_sz.copy(),
+                "ask_prices": ask_px.copy(),
+                "ask_sizes": ask_sz.copy(),
+                "ts": int(header["ts"]),
+                "updates": int(header["updates"]),
+                "published_ns": int(header["published_ns"]),
+                "seq": seq,
+            }
+            if self.is_consistent(seq):
+                return data
+        return None
+
+    def close(self):
+        self.segment = None
+        self.shm.close()